@@ -1,4 +1,6 @@
-import os, re
+import hashlib, os, re, tempfile
+from riscv_emulator import compressed
+from riscv_emulator.compressed import compress as compress_instruction
 
 REGISTER_MAP = {f'x{i}': i for i in range(32)}
 REGISTER_MAP.update({
@@ -21,6 +23,14 @@ INSTRUCTION_SET = {
     'sra':  {'type': 'R', 'opcode': 0b0110011, 'funct3': 0b101, 'funct7': 0b0100000},
     'or':   {'type': 'R', 'opcode': 0b0110011, 'funct3': 0b110, 'funct7': 0b0000000},
     'and':  {'type': 'R', 'opcode': 0b0110011, 'funct3': 0b111, 'funct7': 0b0000000},
+    'mul':  {'type': 'R', 'opcode': 0b0110011, 'funct3': 0b000, 'funct7': 0b0000001},
+    'mulh': {'type': 'R', 'opcode': 0b0110011, 'funct3': 0b001, 'funct7': 0b0000001},
+    'mulhsu':{'type': 'R', 'opcode': 0b0110011, 'funct3': 0b010, 'funct7': 0b0000001},
+    'mulhu':{'type': 'R', 'opcode': 0b0110011, 'funct3': 0b011, 'funct7': 0b0000001},
+    'div':  {'type': 'R', 'opcode': 0b0110011, 'funct3': 0b100, 'funct7': 0b0000001},
+    'divu': {'type': 'R', 'opcode': 0b0110011, 'funct3': 0b101, 'funct7': 0b0000001},
+    'rem':  {'type': 'R', 'opcode': 0b0110011, 'funct3': 0b110, 'funct7': 0b0000001},
+    'remu': {'type': 'R', 'opcode': 0b0110011, 'funct3': 0b111, 'funct7': 0b0000001},
     'addi': {'type': 'I', 'opcode': 0b0010011, 'funct3': 0b000},
     'slti': {'type': 'I', 'opcode': 0b0010011, 'funct3': 0b010},
     'sltiu':{'type': 'I', 'opcode': 0b0010011, 'funct3': 0b011},
@@ -50,6 +60,30 @@ INSTRUCTION_SET = {
     'jal':  {'type': 'J', 'opcode': 0b1101111},
     'ecall':{'type': 'SYS', 'opcode': 0b1110011},
     'ebreak':{'type': 'SYS', 'opcode': 0b1110011},
+    'csrrw': {'type': 'CSR', 'opcode': 0b1110011, 'funct3': 0b001},
+    'csrrs': {'type': 'CSR', 'opcode': 0b1110011, 'funct3': 0b010},
+    'csrrc': {'type': 'CSR', 'opcode': 0b1110011, 'funct3': 0b011},
+    'csrrwi':{'type': 'CSR', 'opcode': 0b1110011, 'funct3': 0b101},
+    'csrrsi':{'type': 'CSR', 'opcode': 0b1110011, 'funct3': 0b110},
+    'csrrci':{'type': 'CSR', 'opcode': 0b1110011, 'funct3': 0b111},
+    'csrr':  {'type': 'CSR', 'opcode': 0b1110011, 'funct3': 0b010},
+    'csrw':  {'type': 'CSR', 'opcode': 0b1110011, 'funct3': 0b001},
+    'lr.w':      {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b00010},
+    'sc.w':      {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b00011},
+    'amoswap.w': {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b00001},
+    'amoadd.w':  {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b00000},
+    'amoxor.w':  {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b00100},
+    'amoand.w':  {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b01100},
+    'amoor.w':   {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b01000},
+    'amomin.w':  {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b10000},
+    'amomax.w':  {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b10100},
+    'amominu.w': {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b11000},
+    'amomaxu.w': {'type': 'A', 'opcode': 0b0101111, 'funct3': 0b010, 'funct5': 0b11100},
+}
+
+CSR_MAP = {
+    'mstatus': 0x300, 'mtvec': 0x305, 'mscratch': 0x340, 'mepc': 0x341, 'mcause': 0x342,
+    'mhartid': 0xf14,
 }
 
 class Section:
@@ -208,192 +242,240 @@ def reg_num(reg):
     else:
         raise ValueError(f"Invalid register name: {reg}")
 
-def assemble(input_file):
-    name, ext = os.path.splitext(input_file)
-    if ext != '.s':
-        raise ValueError("Input file must have .s extension")
-    
-    with open(input_file, 'r') as f:
-        lines = f.readlines()
-    
-    assembler = Assembler()
-    
+ASM_CACHE_DIR = os.environ.get("RISCV_ASM_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "riscv_emulator", "asm"))
+ENCODE_CACHE = {}
+ENCODE_CACHE_LIMIT = 1 << 16
+_fingerprint = None
+
+def assembler_fingerprint():
+    # Cached output is only valid for the assembler that produced it.
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256()
+        for path in (__file__, compressed.__file__):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _fingerprint = digest.digest()
+    return _fingerprint
+
+def tokenize(lines):
+    parsed = []
     for line_num, line in enumerate(lines, 1):
-        original_line = line
-        line = line.split('#')[0].strip()
-        if not line:
+        code = line.split('#')[0].strip()
+        if not code:
             continue
-            
-        if ':' in line:
-            colon_pos = line.find(':')
-            label_part = line[:colon_pos].strip()
-            rest_part = line[colon_pos+1:].strip()
-            
-            if not assembler.current_section:
-                assembler.current_section = assembler.get_or_create_section('text')
-            assembler.current_section.add_label(label_part)
-            
-            if rest_part:
-                original_rest = original_line.split('#')[0]
-                original_colon_pos = original_rest.find(':')
-                original_rest = original_rest[original_colon_pos+1:].strip()
-                
-                if rest_part.startswith('.'):
-                    original_parts = original_rest.replace(",", "").split()
-                    assembler.process_pseudo_op(original_parts, line_num)
+        label = None
+        if ':' in code and not code.startswith('.'):
+            colon_pos = code.find(':')
+            label = code[:colon_pos].strip()
+            code = code[colon_pos+1:].strip()
+        if not code:
+            parsed.append((line_num, label, None, None))
+        elif code.startswith('.'):
+            parsed.append((line_num, label, 'directive', code.replace(",", "").split()))
+        else:
+            parsed.append((line_num, label, 'instruction', tuple(code.lower().replace(",", "").split())))
+    return parsed
+
+def encode_instruction(parts, pc, all_labels, line_num):
+    instr_info = INSTRUCTION_SET[parts[0]]
+    opcode = instr_info['opcode']
+    instruction = 0
+
+    if instr_info['type'] == 'R':
+        rd = reg_num(parts[1])
+        rs1 = reg_num(parts[2])
+        rs2 = reg_num(parts[3])
+        funct3 = instr_info['funct3']
+        funct7 = instr_info.get('funct7', 0)
+        instruction = encode_r_type(opcode, rd, funct3, rs1, rs2, funct7)
+    elif instr_info['type'] == 'I':
+        rd = reg_num(parts[1])
+        if parts[0].startswith('l'):
+            imm, rs1 = parse_mem_operand(parts[2])
+            rs1 = reg_num(rs1)
+        else:
+            rs1 = reg_num(parts[2])
+            try:
+                imm = int(parts[3], 0)
+            except ValueError:
+                if parts[3] in all_labels:
+                    imm = all_labels[parts[3]]
                 else:
-                    rest_lower = rest_part.lower()
-                    parts = rest_lower.replace(",", "").split()
-                    if parts and parts[0] in INSTRUCTION_SET:
-                        if not assembler.current_section:
-                            assembler.current_section = assembler.get_or_create_section('text')
-                        assembler.current_section.add_data(bytes(4))
-        elif line.startswith('.'):
-            original_parts = original_line.split('#')[0].strip().replace(",", "").split()
-            assembler.process_pseudo_op(original_parts, line_num)
+                    raise ValueError(f"Line {line_num}: Unknown symbol: {parts[3]}")
+
+        if parts[0] in ['slli', 'srli', 'srai']:
+            if not 0 <= imm <= 31:
+                raise ValueError(f"Line {line_num}: Shift amount must be 0-31, got {imm}")
+            funct7 = instr_info['funct7']
+            imm = (funct7 << 5) | (imm & 0x1f)
+        else:
+            if not -2048 <= imm <= 2047:
+                if parts[3] not in all_labels:
+                    raise ValueError(f"Line {line_num}: I-type immediate out of range: {imm}")
+            imm = imm & 0xfff
+        funct3 = instr_info['funct3']
+        instruction = encode_i_type(opcode, rd, funct3, rs1, imm)
+    elif instr_info['type'] == 'S':
+        rs2 = reg_num(parts[1])
+        imm, rs1_str = parse_mem_operand(parts[2])
+        rs1 = reg_num(rs1_str)
+        if not -2048 <= imm <= 2047:
+            raise ValueError(f"Line {line_num}: S-type immediate out of range")
+        funct3 = instr_info['funct3']
+        instruction = encode_s_type(opcode, rs1, rs2, imm, funct3)
+    elif instr_info['type'] == 'B':
+        rs1 = reg_num(parts[1])
+        rs2 = reg_num(parts[2])
+        try:
+            imm = int(parts[3])
+        except ValueError:
+            label = parts[3]
+            if label not in all_labels:
+                raise ValueError(f"Line {line_num}: Unknown label: {label}")
+            imm = all_labels[label] - pc
+            if imm % 2 != 0:
+                raise ValueError(f"Line {line_num}: Branch target address must be multiple of 2")
+        if not -4096 <= imm <= 4094:
+            raise ValueError(f"Line {line_num}: B-type immediate out of range")
+        funct3 = instr_info['funct3']
+        instruction = encode_b_type(opcode, rs1, rs2, imm, funct3)
+    elif instr_info['type'] == 'U':
+        rd = reg_num(parts[1])
+        try:
+            imm = int(parts[2], 0)
+        except ValueError:
+            if parts[2] in all_labels:
+                imm = all_labels[parts[2]] >> 12
+            else:
+                raise ValueError(f"Line {line_num}: Unknown symbol: {parts[2]}")
+        instruction = ((imm & 0xfffff) << 12) | (rd << 7) | opcode
+    elif instr_info['type'] == 'J':
+        rd = reg_num(parts[1])
+        try:
+            imm = int(parts[2], 0)
+            imm = sign_extend(imm, 21)
+        except ValueError:
+            label = parts[2]
+            if label not in all_labels:
+                raise ValueError(f"Line {line_num}: Unknown label: {label}")
+            imm = all_labels[label] - pc
+            if imm % 2 != 0:
+                raise ValueError(f"Line {line_num}: Jump target address must be multiple of 2")
+        if not -1048576 <= imm <= 1048575:
+            raise ValueError(f"Line {line_num}: J-type immediate out of range")
+        instruction = encode_j_type(opcode, rd, imm)
+    elif instr_info['type'] == 'A':
+        rd = reg_num(parts[1])
+        rs2 = 0 if parts[0] == 'lr.w' else reg_num(parts[2])
+        rs1 = reg_num(parts[-1].split('(')[-1].rstrip(')'))
+        funct7 = instr_info['funct5'] << 2
+        instruction = encode_r_type(opcode, rd, instr_info['funct3'], rs1, rs2, funct7)
+    elif instr_info['type'] == 'CSR':
+        if parts[0] == 'csrr':
+            rd, csr, source = parts[1], parts[2], 'x0'
+        elif parts[0] == 'csrw':
+            rd, csr, source = 'x0', parts[1], parts[2]
+        else:
+            rd, csr, source = parts[1:4]
+        funct3 = instr_info['funct3']
+        if funct3 & 0x4:
+            source = int(source, 0)
+            if not 0 <= source <= 31:
+                raise ValueError(f"Line {line_num}: CSR immediate must be 0-31, got {source}")
         else:
-            line_lower = line.lower()
-            parts = line_lower.replace(",", "").split()
-            if parts and parts[0] in INSTRUCTION_SET:
-                if not assembler.current_section:
-                    assembler.current_section = assembler.get_or_create_section('text')
-                assembler.current_section.add_data(bytes(4))
-    
+            source = reg_num(source)
+        csr = CSR_MAP[csr] if csr in CSR_MAP else int(csr, 0)
+        instruction = encode_i_type(opcode, reg_num(rd), funct3, source, csr & 0xfff)
+    elif instr_info['type'] == 'SYS':
+        if parts[0] == 'ecall':
+            instruction = 0x00000073
+        elif parts[0] == 'ebreak':
+            instruction = 0x00100073
+    return instruction
+
+def encode_cached(parts, pc, all_labels, line_num):
+    # Only instructions that name a symbol depend on where they sit and what the symbol resolves to.
+    symbol = parts[-1]
+    key = (parts, pc, all_labels[symbol]) if symbol in all_labels else parts
+    instruction = ENCODE_CACHE.get(key)
+    if instruction is None:
+        instruction = encode_instruction(parts, pc, all_labels, line_num)
+        if len(ENCODE_CACHE) >= ENCODE_CACHE_LIMIT:
+            ENCODE_CACHE.clear()
+        ENCODE_CACHE[key] = instruction
+    return instruction
+
+def symbol_table_text(assembler):
+    lines = ["# Symbol Table\n", "# Format: symbol_name address section\n"]
+    for section_name, section in assembler.sections.items():
+        for label, address in section.labels.items():
+            global_marker = " (global)" if label in assembler.global_symbols else ""
+            lines.append(f"{label} 0x{address:08x} {section_name}{global_marker}\n")
+
+    for symbol, value in assembler.symbols.items():
+        global_marker = " (global)" if symbol in assembler.global_symbols else ""
+        lines.append(f"{symbol} 0x{value:08x} constant{global_marker}\n")
+    return "".join(lines)
+
+def layout(tokens, sizes):
+    assembler = Assembler()
+    instructions = []
+
+    for line_num, label, kind, parts in tokens:
+        if label is not None:
+            if not assembler.current_section:
+                assembler.current_section = assembler.get_or_create_section('text')
+            assembler.current_section.add_label(label)
+        if kind == 'directive':
+            assembler.process_pseudo_op(parts, line_num)
+        elif kind == 'instruction' and parts[0] in INSTRUCTION_SET:
+            if not assembler.current_section:
+                assembler.current_section = assembler.get_or_create_section('text')
+            section = assembler.current_section
+            instructions.append((line_num, parts, section, len(section.data)))
+            section.add_data(bytes(sizes[len(instructions) - 1] if sizes else 4))
+
     all_labels = {}
     for section in assembler.sections.values():
         all_labels.update(section.labels)
     all_labels.update(assembler.symbols)
-    
-    assembler.current_section = None
-    section_positions = {name: 0 for name in assembler.sections.keys()}
-    
-    for line_num, line in enumerate(lines, 1):
-        original_line = line
-        line = line.split('#')[0].strip()
-        if not line:
-            continue
-            
-        if line.startswith('.'):
-            original_parts = original_line.split('#')[0].strip().replace(",", "").split()
-            assembler.process_pseudo_op(original_parts, line_num)
-        elif line.endswith(":"):
-            continue
-        else:
-            line_lower = line.lower()
-            parts = line_lower.replace(",", "").split()
-            
-            if parts and parts[0] in INSTRUCTION_SET:
-                if not assembler.current_section:
-                    assembler.current_section = assembler.get_or_create_section('text')
-                    
-                section = assembler.current_section
-                pos = section_positions[section.name]
-                pc = section.start_addr + pos
-                
-                instr_info = INSTRUCTION_SET[parts[0]]
-                opcode = instr_info['opcode']
-                instruction = 0
-                
-                if instr_info['type'] == 'R':
-                    rd = reg_num(parts[1])
-                    rs1 = reg_num(parts[2])
-                    rs2 = reg_num(parts[3])
-                    funct3 = instr_info['funct3']
-                    funct7 = instr_info.get('funct7', 0)
-                    instruction = encode_r_type(opcode, rd, funct3, rs1, rs2, funct7)
-                elif instr_info['type'] == 'I':
-                    rd = reg_num(parts[1])
-                    if parts[0].startswith('l'):
-                        imm, rs1 = parse_mem_operand(parts[2])
-                        rs1 = reg_num(rs1)
-                    else:
-                        rs1 = reg_num(parts[2])
-                        try:
-                            imm = int(parts[3], 0)
-                        except ValueError:
-                            if parts[3] in all_labels:
-                                imm = all_labels[parts[3]]
-                            else:
-                                raise ValueError(f"Line {line_num}: Unknown symbol: {parts[3]}")
-                                
-                    if parts[0] in ['slli', 'srli', 'srai']:
-                        if not 0 <= imm <= 31:
-                            raise ValueError(f"Line {line_num}: Shift amount must be 0-31, got {imm}")
-                        funct7 = instr_info['funct7']
-                        imm = (funct7 << 5) | (imm & 0x1f)
-                    else:
-                        if not -2048 <= imm <= 2047:
-                            if parts[3] not in all_labels:
-                                raise ValueError(f"Line {line_num}: I-type immediate out of range: {imm}")
-                        imm = imm & 0xfff
-                    funct3 = instr_info['funct3']
-                    instruction = encode_i_type(opcode, rd, funct3, rs1, imm)
-                elif instr_info['type'] == 'S':
-                    rs2 = reg_num(parts[1])
-                    imm, rs1_str = parse_mem_operand(parts[2])
-                    rs1 = reg_num(rs1_str)
-                    if not -2048 <= imm <= 2047:
-                        raise ValueError(f"Line {line_num}: S-type immediate out of range")
-                    funct3 = instr_info['funct3']
-                    instruction = encode_s_type(opcode, rs1, rs2, imm, funct3)
-                elif instr_info['type'] == 'B':
-                    rs1 = reg_num(parts[1])
-                    rs2 = reg_num(parts[2])
-                    try:
-                        imm = int(parts[3])
-                    except ValueError:
-                        label = parts[3]
-                        if label not in all_labels:
-                            raise ValueError(f"Line {line_num}: Unknown label: {label}")
-                        imm = all_labels[label] - pc
-                        if imm % 2 != 0:
-                            raise ValueError(f"Line {line_num}: Branch target address must be multiple of 2")
-                    if not -4096 <= imm <= 4094:
-                        raise ValueError(f"Line {line_num}: B-type immediate out of range")
-                    funct3 = instr_info['funct3']
-                    instruction = encode_b_type(opcode, rs1, rs2, imm, funct3)
-                elif instr_info['type'] == 'U':
-                    rd = reg_num(parts[1])
-                    try:
-                        imm = int(parts[2], 0)
-                    except ValueError:
-                        if parts[2] in all_labels:
-                            imm = all_labels[parts[2]] >> 12
-                        else:
-                            raise ValueError(f"Line {line_num}: Unknown symbol: {parts[2]}")
-                    instruction = ((imm & 0xfffff) << 12) | (rd << 7) | opcode
-                elif instr_info['type'] == 'J':
-                    rd = reg_num(parts[1])
-                    try:
-                        imm = int(parts[2], 0)
-                        imm = sign_extend(imm, 21)
-                    except ValueError:
-                        label = parts[2]
-                        if label not in all_labels:
-                            raise ValueError(f"Line {line_num}: Unknown label: {label}")
-                        imm = all_labels[label] - pc
-                        if imm % 2 != 0:
-                            raise ValueError(f"Line {line_num}: Jump target address must be multiple of 2")
-                    if not -1048576 <= imm <= 1048575:
-                        raise ValueError(f"Line {line_num}: J-type immediate out of range")
-                    instruction = encode_j_type(opcode, rd, imm)
-                elif instr_info['type'] == 'SYS':
-                    if parts[0] == 'ecall':
-                        instruction = 0x00000073
-                    elif parts[0] == 'ebreak':
-                        instruction = 0x00100073
-                
-                instr_bytes = instruction.to_bytes(4, byteorder='little')
-                for i, byte in enumerate(instr_bytes):
-                    section.data[pos + i] = byte
-                section_positions[section.name] += 4
-    
+    return assembler, instructions, all_labels
+
+def assemble_source(source, compress=False):
+    tokens = tokenize(source.splitlines())
+    # With compression every instruction starts out 2 bytes; any whose C form turns out not to fit
+    # (e.g. a branch whose target moved out of range) grows to 4 and the layout is redone.
+    # Sizes only ever grow, so this settles.
+    sizes = [2] * sum(kind == 'instruction' and parts[0] in INSTRUCTION_SET for _, _, kind, parts in tokens) if compress else None
+    while True:
+        assembler, instructions, all_labels = layout(tokens, sizes)
+        encoded = [encode_cached(parts, section.start_addr + offset, all_labels, line_num)
+                   for line_num, parts, section, offset in instructions]
+        if not compress:
+            break
+        grown = False
+        for index, instruction in enumerate(encoded):
+            if sizes[index] == 2:
+                half = compress_instruction(instruction)
+                if half is None:
+                    sizes[index] = 4
+                    grown = True
+                else:
+                    encoded[index] = half
+        if not grown:
+            break
+
+    for index, (line_num, parts, section, offset) in enumerate(instructions):
+        size = sizes[index] if sizes else 4
+        section.data[offset:offset + size] = encoded[index].to_bytes(size, byteorder='little')
+
     output_data = bytearray()
-    
+
     if 'text' in assembler.sections:
         text_section = assembler.sections['text']
         output_data.extend(text_section.data)
-    
+
     if 'data' in assembler.sections:
         data_section = assembler.sections['data']
         current_len = len(output_data)
@@ -401,20 +483,70 @@ def assemble(input_file):
             padding = assembler.data_start_addr - current_len
             output_data.extend(bytes(padding))
         output_data.extend(data_section.data)
-    
-    with open(f"{name}.bin", "wb") as bin_file:
-        bin_file.write(output_data)
-    
-    with open(f"{name}.sym", "w") as sym_file:
-        sym_file.write("# Symbol Table\n")
-        sym_file.write("# Format: symbol_name address section\n")
-        for section_name, section in assembler.sections.items():
-            for label, address in section.labels.items():
-                global_marker = " (global)" if label in assembler.global_symbols else ""
-                sym_file.write(f"{label} 0x{address:08x} {section_name}{global_marker}\n")
-        
-        for symbol, value in assembler.symbols.items():
-            global_marker = " (global)" if symbol in assembler.global_symbols else ""
-            sym_file.write(f"{symbol} 0x{value:08x} constant{global_marker}\n")
-    
-    return f"Assembly completed: {name}.bin ({len(output_data)} bytes), {name}.sym"
\ No newline at end of file
+
+    return bytes(output_data), symbol_table_text(assembler)
+
+def read_cache(digest):
+    # The .sym entry starts with the .bin length, so a missing, short or mismatched pair is a miss.
+    path = os.path.join(ASM_CACHE_DIR, digest)
+    try:
+        with open(path + ".bin", "rb") as bin_file, open(path + ".sym", "r") as sym_file:
+            output_data = bin_file.read()
+            size, _, symbols = sym_file.read().partition("\n")
+    except OSError:
+        return None
+    if not size.isdigit() or int(size) != len(output_data):
+        return None
+    return output_data, symbols
+
+def replace_file(path, data, mode):
+    # Written under a temporary name in the same directory and renamed, so readers never see a partial file.
+    fd, temp_path = tempfile.mkstemp(dir=ASM_CACHE_DIR)
+    try:
+        with os.fdopen(fd, "w" + mode) as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+def write_cache(digest, output_data, symbols):
+    path = os.path.join(ASM_CACHE_DIR, digest)
+    try:
+        os.makedirs(ASM_CACHE_DIR, exist_ok=True)
+        replace_file(path + ".sym", f"{len(output_data)}\n{symbols}", "")
+        replace_file(path + ".bin", output_data, "b")
+    except OSError:
+        pass
+
+def write_if_changed(path, data, mode):
+    try:
+        with open(path, "r" + mode) as f:
+            if f.read() == data:
+                return
+    except OSError:
+        pass
+    with open(path, "w" + mode) as f:
+        f.write(data)
+
+def assemble(input_file, use_cache=True, compress=False):
+    name, ext = os.path.splitext(input_file)
+    if ext != '.s':
+        raise ValueError("Input file must have .s extension")
+
+    with open(input_file, 'rb') as f:
+        raw = f.read()
+
+    digest = hashlib.sha256(assembler_fingerprint() + (b"C" if compress else b"") + raw).hexdigest()
+    cached = read_cache(digest) if use_cache else None
+    if cached is None:
+        output_data, symbols = assemble_source(raw.decode('utf-8'), compress)
+        if use_cache:
+            write_cache(digest, output_data, symbols)
+    else:
+        output_data, symbols = cached
+
+    write_if_changed(f"{name}.bin", output_data, "b")
+    write_if_changed(f"{name}.sym", symbols, "")
+
+    return f"Assembly completed: {name}.bin ({len(output_data)} bytes), {name}.sym"
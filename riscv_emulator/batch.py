@@ -0,0 +1,28 @@
+import contextlib, glob, io, os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from riscv_emulator.emulator import emulator
+
+def collect_programs(target):
+    if os.path.isdir(target):
+        return sorted(os.path.join(target, name) for name in os.listdir(target) if name.endswith(".bin"))
+    return sorted(glob.glob(target))
+
+def run_program(path, engine="interp", max_instructions=None, timeout=None):
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            emu = emulator(engine=engine, headless=True)
+            emu.load_program(path)
+            result = emu.run(max_instructions, timeout)
+        record = {"program": path}
+        record.update(result.to_dict())
+    except Exception as e:
+        record = {"program": path, "exit_reason": "error", "error": f"{type(e).__name__}: {e}"}
+    record["stdout"] = output.getvalue()
+    return record
+
+def run_batch(paths, workers=None, engine="interp", max_instructions=None, timeout=None):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_program, path, engine, max_instructions, timeout) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,77 @@
+import json, os, shutil, tempfile, time, tracemalloc
+from riscv_emulator.assembler import assemble
+from riscv_emulator.emulator import emulator, ENGINES
+
+WORKLOAD_DIR = os.path.join(os.path.dirname(__file__), "benchmarks")
+
+def workloads():
+    return sorted(name[:-2] for name in os.listdir(WORKLOAD_DIR) if name.endswith(".s"))
+
+def build(name, workdir):
+    source = os.path.join(workdir, f"{name}.s")
+    shutil.copyfile(os.path.join(WORKLOAD_DIR, f"{name}.s"), source)
+    assemble(source)
+    return os.path.join(workdir, f"{name}.bin")
+
+def measure(binary, engine):
+    emu = emulator(engine=engine)
+    emu.load_program(binary)
+    start = time.perf_counter()
+    emu.run()
+    wall_time = time.perf_counter() - start
+
+    # Peak memory comes from a second run so tracemalloc overhead stays out of the timing.
+    tracemalloc.start()
+    traced = emulator(engine=engine)
+    traced.load_program(binary)
+    traced.run()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "instructions": emu.instret,
+        "wall_time": wall_time,
+        "ips": emu.instret / wall_time if wall_time else 0.0,
+        "peak_memory": peak_memory,
+    }
+
+def run_benchmarks(names=None, engines=ENGINES):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names or workloads():
+            binary = build(name, workdir)
+            for engine in engines:
+                result = {"workload": name, "engine": engine}
+                result.update(measure(binary, engine))
+                results.append(result)
+    return results
+
+def compare(results, baseline):
+    previous = {(r["workload"], r["engine"]): r for r in baseline}
+    for result in results:
+        old = previous.get((result["workload"], result["engine"]))
+        if old and old["ips"]:
+            result["speedup"] = result["ips"] / old["ips"]
+    return results
+
+def format_table(results):
+    header = f"{'workload':<10} {'engine':<9} {'instructions':>12} {'wall (s)':>9} {'instr/s':>12} {'peak mem':>10}"
+    show_speedup = any("speedup" in r for r in results)
+    if show_speedup:
+        header += f" {'vs base':>8}"
+    rows = [header, "-" * len(header)]
+    for r in results:
+        row = f"{r['workload']:<10} {r['engine']:<9} {r['instructions']:>12} {r['wall_time']:>9.3f} {r['ips']:>12.0f} {r['peak_memory'] / 1024:>8.1f}KB"
+        if show_speedup:
+            row += f" {r['speedup']:>7.2f}x" if "speedup" in r else f" {'-':>8}"
+        rows.append(row)
+    return "\n".join(rows)
+
+def bench(names=None, engines=ENGINES, as_json=False, baseline=None):
+    results = run_benchmarks(names, engines)
+    if baseline:
+        with open(baseline) as f:
+            compare(results, json.load(f))
+    if as_json:
+        return json.dumps(results, indent=2)
+    return format_table(results)
@@ -0,0 +1,15 @@
+# Tight register-only arithmetic loop.
+.text
+addi t0, zero, 0
+lui t1, 12
+addi a0, zero, 1
+addi a1, zero, 0
+loop:
+add a1, a1, a0
+xor a2, a1, t0
+slli a3, a2, 3
+srli a4, a3, 5
+sub a0, a4, a1
+andi a0, a0, 255
+addi t0, t0, 1
+bne t0, t1, loop
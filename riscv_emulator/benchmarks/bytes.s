@@ -0,0 +1,27 @@
+# Byte and halfword traffic: sign-extending loads and narrow stores over a 4 KiB buffer, 20 passes.
+.text
+lui s0, 1
+lui s1, 2
+addi s2, zero, 0
+addi s3, zero, 20
+repeat:
+addi a0, s0, 0
+pass:
+lb t0, 0(a0)
+lbu t1, 1(a0)
+lh t2, 2(a0)
+lhu t3, 2(a0)
+add t0, t0, t1
+add t0, t0, t2
+add t0, t0, t3
+addi t0, t0, -7
+sb t0, 0(a0)
+sb t1, 1(a0)
+sh t0, 2(a0)
+addi a0, a0, 4
+bne a0, s1, pass
+addi s2, s2, 1
+bne s2, s3, repeat
+.data
+buffer:
+.space 4096
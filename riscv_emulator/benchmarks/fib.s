@@ -0,0 +1,25 @@
+# Naive recursive fib(20) through jal/jalr with a stack frame per call.
+.text
+lui sp, 16
+addi a0, zero, 20
+jal ra, fib
+jal zero, done
+fib:
+addi t0, zero, 2
+blt a0, t0, base
+addi sp, sp, -12
+sw ra, 8(sp)
+sw a0, 4(sp)
+addi a0, a0, -1
+jal ra, fib
+sw a0, 0(sp)
+lw a0, 4(sp)
+addi a0, a0, -2
+jal ra, fib
+lw t1, 0(sp)
+add a0, a0, t1
+lw ra, 8(sp)
+addi sp, sp, 12
+base:
+jalr zero, ra, 0
+done:
@@ -0,0 +1,30 @@
+# Fill a 4 KiB buffer, then copy it word by word 20 times.
+.text
+lui s0, 1
+lui s1, 2
+addi t0, zero, 0
+addi t1, zero, 1024
+fill:
+slli t2, t0, 2
+add t3, s0, t2
+sw t0, 0(t3)
+addi t0, t0, 1
+bne t0, t1, fill
+addi s2, zero, 0
+addi s3, zero, 20
+repeat:
+addi a0, s0, 0
+addi a1, s1, 0
+copy:
+lw t4, 0(a0)
+sw t4, 0(a1)
+addi a0, a0, 4
+addi a1, a1, 4
+bne a0, s1, copy
+addi s2, s2, 1
+bne s2, s3, repeat
+.data
+src:
+.space 4096
+dst:
+.space 4096
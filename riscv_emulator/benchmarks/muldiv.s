@@ -0,0 +1,19 @@
+# Multiply/divide mix (RV32M): modular hashing with mul, div and rem.
+.text
+addi t0, zero, 1
+lui t1, 8
+addi a0, zero, 0
+addi a1, zero, 7
+lui a2, 74565
+addi a2, a2, 1657
+loop:
+mul a3, t0, a2
+mulhu a4, t0, a2
+div a5, a3, a1
+rem a6, a3, a1
+divu a7, a4, t0
+add a0, a0, a5
+xor a0, a0, a6
+add a0, a0, a7
+addi t0, t0, 1
+bne t0, t1, loop
@@ -0,0 +1,31 @@
+# Bubble sort of 256 words stored in descending order.
+.text
+lui s0, 1
+addi s1, zero, 256
+addi t0, zero, 0
+init:
+slli t1, t0, 2
+add t1, s0, t1
+sub t2, s1, t0
+sw t2, 0(t1)
+addi t0, t0, 1
+bne t0, s1, init
+addi s2, s1, -1
+outer:
+addi t0, zero, 0
+addi a0, s0, 0
+inner:
+lw t3, 0(a0)
+lw t4, 4(a0)
+bge t4, t3, noswap
+sw t4, 0(a0)
+sw t3, 4(a0)
+noswap:
+addi a0, a0, 4
+addi t0, t0, 1
+blt t0, s2, inner
+addi s2, s2, -1
+blt zero, s2, outer
+.data
+array:
+.space 1024
@@ -0,0 +1,263 @@
+def bits(value, high, low):
+    return (value >> low) & ((1 << (high - low + 1)) - 1)
+
+def sign_extend(value, width):
+    sign_bit = 1 << (width - 1)
+    return (value ^ sign_bit) - sign_bit
+
+def prime(register):
+    # rd'/rs1'/rs2' fields address x8-x15.
+    return register + 8
+
+def is_prime(register):
+    return 8 <= register <= 15
+
+def r_type(funct7, rs2, rs1, funct3, rd, opcode):
+    return (funct7 << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+def i_type(imm, rs1, funct3, rd, opcode):
+    return ((imm & 0xfff) << 20) | (rs1 << 15) | (funct3 << 12) | (rd << 7) | opcode
+
+def s_type(imm, rs2, rs1, funct3):
+    return (((imm >> 5) & 0x7f) << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12) | ((imm & 0x1f) << 7) | 0x23
+
+def b_type(imm, rs2, rs1, funct3):
+    return ((((imm >> 12) & 1) << 31) | (((imm >> 5) & 0x3f) << 25) | (rs2 << 20) | (rs1 << 15) | (funct3 << 12)
+            | (((imm >> 1) & 0xf) << 8) | (((imm >> 11) & 1) << 7) | 0x63)
+
+def j_type(imm, rd):
+    return ((((imm >> 20) & 1) << 31) | (((imm >> 1) & 0x3ff) << 21) | (((imm >> 11) & 1) << 20)
+            | (((imm >> 12) & 0xff) << 12) | (rd << 7) | 0x6f)
+
+def cj_offset(half):
+    offset = ((bits(half, 12, 12) << 11) | (bits(half, 11, 11) << 4) | (bits(half, 10, 9) << 8) | (bits(half, 8, 8) << 10)
+              | (bits(half, 7, 7) << 6) | (bits(half, 6, 6) << 7) | (bits(half, 5, 3) << 1) | (bits(half, 2, 2) << 5))
+    return sign_extend(offset, 12)
+
+def cb_offset(half):
+    offset = ((bits(half, 12, 12) << 8) | (bits(half, 11, 10) << 3) | (bits(half, 6, 5) << 6)
+              | (bits(half, 4, 3) << 1) | (bits(half, 2, 2) << 5))
+    return sign_extend(offset, 9)
+
+def ci_imm(half):
+    return sign_extend((bits(half, 12, 12) << 5) | bits(half, 6, 2), 6)
+
+def parse(half):
+    # Returns (name, rd, rs1, rs2, imm) in terms of full register numbers, or None if reserved/illegal.
+    quadrant = half & 0x3
+    funct3 = bits(half, 15, 13)
+    rd = bits(half, 11, 7)
+    rs2 = bits(half, 6, 2)
+    rd_p = prime(bits(half, 4, 2))
+    rs1_p = prime(bits(half, 9, 7))
+    if quadrant == 0:
+        if funct3 == 0:
+            imm = (bits(half, 12, 11) << 4) | (bits(half, 10, 7) << 6) | (bits(half, 6, 6) << 2) | (bits(half, 5, 5) << 3)
+            return ("c.addi4spn", rd_p, 2, 0, imm) if imm else None
+        imm = (bits(half, 12, 10) << 3) | (bits(half, 6, 6) << 2) | (bits(half, 5, 5) << 6)
+        if funct3 == 2:
+            return ("c.lw", rd_p, rs1_p, 0, imm)
+        if funct3 == 6:
+            return ("c.sw", 0, rs1_p, rd_p, imm)
+    elif quadrant == 1:
+        if funct3 == 0:
+            return ("c.nop", 0, 0, 0, 0) if rd == 0 else ("c.addi", rd, rd, 0, ci_imm(half))
+        if funct3 == 1:
+            return ("c.jal", 1, 0, 0, cj_offset(half))
+        if funct3 == 2:
+            return ("c.li", rd, 0, 0, ci_imm(half))
+        if funct3 == 3:
+            if rd == 2:
+                imm = sign_extend((bits(half, 12, 12) << 9) | (bits(half, 6, 6) << 4) | (bits(half, 5, 5) << 6)
+                                  | (bits(half, 4, 3) << 7) | (bits(half, 2, 2) << 5), 10)
+                return ("c.addi16sp", 2, 2, 0, imm) if imm else None
+            imm = ci_imm(half)
+            return ("c.lui", rd, 0, 0, imm & 0xfffff) if imm and rd else None
+        if funct3 == 4:
+            funct2 = bits(half, 11, 10)
+            if funct2 == 2:
+                return ("c.andi", rs1_p, rs1_p, 0, ci_imm(half))
+            if funct2 < 2:
+                if bits(half, 12, 12):
+                    return None
+                return ("c.srai" if funct2 else "c.srli", rs1_p, rs1_p, 0, bits(half, 6, 2))
+            if bits(half, 12, 12):
+                return None
+            name = ("c.sub", "c.xor", "c.or", "c.and")[bits(half, 6, 5)]
+            return (name, rs1_p, rs1_p, rd_p, 0)
+        if funct3 == 5:
+            return ("c.j", 0, 0, 0, cj_offset(half))
+        if funct3 == 6:
+            return ("c.beqz", 0, rs1_p, 0, cb_offset(half))
+        if funct3 == 7:
+            return ("c.bnez", 0, rs1_p, 0, cb_offset(half))
+    elif quadrant == 2:
+        if funct3 == 0:
+            return None if bits(half, 12, 12) else ("c.slli", rd, rd, 0, rs2)
+        if funct3 == 2:
+            imm = (bits(half, 12, 12) << 5) | (bits(half, 6, 4) << 2) | (bits(half, 3, 2) << 6)
+            return ("c.lwsp", rd, 2, 0, imm) if rd else None
+        if funct3 == 4:
+            if not bits(half, 12, 12):
+                if rs2 == 0:
+                    return ("c.jr", 0, rd, 0, 0) if rd else None
+                return ("c.mv", rd, 0, rs2, 0)
+            if rd == 0 and rs2 == 0:
+                return ("c.ebreak", 0, 0, 0, 0)
+            if rs2 == 0:
+                return ("c.jalr", 1, rd, 0, 0)
+            return ("c.add", rd, rd, rs2, 0)
+        if funct3 == 6:
+            imm = (bits(half, 12, 9) << 2) | (bits(half, 8, 7) << 6)
+            return ("c.swsp", 0, 2, rs2, imm)
+    return None
+
+EXPANSIONS = {
+    "c.addi4spn": lambda rd, rs1, rs2, imm: i_type(imm, rs1, 0x0, rd, 0x13),
+    "c.lw":       lambda rd, rs1, rs2, imm: i_type(imm, rs1, 0x2, rd, 0x03),
+    "c.sw":       lambda rd, rs1, rs2, imm: s_type(imm, rs2, rs1, 0x2),
+    "c.nop":      lambda rd, rs1, rs2, imm: i_type(0, 0, 0x0, 0, 0x13),
+    "c.addi":     lambda rd, rs1, rs2, imm: i_type(imm, rs1, 0x0, rd, 0x13),
+    "c.jal":      lambda rd, rs1, rs2, imm: j_type(imm, 1),
+    "c.li":       lambda rd, rs1, rs2, imm: i_type(imm, 0, 0x0, rd, 0x13),
+    "c.addi16sp": lambda rd, rs1, rs2, imm: i_type(imm, 2, 0x0, 2, 0x13),
+    "c.lui":      lambda rd, rs1, rs2, imm: (imm << 12) | (rd << 7) | 0x37,
+    "c.srli":     lambda rd, rs1, rs2, imm: i_type(imm, rs1, 0x5, rd, 0x13),
+    "c.srai":     lambda rd, rs1, rs2, imm: i_type(0x400 | imm, rs1, 0x5, rd, 0x13),
+    "c.andi":     lambda rd, rs1, rs2, imm: i_type(imm, rs1, 0x7, rd, 0x13),
+    "c.sub":      lambda rd, rs1, rs2, imm: r_type(0x20, rs2, rs1, 0x0, rd, 0x33),
+    "c.xor":      lambda rd, rs1, rs2, imm: r_type(0x00, rs2, rs1, 0x4, rd, 0x33),
+    "c.or":       lambda rd, rs1, rs2, imm: r_type(0x00, rs2, rs1, 0x6, rd, 0x33),
+    "c.and":      lambda rd, rs1, rs2, imm: r_type(0x00, rs2, rs1, 0x7, rd, 0x33),
+    "c.j":        lambda rd, rs1, rs2, imm: j_type(imm, 0),
+    "c.beqz":     lambda rd, rs1, rs2, imm: b_type(imm, 0, rs1, 0x0),
+    "c.bnez":     lambda rd, rs1, rs2, imm: b_type(imm, 0, rs1, 0x1),
+    "c.slli":     lambda rd, rs1, rs2, imm: i_type(imm, rs1, 0x1, rd, 0x13),
+    "c.lwsp":     lambda rd, rs1, rs2, imm: i_type(imm, 2, 0x2, rd, 0x03),
+    "c.jr":       lambda rd, rs1, rs2, imm: i_type(0, rs1, 0x0, 0, 0x67),
+    "c.mv":       lambda rd, rs1, rs2, imm: r_type(0x00, rs2, 0, 0x0, rd, 0x33),
+    "c.ebreak":   lambda rd, rs1, rs2, imm: 0x00100073,
+    "c.jalr":     lambda rd, rs1, rs2, imm: i_type(0, rs1, 0x0, 1, 0x67),
+    "c.add":      lambda rd, rs1, rs2, imm: r_type(0x00, rs2, rs1, 0x0, rd, 0x33),
+    "c.swsp":     lambda rd, rs1, rs2, imm: s_type(imm, rs2, 2, 0x2),
+}
+
+FORMATS = {
+    "c.addi4spn": "x{rd}, x2, {imm}",
+    "c.lw": "x{rd}, {imm}(x{rs1})",
+    "c.sw": "x{rs2}, {imm}(x{rs1})",
+    "c.nop": "",
+    "c.addi": "x{rd}, {imm}",
+    "c.jal": "{imm}",
+    "c.li": "x{rd}, {imm}",
+    "c.addi16sp": "x2, {imm}",
+    "c.lui": "x{rd}, {lui}",
+    "c.srli": "x{rd}, {imm}",
+    "c.srai": "x{rd}, {imm}",
+    "c.andi": "x{rd}, {imm}",
+    "c.sub": "x{rd}, x{rs2}",
+    "c.xor": "x{rd}, x{rs2}",
+    "c.or": "x{rd}, x{rs2}",
+    "c.and": "x{rd}, x{rs2}",
+    "c.j": "{imm}",
+    "c.beqz": "x{rs1}, {imm}",
+    "c.bnez": "x{rs1}, {imm}",
+    "c.slli": "x{rd}, {imm}",
+    "c.lwsp": "x{rd}, {imm}(x2)",
+    "c.jr": "x{rs1}",
+    "c.mv": "x{rd}, x{rs2}",
+    "c.ebreak": "",
+    "c.jalr": "x{rs1}",
+    "c.add": "x{rd}, x{rs2}",
+    "c.swsp": "x{rs2}, {imm}(x2)",
+}
+
+def expand(half):
+    # The equivalent 32-bit instruction, or 0 (never a valid instruction) if half is reserved.
+    parsed = parse(half)
+    if parsed is None:
+        return 0
+    name, rd, rs1, rs2, imm = parsed
+    return EXPANSIONS[name](rd, rs1, rs2, imm)
+
+def format_compressed(half):
+    parsed = parse(half)
+    if parsed is None:
+        return "unknown"
+    name, rd, rs1, rs2, imm = parsed
+    operands = FORMATS[name].format(rd=rd, rs1=rs1, rs2=rs2, imm=imm, lui=imm << 12)
+    return f"{name} {operands}" if operands else name
+
+def ci(funct3, quadrant, rd, imm):
+    return (funct3 << 13) | (((imm >> 5) & 1) << 12) | (rd << 7) | ((imm & 0x1f) << 2) | quadrant
+
+def compress(word):
+    # The RV32C encoding of a 32-bit instruction, or None when it has no compressed form.
+    opcode = word & 0x7f
+    rd = bits(word, 11, 7)
+    funct3 = bits(word, 14, 12)
+    rs1 = bits(word, 19, 15)
+    rs2 = bits(word, 24, 20)
+    funct7 = bits(word, 31, 25)
+    imm = sign_extend(bits(word, 31, 20), 12)
+
+    if opcode == 0x13 and funct3 == 0x0:
+        if rd == 0 and rs1 == 0 and imm == 0:
+            return 0x0001
+        if rd == 2 and rs1 == 2 and imm and imm % 16 == 0 and -512 <= imm <= 496:
+            return (0x3 << 13) | (((imm >> 9) & 1) << 12) | (2 << 7) | (((imm >> 4) & 1) << 6) | (((imm >> 6) & 1) << 5) | (((imm >> 7) & 0x3) << 3) | (((imm >> 5) & 1) << 2) | 0x1
+        if rs1 == 2 and is_prime(rd) and 0 < imm <= 1020 and imm % 4 == 0:
+            return (((imm >> 4) & 0x3) << 11) | (((imm >> 6) & 0xf) << 7) | (((imm >> 2) & 1) << 6) | (((imm >> 3) & 1) << 5) | ((rd - 8) << 2)
+        if rd and rs1 == 0 and -32 <= imm <= 31:
+            return ci(0x2, 0x1, rd, imm)
+        if rd and rd == rs1 and imm and -32 <= imm <= 31:
+            return ci(0x0, 0x1, rd, imm)
+        if rd and rs1 and imm == 0:
+            return (0x4 << 13) | (rd << 7) | (rs1 << 2) | 0x2
+    elif opcode == 0x13 and rd and rd == rs1:
+        shamt = imm & 0x1f
+        if funct3 == 0x1 and funct7 == 0 and shamt:
+            return ci(0x0, 0x2, rd, shamt)
+        if funct3 == 0x5 and is_prime(rd) and shamt and funct7 in (0x00, 0x20):
+            return (0x4 << 13) | ((funct7 >> 5) << 10) | ((rd - 8) << 7) | (shamt << 2) | 0x1
+        if funct3 == 0x7 and is_prime(rd) and -32 <= imm <= 31:
+            return (0x4 << 13) | (((imm >> 5) & 1) << 12) | (0x2 << 10) | ((rd - 8) << 7) | ((imm & 0x1f) << 2) | 0x1
+    elif opcode == 0x33 and funct7 in (0x00, 0x20):
+        if funct3 == 0x0 and funct7 == 0 and rd and rs2:
+            if rs1 == 0:
+                return (0x4 << 13) | (rd << 7) | (rs2 << 2) | 0x2
+            if rs1 == rd:
+                return (0x4 << 13) | (1 << 12) | (rd << 7) | (rs2 << 2) | 0x2
+        if rd == rs1 and is_prime(rd) and is_prime(rs2):
+            op = {(0x0, 0x20): 0, (0x4, 0x00): 1, (0x6, 0x00): 2, (0x7, 0x00): 3}.get((funct3, funct7))
+            if op is not None:
+                return (0x4 << 13) | (0x3 << 10) | ((rd - 8) << 7) | (op << 5) | ((rs2 - 8) << 2) | 0x1
+    elif opcode == 0x37 and rd not in (0, 2):
+        upper = bits(word, 31, 12)
+        if upper and (upper <= 0x1f or upper >= 0xfffe0):
+            return ci(0x3, 0x1, rd, upper & 0x3f)
+    elif opcode == 0x03 and funct3 == 0x2 and imm >= 0 and imm % 4 == 0:
+        if rs1 == 2 and rd and imm <= 252:
+            return (0x2 << 13) | (((imm >> 5) & 1) << 12) | (rd << 7) | (((imm >> 2) & 0x7) << 4) | (((imm >> 6) & 0x3) << 2) | 0x2
+        if is_prime(rd) and is_prime(rs1) and imm <= 124:
+            return (0x2 << 13) | (((imm >> 3) & 0x7) << 10) | ((rs1 - 8) << 7) | (((imm >> 2) & 1) << 6) | (((imm >> 6) & 1) << 5) | ((rd - 8) << 2)
+    elif opcode == 0x23 and funct3 == 0x2:
+        offset = sign_extend((funct7 << 5) | rd, 12)
+        if offset >= 0 and offset % 4 == 0:
+            if rs1 == 2 and offset <= 252:
+                return (0x6 << 13) | (((offset >> 2) & 0xf) << 9) | (((offset >> 6) & 0x3) << 7) | (rs2 << 2) | 0x2
+            if is_prime(rs1) and is_prime(rs2) and offset <= 124:
+                return (0x6 << 13) | (((offset >> 3) & 0x7) << 10) | ((rs1 - 8) << 7) | (((offset >> 2) & 1) << 6) | (((offset >> 6) & 1) << 5) | ((rs2 - 8) << 2)
+    elif opcode == 0x63 and funct3 in (0x0, 0x1) and rs2 == 0 and is_prime(rs1):
+        offset = sign_extend((bits(word, 31, 31) << 12) | (bits(word, 7, 7) << 11) | (bits(word, 30, 25) << 5) | (bits(word, 11, 8) << 1), 13)
+        if -256 <= offset <= 254:
+            return ((0x6 | funct3) << 13) | (((offset >> 8) & 1) << 12) | (((offset >> 3) & 0x3) << 10) | ((rs1 - 8) << 7) | (((offset >> 6) & 0x3) << 5) | (((offset >> 1) & 0x3) << 3) | (((offset >> 5) & 1) << 2) | 0x1
+    elif opcode == 0x6f and rd in (0, 1):
+        offset = sign_extend((bits(word, 31, 31) << 20) | (bits(word, 19, 12) << 12) | (bits(word, 20, 20) << 11) | (bits(word, 30, 21) << 1), 21)
+        if -2048 <= offset <= 2046:
+            return ((0x5 if rd == 0 else 0x1) << 13) | (((offset >> 11) & 1) << 12) | (((offset >> 4) & 1) << 11) | (((offset >> 8) & 0x3) << 9) | (((offset >> 10) & 1) << 8) | (((offset >> 6) & 1) << 7) | (((offset >> 7) & 1) << 6) | (((offset >> 1) & 0x7) << 3) | (((offset >> 5) & 1) << 2) | 0x1
+    elif opcode == 0x67 and funct3 == 0x0 and imm == 0 and rs1 and rd in (0, 1):
+        return (0x4 << 13) | (rd << 12) | (rs1 << 7) | 0x2
+    elif word == 0x00100073:
+        return 0x9002
+    return None
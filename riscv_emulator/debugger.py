@@ -1,7 +1,11 @@
-from riscv_emulator.disassembler import disassemble
+import json, socket, struct, sys
+from itertools import islice
+from riscv_emulator.disassembler import disassemble, disassemble_bytes
 
 ABI_REGS = ['zero', 'ra', 'sp', 'gp', 'tp', 't0', 't1', 't2', 's0', 's1', 'a0', 'a1', 'a2', 'a3', 'a4',
     'a5', 'a6', 'a7', 's2', 's3', 's4', 's5', 's6', 's7', 's8', 's9', 's10', 's11', 't3', 't4', 't5', 't6']
+NUM_REGS = [f"x{i}" for i in range(32)]
+MAX_DUMP = 1 << 20
 
 def debugger(emu) :
     print("\nEntered Debugger - type 'help' for options.")
@@ -15,14 +19,12 @@ def debugger(emu) :
             print(" pc    →   show current program counter")
             print(" cont    →   continue execution")
             print(" step    →   one step of instruction")
+            print(" rstep [n]    →   step back [n] instructions (default 1)")
+            print(" rcont    →   run back to the previous EBREAK stop (or the oldest checkpoint)")
             print(" exit    →   exit emulator")
         elif cmd == "regs":
-            if emu.abi:
-                for i in range(32):
-                    print(f"{ABI_REGS[i]} = {emu.rg[i]}")
-            else:
-                for i in range(32):
-                    print(f"x{i} = {emu.rg[i]}")
+            names = ABI_REGS if emu.abi else NUM_REGS
+            print("\n".join(f"{name} = {value}" for name, value in zip(names, emu.registers())))
         elif cmd == "abi":
             emu.abi = True
             print("Swapped to ABI register naming")
@@ -50,22 +52,200 @@ def debugger(emu) :
                 except Exception as e:
                     print("Error in dsm:", e)
         elif cmd == "pc":
-            print(f"PC = {emu.pc:#x}")
+            print(f"PC = {format_pc(emu)}")
         elif cmd == "cont":
             break
         elif cmd == "step":
-            instr = int.from_bytes(emu.memory[emu.pc:emu.pc+4], byteorder='little')
-            emu.execute(instr)
-            print(f"Stepped one instruction to PC = {emu.pc:#x}")
+            if emu.history is not None:
+                result = emu.history.step()
+            else:
+                result = emu.run(max_instructions=1)
+            if result.exit_reason != "max_instructions":
+                print(f"Execution ended ({result.exit_reason}) at PC = {emu.pc:#x}")
+            else:
+                print(f"Stepped one instruction to PC = {format_pc(emu)}")
+        elif cmd.startswith("rstep") or cmd == "rcont":
+            if emu.history is None:
+                print("Reverse execution needs checkpoints (run with --checkpoint-interval).")
+                continue
+            try:
+                parts = cmd.split()
+                count = int(parts[1], 0) if len(parts) > 1 else 1
+            except ValueError:
+                print("Usage: rstep [n]")
+                continue
+            target = emu.instret - count
+            if cmd == "rcont":
+                reached = emu.history.continue_back()
+            else:
+                reached = emu.history.seek(target)
+            if cmd != "rcont" and reached > target:
+                print("Reached the oldest retained checkpoint; nothing earlier is available.")
+            print(f"Back to instruction {reached} at PC = {format_pc(emu)}")
         elif cmd == "exit":
             print("Exiting emulator...")
             exit()
         else:
             print("Command not recognized.")
 
+def format_pc(emu):
+    if emu.symbols is None:
+        return f"{emu.pc:#x}"
+    return f"{emu.pc:#x} <{emu.symbols.format(emu.pc)}>"
+
 def dump_memory(addr, memory, length=16):
-    print(f"Memory at {hex(addr)}:")
-    for i in range(0, length, 4):
-        chunk = memory[addr+i:addr+i+4]
-        val = int.from_bytes(chunk, byteorder='little')
-        print(f" {hex(addr+i)}: {val:08x}")
\ No newline at end of file
+    words = struct.iter_unpack("<I", memory.read(addr, length & ~3))
+    print("\n".join([f"Memory at {hex(addr)}:"] + [f" {hex(addr + 4 * i)}: {val:08x}" for i, (val,) in enumerate(words)]))
+
+def parse_int(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+class DebugSession:
+    # The debugger as a line protocol for scripts and test harnesses: one JSON request per line in, one
+    # JSON response per line out, written in a single call. Requests are {"cmd": ..., ...}; an "id" is
+    # echoed back. Commands that run code report only the registers that changed since the client last
+    # saw them.
+    def __init__(self, emu):
+        self.emu = emu
+        self.seen = emu.registers()
+        self.commands = {
+            "regs": self.regs,
+            "pc": self.pc,
+            "mem": self.mem,
+            "dsm": self.dsm,
+            "step": self.step,
+            "cont": self.cont,
+            "rstep": self.rstep,
+            "rcont": self.rcont,
+            "abi": self.set_abi,
+            "numreg": self.set_abi,
+        }
+
+    def handle(self, request):
+        command = self.commands.get(request.get("cmd"))
+        if command is None:
+            return {"ok": False, "error": f"unknown command: {request.get('cmd')!r}"}
+        try:
+            response = command(request)
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        response["ok"] = True
+        return response
+
+    def serve(self, reader, writer):
+        # Runs until "exit" or end of input. EBREAK stops a run instead of opening the interactive debugger.
+        on_ebreak = self.emu.on_ebreak
+        self.emu.on_ebreak = lambda emu: True
+        try:
+            for line in reader:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be an object")
+                except ValueError as e:
+                    request, response = {}, {"ok": False, "error": f"bad request: {e}"}
+                else:
+                    response = {"ok": True} if request.get("cmd") == "exit" else self.handle(request)
+                if "id" in request:
+                    response["id"] = request["id"]
+                writer.write(json.dumps(response) + "\n")
+                writer.flush()
+                if request.get("cmd") == "exit":
+                    break
+        finally:
+            self.emu.on_ebreak = on_ebreak
+
+    def names(self):
+        return ABI_REGS if self.emu.abi else NUM_REGS
+
+    def changed(self):
+        # Register names are only rendered for registers that differ from what the client last saw.
+        current = self.emu.registers()
+        names = self.names()
+        changed = {names[i]: value for i, (value, old) in enumerate(zip(current, self.seen)) if value != old}
+        self.seen = current
+        return changed
+
+    def position(self):
+        emu = self.emu
+        return {"pc": emu.pc, "symbol": emu.symbols.format(emu.pc) if emu.symbols is not None else None, "instret": emu.instret}
+
+    def regs(self, request):
+        self.seen = self.emu.registers()
+        return {"registers": dict(zip(self.names(), self.seen)), **self.position()}
+
+    def pc(self, request):
+        return self.position()
+
+    def mem(self, request):
+        address = parse_int(request["address"])
+        length = parse_int(request.get("length", 16))
+        if not 0 <= length <= MAX_DUMP:
+            raise ValueError(f"length must be between 0 and {MAX_DUMP}")
+        data = "".join(view.hex() for view in self.emu.memory.views(address, length))
+        return {"address": address, "data": data}
+
+    def dsm(self, request):
+        address = parse_int(request.get("address", self.emu.pc))
+        count = parse_int(request.get("count", 1))
+        entries = islice(disassemble_bytes(self.emu.memory.read(address, 4 * count), address, self.emu.symbols), count)
+        return {"instructions": [{"address": pc, "word": word, "text": text} for pc, word, _, text in entries]}
+
+    def run(self, result):
+        return {"reason": result.exit_reason, "exit_code": result.exit_code, **self.position(), "changed": self.changed()}
+
+    def step(self, request):
+        count = parse_int(request.get("count", 1))
+        if self.emu.history is not None:
+            return self.run(self.emu.history.step(count))
+        return self.run(self.emu.run(count))
+
+    def cont(self, request):
+        limit = request.get("max_instructions")
+        limit = parse_int(limit) if limit is not None else None
+        if self.emu.history is not None:
+            return self.run(self.emu.history.run(limit))
+        return self.run(self.emu.run(limit))
+
+    def rstep(self, request):
+        history = self.require_history()
+        history.seek(self.emu.instret - parse_int(request.get("count", 1)))
+        return {**self.position(), "changed": self.changed()}
+
+    def rcont(self, request):
+        self.require_history().continue_back()
+        return {**self.position(), "changed": self.changed()}
+
+    def require_history(self):
+        if self.emu.history is None:
+            raise ValueError("reverse execution needs checkpoints (--checkpoint-interval)")
+        return self.emu.history
+
+    def set_abi(self, request):
+        self.emu.abi = request["cmd"] == "abi"
+        return {}
+
+def split_address(source):
+    # "[host]:port" -> (host, port), with the host defaulting to loopback; None for anything else.
+    host, colon, port = source.rpartition(":")
+    if not colon or not port.isdigit():
+        return None
+    return host or "127.0.0.1", int(port)
+
+def serve_debug(emu, source):
+    # source is a file of requests, "-" for stdin, or [host]:port to accept one TCP connection.
+    address = split_address(source)
+    if address is not None:
+        with socket.create_server(address) as server:
+            connection, _ = server.accept()
+        with connection:
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with connection.makefile("r", encoding="utf-8") as reader, connection.makefile("w", encoding="utf-8") as writer:
+                DebugSession(emu).serve(reader, writer)
+    elif source == "-":
+        DebugSession(emu).serve(sys.stdin, sys.stdout)
+    else:
+        with open(source) as reader:
+            DebugSession(emu).serve(reader, sys.stdout)
\ No newline at end of file
@@ -0,0 +1,79 @@
+import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FIELDS = ("word", "opcode", "rd", "funct3", "rs1", "rs2", "funct7",
+          "imm_i", "imm_s", "imm_b", "imm_u", "imm_j", "imm")
+RECORD_FIELDS = ("opcode", "rd", "funct3", "rs1", "rs2", "funct7", "imm")
+
+I_OPCODES = (0x13, 0x03, 0x67, 0x73)
+U_OPCODES = (0x37, 0x17)
+
+def sign_extend(value, bits):
+    # Works on ints and whole arrays alike; value must already be masked to bits.
+    sign_bit = 1 << (bits - 1)
+    return (value ^ sign_bit) - sign_bit
+
+def split_fields(word):
+    opcode = word & 0x7f
+    rd = (word >> 7) & 0x1f
+    funct3 = (word >> 12) & 0x7
+    rs1 = (word >> 15) & 0x1f
+    rs2 = (word >> 20) & 0x1f
+    funct7 = (word >> 25) & 0x7f
+    imm_i = sign_extend((word >> 20) & 0xfff, 12)
+    imm_s = sign_extend((funct7 << 5) | rd, 12)
+    imm_b = sign_extend((((word >> 8) & 0xf) << 1) | (((word >> 25) & 0x3f) << 5)
+                        | (((word >> 7) & 0x1) << 11) | (((word >> 31) & 0x1) << 12), 13)
+    imm_u = (word >> 12) & 0xfffff
+    imm_j = sign_extend((((word >> 21) & 0x3ff) << 1) | (((word >> 20) & 0x1) << 11)
+                        | (((word >> 12) & 0xff) << 12) | (((word >> 31) & 0x1) << 20), 21)
+    return opcode, rd, funct3, rs1, rs2, funct7, imm_i, imm_s, imm_b, imm_u, imm_j
+
+def decode_numpy(data):
+    words = np.frombuffer(data, dtype="<u4").astype(np.int64)
+    fields = split_fields(words)
+    opcode = fields[0]
+    imm_i, imm_s, imm_b, imm_u, imm_j = fields[6:]
+    imm = np.select([np.isin(opcode, I_OPCODES), opcode == 0x23, opcode == 0x63, opcode == 0x6f, np.isin(opcode, U_OPCODES)],
+                    [imm_i, imm_s, imm_b, imm_j, imm_u], 0)
+    return dict(zip(FIELDS, (words,) + fields + (imm,)))
+
+def decode_array(data):
+    words = array("I")
+    words.frombytes(data)
+    if sys.byteorder == "big":
+        words.byteswap()
+    opcode = array("I", [word & 0x7f for word in words])
+    rd = array("I", [(word >> 7) & 0x1f for word in words])
+    funct7 = array("I", [word >> 25 for word in words])
+    imm_i = array("i", [((word >> 20) ^ 0x800) - 0x800 for word in words])
+    imm_s = array("i", [(((word >> 20) & 0xfe0 | (word >> 7) & 0x1f) ^ 0x800) - 0x800 for word in words])
+    imm_b = array("i", [(((word >> 19) & 0x1000 | (word << 4) & 0x800 | (word >> 20) & 0x7e0 | (word >> 7) & 0x1e) ^ 0x1000) - 0x1000 for word in words])
+    imm_u = array("i", [word >> 12 for word in words])
+    imm_j = array("i", [(((word >> 11) & 0x100000 | word & 0xff000 | (word >> 9) & 0x800 | (word >> 20) & 0x7fe) ^ 0x100000) - 0x100000 for word in words])
+    formats = {op: imm_i for op in I_OPCODES}
+    formats.update({0x23: imm_s, 0x63: imm_b, 0x6f: imm_j, 0x37: imm_u, 0x17: imm_u})
+    imm = array("i", [formats[op][index] if op in formats else 0 for index, op in enumerate(opcode)])
+    return {"word": words, "opcode": opcode, "rd": rd,
+            "funct3": array("I", [(word >> 12) & 0x7 for word in words]),
+            "rs1": array("I", [(word >> 15) & 0x1f for word in words]),
+            "rs2": array("I", [(word >> 20) & 0x1f for word in words]),
+            "funct7": funct7, "imm_i": imm_i, "imm_s": imm_s, "imm_b": imm_b,
+            "imm_u": imm_u, "imm_j": imm_j, "imm": imm}
+
+def decode_image(data):
+    # Columnar decode of a whole image: one array per field, indexed by word. A trailing partial word is ignored.
+    view = memoryview(data).cast("B")
+    view = view[:len(view) & ~3]
+    if np is not None:
+        return decode_numpy(view)
+    return decode_array(view)
+
+def records(columns):
+    # Rows in the emulator's decode-cache layout, minus the handler.
+    return zip(*(columns[name].tolist() for name in RECORD_FIELDS))
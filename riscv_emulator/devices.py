@@ -0,0 +1,99 @@
+import sys, time
+from collections import deque
+from riscv_emulator.syscalls import write_output, FLUSH_THRESHOLD
+
+# Addresses of the QEMU "virt" machine, so firmware built for it finds the devices where it expects them.
+UART_BASE = 0x10000000
+CLINT_BASE = 0x02000000
+
+class Device:
+    # read() and write() get the offset from the device's base address and the access size in bytes.
+    size = 0x1000
+
+    def read(self, offset, size):
+        return 0
+
+    def write(self, offset, size, value):
+        pass
+
+    def flush(self):
+        pass
+
+class Uart(Device):
+    # The 16550 registers firmware actually polls: THR/RBR at 0 and LSR at 5. The transmitter is always ready.
+    size = 0x100
+    THR = RBR = 0x0
+    LSR = 0x5
+    LSR_DATA_READY = 0x01
+    LSR_TX_IDLE = 0x60
+
+    def __init__(self, output=None):
+        self.output = output
+        self.buffer = bytearray()
+        self.input = deque()
+
+    def feed(self, data):
+        self.input.extend(data)
+
+    def read(self, offset, size):
+        if offset == self.RBR:
+            return self.input.popleft() if self.input else 0
+        if offset == self.LSR:
+            return self.LSR_TX_IDLE | (self.LSR_DATA_READY if self.input else 0)
+        return 0
+
+    def write(self, offset, size, value):
+        if offset == self.THR:
+            self.buffer.append(value & 0xff)
+            if len(self.buffer) >= FLUSH_THRESHOLD:
+                self.flush()
+
+    def flush(self):
+        if self.buffer:
+            write_output(self.output or sys.stdout, self.buffer)
+            self.buffer.clear()
+
+class Clint(Device):
+    # msip, mtimecmp and mtime at the SiFive/QEMU offsets. mtime counts at frequency Hz of clock(), in nanoseconds.
+    size = 0x10000
+    REGISTERS = {"msip": (0x0, 4), "mtimecmp": (0x4000, 8), "mtime": (0xbff8, 8)}
+
+    def __init__(self, frequency=10_000_000, clock=time.monotonic_ns):
+        self.frequency = frequency
+        self.clock = clock
+        self.start = clock()
+        self.msip = 0
+        self.mtimecmp = 0xffffffffffffffff
+
+    @property
+    def mtime(self):
+        return ((self.clock() - self.start) * self.frequency // 1_000_000_000) & 0xffffffffffffffff
+
+    @mtime.setter
+    def mtime(self, value):
+        self.start = self.clock() - value * 1_000_000_000 // self.frequency
+
+    def timer_pending(self):
+        return self.mtime >= self.mtimecmp
+
+    def register(self, offset):
+        for name, (base, width) in self.REGISTERS.items():
+            if base <= offset < base + width:
+                return name, (offset - base) << 3, ((1 << (width << 3)) - 1)
+        return None, 0, 0
+
+    def read(self, offset, size):
+        name, shift, _ = self.register(offset)
+        if name is None:
+            return 0
+        return (getattr(self, name) >> shift) & ((1 << (size << 3)) - 1)
+
+    def write(self, offset, size, value):
+        name, shift, width = self.register(offset)
+        if name is None:
+            return
+        mask = ((1 << (size << 3)) - 1) << shift
+        setattr(self, name, ((getattr(self, name) & ~mask) | ((value << shift) & mask)) & width)
+
+def standard_devices():
+    return [(UART_BASE, Uart()), (CLINT_BASE, Clint())]
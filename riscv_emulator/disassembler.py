@@ -1,3 +1,8 @@
+import mmap, os
+from riscv_emulator.symbols import load_symbols
+from riscv_emulator.elf import MAGIC as ELF_MAGIC, PF_X, parse_elf
+from riscv_emulator.compressed import expand, format_compressed
+
 def sign_extend(value, bits):
     sign_bit = 1 << (bits - 1)
     return (value & (sign_bit - 1)) - (value & sign_bit)
@@ -14,6 +19,14 @@ INSTRUCTION_SET = {
         (0x5, 0x20): "sra",
         (0x6, 0x00): "or",
         (0x7, 0x00): "and",
+        (0x0, 0x01): "mul",
+        (0x1, 0x01): "mulh",
+        (0x2, 0x01): "mulhsu",
+        (0x3, 0x01): "mulhu",
+        (0x4, 0x01): "div",
+        (0x5, 0x01): "divu",
+        (0x6, 0x01): "rem",
+        (0x7, 0x01): "remu",
     },
     0x13: {
         0x0: "addi",
@@ -52,17 +65,61 @@ INSTRUCTION_SET = {
     0x17: "auipc",
     0x6F: "jal",
     0x73: {
-        0x0: {0: "ecall", 1: "ebreak"}
-    }
+        0x0: {0: "ecall", 1: "ebreak"},
+        0x1: "csrrw",
+        0x2: "csrrs",
+        0x3: "csrrc",
+        0x5: "csrrwi",
+        0x6: "csrrsi",
+        0x7: "csrrci",
+    },
+    0x2F: {
+        (0x2, 0x02): "lr.w",
+        (0x2, 0x03): "sc.w",
+        (0x2, 0x01): "amoswap.w",
+        (0x2, 0x00): "amoadd.w",
+        (0x2, 0x04): "amoxor.w",
+        (0x2, 0x0C): "amoand.w",
+        (0x2, 0x08): "amoor.w",
+        (0x2, 0x10): "amomin.w",
+        (0x2, 0x14): "amomax.w",
+        (0x2, 0x18): "amominu.w",
+        (0x2, 0x1C): "amomaxu.w",
+    },
 }
 
+CSR_NAMES = {
+    0x300: "mstatus",
+    0x305: "mtvec",
+    0x340: "mscratch",
+    0x341: "mepc",
+    0x342: "mcause",
+    0xF14: "mhartid",
+}
+
+DECODE_MEMO = {}
+DECODE_MEMO_LIMIT = 1 << 16
+BRANCH_OPCODES = (0x63, 0x6F)
+
 def get_bits(val, start, end):
     mask = (1 << (end - start + 1)) - 1
     return (val >> start) & mask
 
 def disassemble(hexcode):
-    
-    instr = int(hexcode, 16)
+    return disassemble_word(int(hexcode, 16))
+
+def disassemble_word(instr):
+    # Anything whose low two bits are not 0b11 is a 16-bit RV32C instruction in the low half.
+    if instr & 0x3 != 0x3:
+        instr &= 0xffff
+    text = DECODE_MEMO.get(instr)
+    if text is None:
+        if len(DECODE_MEMO) >= DECODE_MEMO_LIMIT:
+            DECODE_MEMO.clear()
+        text = DECODE_MEMO[instr] = decode_word(instr) if instr & 0x3 == 0x3 else format_compressed(instr)
+    return text
+
+def decode_word(instr):
     opcode = get_bits(instr, 0, 6)
     if opcode == 0x33:
         rd = get_bits(instr, 7, 11)
@@ -130,9 +187,99 @@ def disassemble(hexcode):
         mnemonic = INSTRUCTION_SET[opcode]
         return f"{mnemonic} x{rd}, {imm}"
     elif opcode == 0x73:
+        rd = get_bits(instr, 7, 11)
         funct3 = get_bits(instr, 12, 14)
+        rs1 = get_bits(instr, 15, 19)
         imm = get_bits(instr, 20, 31)
         sys_map = INSTRUCTION_SET[opcode].get(funct3)
+        if isinstance(sys_map, str):
+            csr = CSR_NAMES.get(imm, f"{imm:#x}")
+            source = rs1 if funct3 & 0x4 else f"x{rs1}"
+            return f"{sys_map} x{rd}, {csr}, {source}"
         if sys_map and imm in sys_map:
             return sys_map[imm]
-    return "unknown"
\ No newline at end of file
+    elif opcode == 0x2F:
+        rd = get_bits(instr, 7, 11)
+        funct3 = get_bits(instr, 12, 14)
+        rs1 = get_bits(instr, 15, 19)
+        rs2 = get_bits(instr, 20, 24)
+        mnemonic = INSTRUCTION_SET[opcode].get((funct3, get_bits(instr, 27, 31)))
+        if mnemonic == "lr.w":
+            return f"{mnemonic} x{rd}, (x{rs1})"
+        if mnemonic:
+            return f"{mnemonic} x{rd}, x{rs2}, (x{rs1})"
+    return "unknown"
+
+def branch_target(instr, address):
+    if instr & 0x3 != 0x3:
+        instr = expand(instr)
+    if instr & 0x7f == 0x63:
+        imm = ((get_bits(instr, 31, 31) << 12) | (get_bits(instr, 7, 7) << 11) | (get_bits(instr, 25, 30) << 5) | (get_bits(instr, 8, 11) << 1))
+        return (address + sign_extend(imm, 13)) & 0xffffffff
+    imm = ((get_bits(instr, 31, 31) << 20) | (get_bits(instr, 12, 19) << 12) | (get_bits(instr, 20, 20) << 11) | (get_bits(instr, 21, 30) << 1))
+    return (address + sign_extend(imm, 21)) & 0xffffffff
+
+def instructions(view):
+    # Walks mixed 16/32-bit code; an aligned all-zero word is consumed whole so data and padding stay compact.
+    end = len(view)
+    pos = 0
+    while pos + 2 <= end:
+        instr = view[pos] | (view[pos + 1] << 8)
+        if instr & 0x3 == 0x3 or (instr == 0 and not pos & 0x3):
+            if pos + 4 > end:
+                return
+            instr |= (view[pos + 2] << 16) | (view[pos + 3] << 24)
+            yield pos, instr
+            pos += 4
+        else:
+            yield pos, instr
+            pos += 2
+
+def disassemble_bytes(data, address=0, symbols=None):
+    # Yields (address, word, label, text); label is the symbol defined exactly at address, if any.
+    view = memoryview(data).cast("B")
+    start = address
+    for offset, instr in instructions(view):
+        address = start + offset
+        text = disassemble_word(instr)
+        label = None
+        if symbols is not None:
+            found = symbols.lookup(address)
+            if found is not None and found[1] == 0:
+                label = found[0]
+            if (instr if instr & 0x3 == 0x3 else expand(instr)) & 0x7f in BRANCH_OPCODES:
+                text = f"{text}  <{symbols.format(branch_target(instr, address))}>"
+        yield address, instr, label, text
+
+def disassemble_view(view, path, address, symbols):
+    # ELF files list their executable segments at their virtual addresses; anything else is one flat image.
+    if bytes(view[:4]) == ELF_MAGIC:
+        image = parse_elf(view, path)
+        for segment in image.segments:
+            if segment.flags & PF_X:
+                yield from disassemble_bytes(view[segment.offset:segment.offset + segment.file_size], segment.address,
+                                             image.symbols if symbols is None else symbols)
+        return
+    if symbols is None:
+        sym_path = os.path.splitext(path)[0] + ".sym"
+        if os.path.exists(sym_path):
+            symbols = load_symbols(sym_path)
+    yield from disassemble_bytes(view, address, symbols)
+
+def disassemble_file(path, address=0, symbols=None):
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            yield from disassemble_view(memoryview(f.read()), path, address, symbols)
+            return
+    with mapped:
+        with memoryview(mapped) as view:
+            yield from disassemble_view(view, path, address, symbols)
+
+def format_listing(entries):
+    for address, instr, label, text in entries:
+        if label is not None:
+            yield f"{label}:"
+        encoding = f"{instr:08x}" if instr & 0x3 == 0x3 or instr == 0 else f"{instr:04x}    "
+        yield f"{address:08x}:  {encoding}  {text}"
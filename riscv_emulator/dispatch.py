@@ -0,0 +1,397 @@
+from riscv_emulator.disassembler import INSTRUCTION_SET
+
+def to_signed(value):
+    return value - 0x100000000 if value & 0x80000000 else value
+
+def mulh(a, b):
+    return ((to_signed(a & 0xffffffff) * to_signed(b & 0xffffffff)) >> 32) & 0xffffffff
+
+def mulhsu(a, b):
+    return ((to_signed(a & 0xffffffff) * (b & 0xffffffff)) >> 32) & 0xffffffff
+
+def mulhu(a, b):
+    return ((a & 0xffffffff) * (b & 0xffffffff)) >> 32
+
+def divide(a, b):
+    # Rounds toward zero; x / 0 is -1 and -2**31 / -1 wraps back to -2**31, as the spec requires.
+    a = to_signed(a & 0xffffffff)
+    b = to_signed(b & 0xffffffff)
+    if b == 0:
+        return 0xffffffff
+    quotient = abs(a) // abs(b)
+    return (-quotient if (a < 0) != (b < 0) else quotient) & 0xffffffff
+
+def divideu(a, b):
+    b &= 0xffffffff
+    return (a & 0xffffffff) // b if b else 0xffffffff
+
+def remainder(a, b):
+    # Takes the sign of the dividend; x % 0 is x and -2**31 % -1 is 0.
+    a = to_signed(a & 0xffffffff)
+    b = to_signed(b & 0xffffffff)
+    if b == 0:
+        return a & 0xffffffff
+    rem = abs(a) % abs(b)
+    return (-rem if a < 0 else rem) & 0xffffffff
+
+def remainderu(a, b):
+    b &= 0xffffffff
+    return (a & 0xffffffff) % b if b else a & 0xffffffff
+
+MULDIV = {
+    0x0: lambda a, b: (a * b) & 0xffffffff,
+    0x1: mulh,
+    0x2: mulhsu,
+    0x3: mulhu,
+    0x4: divide,
+    0x5: divideu,
+    0x6: remainder,
+    0x7: remainderu,
+}
+
+def op_add(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] + rg[rs2]) & 0xffffffff
+    return pc + 4
+
+def op_sub(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] - rg[rs2]) & 0xffffffff
+    return pc + 4
+
+def op_sll(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] << (rg[rs2] & 0x1f)) & 0xffffffff
+    return pc + 4
+
+def op_slt(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = 1 if to_signed(rg[rs1]) < to_signed(rg[rs2]) else 0
+    return pc + 4
+
+def op_sltu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = 1 if rg[rs1] < rg[rs2] else 0
+    return pc + 4
+
+def op_xor(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] ^ rg[rs2]) & 0xffffffff
+    return pc + 4
+
+def op_srl(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = rg[rs1] >> (rg[rs2] & 0x1f)
+    return pc + 4
+
+def op_sra(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (to_signed(rg[rs1]) >> (rg[rs2] & 0x1f)) & 0xffffffff
+    return pc + 4
+
+def op_or(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] | rg[rs2]) & 0xffffffff
+    return pc + 4
+
+def op_and(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] & rg[rs2]) & 0xffffffff
+    return pc + 4
+
+def op_mul(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] * rg[rs2]) & 0xffffffff
+    return pc + 4
+
+def op_mulh(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = mulh(rg[rs1], rg[rs2])
+    return pc + 4
+
+def op_mulhsu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = mulhsu(rg[rs1], rg[rs2])
+    return pc + 4
+
+def op_mulhu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = mulhu(rg[rs1], rg[rs2])
+    return pc + 4
+
+def op_div(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = divide(rg[rs1], rg[rs2])
+    return pc + 4
+
+def op_divu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = divideu(rg[rs1], rg[rs2])
+    return pc + 4
+
+def op_rem(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = remainder(rg[rs1], rg[rs2])
+    return pc + 4
+
+def op_remu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = remainderu(rg[rs1], rg[rs2])
+    return pc + 4
+
+def op_addi(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] + imm) & 0xffffffff
+    return pc + 4
+
+def op_slti(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = 1 if to_signed(rg[rs1]) < imm else 0
+    return pc + 4
+
+def op_sltiu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = 1 if rg[rs1] < (imm & 0xffffffff) else 0
+    return pc + 4
+
+def op_xori(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] ^ imm) & 0xffffffff
+    return pc + 4
+
+def op_ori(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] | imm) & 0xffffffff
+    return pc + 4
+
+def op_andi(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] & imm) & 0xffffffff
+    return pc + 4
+
+def op_slli(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (rg[rs1] << (imm & 0x1f)) & 0xffffffff
+    return pc + 4
+
+def op_srli(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = rg[rs1] >> (imm & 0x1f)
+    return pc + 4
+
+def op_srai(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = (to_signed(rg[rs1]) >> (imm & 0x1f)) & 0xffffffff
+    return pc + 4
+
+def op_lb(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    val = emu.memory.load(rg[rs1] + imm, 1)
+    rg[rd] = (val - 0x100 if val & 0x80 else val) & 0xffffffff
+    return pc + 4
+
+def op_lh(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    val = emu.memory.load(rg[rs1] + imm, 2)
+    rg[rd] = (val - 0x10000 if val & 0x8000 else val) & 0xffffffff
+    return pc + 4
+
+def op_lw(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = emu.memory.load(rg[rs1] + imm, 4)
+    return pc + 4
+
+def op_lbu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = emu.memory.load(rg[rs1] + imm, 1)
+    return pc + 4
+
+def op_lhu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    rg[rd] = emu.memory.load(rg[rs1] + imm, 2)
+    return pc + 4
+
+def op_sb(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    address = (rg[rs1] + imm) & 0xffffffff
+    emu.memory.store(address, 1, rg[rs2])
+    emu.invalidate(address, 1)
+    return pc + 4
+
+def op_sh(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    address = (rg[rs1] + imm) & 0xffffffff
+    emu.memory.store(address, 2, rg[rs2])
+    emu.invalidate(address, 2)
+    return pc + 4
+
+def op_sw(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    address = (rg[rs1] + imm) & 0xffffffff
+    emu.memory.store(address, 4, rg[rs2])
+    emu.invalidate(address, 4)
+    return pc + 4
+
+def op_beq(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    return pc + imm if rg[rs1] == rg[rs2] else pc + 4
+
+def op_bne(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    return pc + imm if rg[rs1] != rg[rs2] else pc + 4
+
+def op_blt(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    return pc + imm if to_signed(rg[rs1]) < to_signed(rg[rs2]) else pc + 4
+
+def op_bge(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    return pc + imm if to_signed(rg[rs1]) >= to_signed(rg[rs2]) else pc + 4
+
+def op_bltu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    return pc + imm if rg[rs1] < rg[rs2] else pc + 4
+
+def op_bgeu(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    return pc + imm if rg[rs1] >= rg[rs2] else pc + 4
+
+def op_jal(emu, pc, rd, rs1, rs2, imm):
+    emu.rg[rd] = pc + 4
+    return pc + imm
+
+def op_jalr(emu, pc, rd, rs1, rs2, imm):
+    rg = emu.rg
+    target = (rg[rs1] + imm) & 0xfffffffe
+    rg[rd] = pc + 4
+    return target
+
+def op_lui(emu, pc, rd, rs1, rs2, imm):
+    emu.rg[rd] = (imm << 12) & 0xffffffff
+    return pc + 4
+
+def op_auipc(emu, pc, rd, rs1, rs2, imm):
+    emu.rg[rd] = (pc + (imm << 12)) & 0xffffffff
+    return pc + 4
+
+def op_ecall(emu, pc, rd, rs1, rs2, imm):
+    return emu.ecall(pc)
+
+def op_ebreak(emu, pc, rd, rs1, rs2, imm):
+    return emu.ebreak(pc)
+
+def op_lr_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x02, rd, rs1, rs2)
+    return pc + 4
+
+def op_sc_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x03, rd, rs1, rs2)
+    return pc + 4
+
+def op_amoswap_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x01, rd, rs1, rs2)
+    return pc + 4
+
+def op_amoadd_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x00, rd, rs1, rs2)
+    return pc + 4
+
+def op_amoxor_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x04, rd, rs1, rs2)
+    return pc + 4
+
+def op_amoand_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x0c, rd, rs1, rs2)
+    return pc + 4
+
+def op_amoor_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x08, rd, rs1, rs2)
+    return pc + 4
+
+def op_amomin_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x10, rd, rs1, rs2)
+    return pc + 4
+
+def op_amomax_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x14, rd, rs1, rs2)
+    return pc + 4
+
+def op_amominu_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x18, rd, rs1, rs2)
+    return pc + 4
+
+def op_amomaxu_w(emu, pc, rd, rs1, rs2, imm):
+    emu.atomic(0x1c, rd, rs1, rs2)
+    return pc + 4
+
+def op_csrrw(emu, pc, rd, rs1, rs2, imm):
+    emu.access_csr(0x1, rd, rs1, imm)
+    return pc + 4
+
+def op_csrrs(emu, pc, rd, rs1, rs2, imm):
+    emu.access_csr(0x2, rd, rs1, imm)
+    return pc + 4
+
+def op_csrrc(emu, pc, rd, rs1, rs2, imm):
+    emu.access_csr(0x3, rd, rs1, imm)
+    return pc + 4
+
+def op_csrrwi(emu, pc, rd, rs1, rs2, imm):
+    emu.access_csr(0x5, rd, rs1, imm)
+    return pc + 4
+
+def op_csrrsi(emu, pc, rd, rs1, rs2, imm):
+    emu.access_csr(0x6, rd, rs1, imm)
+    return pc + 4
+
+def op_csrrci(emu, pc, rd, rs1, rs2, imm):
+    emu.access_csr(0x7, rd, rs1, imm)
+    return pc + 4
+
+def op_unknown(emu, pc, rd, rs1, rs2, imm):
+    return pc + 4
+
+HANDLERS = {name[3:].replace("_", "."): handler for name, handler in globals().items() if name.startswith("op_")}
+
+def build_dispatch_table():
+    table = {}
+    for opcode, entry in INSTRUCTION_SET.items():
+        if isinstance(entry, str):
+            table[(opcode, 0, 0)] = HANDLERS[entry]
+            continue
+        for key, name in entry.items():
+            if isinstance(key, tuple):
+                table[(opcode,) + key] = HANDLERS[name]
+            elif isinstance(name, str):
+                table[(opcode, key, 0)] = HANDLERS[name]
+            else:
+                for sub_key, sub_name in name.items():
+                    table[(opcode, key, sub_key)] = HANDLERS[sub_name]
+    return table
+
+DISPATCH_TABLE = build_dispatch_table()
+
+def dispatch_key(opcode, funct3, funct7, imm):
+    if opcode == 0x33 or (opcode == 0x13 and funct3 in (0x1, 0x5)):
+        return (opcode, funct3, funct7)
+    if opcode in (0x37, 0x17, 0x6f):
+        return (opcode, 0, 0)
+    if opcode == 0x73 and funct3 == 0x0:
+        return (opcode, funct3, imm)
+    if opcode == 0x2f:
+        return (opcode, funct3, funct7 >> 2)
+    return (opcode, funct3, 0)
+
+COMPRESSED_HANDLERS = {}
+
+def compressed(handler):
+    # A compressed instruction at pc behaves exactly like its expansion at pc - 2.
+    wrapper = COMPRESSED_HANDLERS.get(handler)
+    if wrapper is None:
+        def wrapper(emu, pc, rd, rs1, rs2, imm):
+            return handler(emu, pc - 2, rd, rs1, rs2, imm)
+        COMPRESSED_HANDLERS[handler] = wrapper
+    return wrapper
+
+def lookup(opcode, funct3, funct7, imm):
+    return DISPATCH_TABLE.get(dispatch_key(opcode, funct3, funct7, imm), op_unknown)
@@ -0,0 +1,86 @@
+import struct
+from riscv_emulator.symbols import SymbolTable
+
+MAGIC = b"\x7fELF"
+HEADER = struct.Struct("<16sHHIIIIIHHHHHH")
+PROGRAM_HEADER = struct.Struct("<8I")
+SECTION_HEADER = struct.Struct("<10I")
+SYMBOL = struct.Struct("<IIIBBH")
+
+ELFCLASS32 = 1
+ELFDATA2LSB = 1
+EM_RISCV = 243
+PT_LOAD = 1
+PF_X = 0x1
+SHT_SYMTAB = 2
+SHN_UNDEF = 0
+SHN_ABS = 0xfff1
+STT_SECTION = 3
+STT_FILE = 4
+STB_LOCAL = 0
+
+class Segment:
+    def __init__(self, address, offset, file_size, memory_size, flags):
+        self.address = address
+        self.offset = offset
+        self.file_size = file_size
+        self.memory_size = memory_size
+        self.flags = flags
+
+class ElfImage:
+    def __init__(self, entry, segments, symbols):
+        self.entry = entry
+        self.segments = segments
+        self.symbols = symbols
+        self.end = max((segment.address + segment.memory_size for segment in segments), default=0)
+
+def is_elf(path):
+    with open(path, "rb") as f:
+        return f.read(4) == MAGIC
+
+def read_symbols(view, sections):
+    # Labels only: undefined, absolute (.equ), section, file and assembler-local ($x, .L) symbols are skipped.
+    entries = []
+    for kind, link, offset, size, entsize in sections:
+        if kind != SHT_SYMTAB:
+            continue
+        _, _, start, length, _ = sections[link]
+        strings = bytes(view[start:start + length])
+        for pos in range(offset, offset + size, entsize or SYMBOL.size):
+            name, value, _, info, _, shndx = SYMBOL.unpack_from(view, pos)
+            if shndx in (SHN_UNDEF, SHN_ABS) or info & 0xf in (STT_SECTION, STT_FILE):
+                continue
+            label = strings[name:strings.find(b"\0", name)].decode(errors="replace")
+            if label and not label.startswith(("$", ".L")):
+                entries.append((info >> 4 == STB_LOCAL, label, value))
+    table = SymbolTable()
+    # Globals win when several names share an address.
+    for _, label, value in sorted(entries, key=lambda entry: entry[0]):
+        table.add(label, value)
+    return table
+
+def parse_elf(view, path="<elf>"):
+    if len(view) < HEADER.size or bytes(view[:4]) != MAGIC:
+        raise ValueError(f"Not an ELF file: {path}")
+    ident, _, machine, _, entry, phoff, shoff, _, _, phentsize, phnum, shentsize, shnum, _ = HEADER.unpack_from(view)
+    if ident[4] != ELFCLASS32 or ident[5] != ELFDATA2LSB or machine != EM_RISCV:
+        raise ValueError(f"Not a little-endian RV32 ELF file: {path}")
+    segments = []
+    for index in range(phnum):
+        kind, offset, address, _, file_size, memory_size, flags, _ = PROGRAM_HEADER.unpack_from(view, phoff + index * phentsize)
+        if kind == PT_LOAD:
+            segments.append(Segment(address, offset, file_size, memory_size, flags))
+    sections = []
+    for index in range(shnum):
+        fields = SECTION_HEADER.unpack_from(view, shoff + index * shentsize)
+        sections.append((fields[1], fields[6], fields[4], fields[5], fields[9]))
+    return ElfImage(entry, segments, read_symbols(view, sections))
+
+def load_elf(memory, path):
+    view = memory.open_file(path)
+    image = parse_elf(view, path)
+    for segment in image.segments:
+        memory.map_view(view[segment.offset:segment.offset + segment.file_size], segment.address)
+        if segment.memory_size > segment.file_size:
+            memory.zero_fill(segment.address + segment.file_size, segment.memory_size - segment.file_size)
+    return image
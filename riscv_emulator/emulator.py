@@ -1,50 +1,559 @@
+import time
 from riscv_emulator.debugger import debugger
 from riscv_emulator.assembler import assemble
+from riscv_emulator.dispatch import lookup, compressed, MULDIV
+from riscv_emulator.compressed import expand
+from riscv_emulator.decoder import decode_image, records
+from riscv_emulator.elf import is_elf, load_elf
+from riscv_emulator.syscalls import Syscalls
+from riscv_emulator.translator import translate
+from riscv_emulator.memory import Memory
+from riscv_emulator.snapshot import Snapshot
+from riscv_emulator.state import HartState, SINK
 
-class emulator:
-    def __init__(self, memory = 4096, abi = False):
-        self.memory = bytearray(memory)
-        self.rg = [0] * 32
-        self.pc = 0
+ENGINES = ("interp", "dispatch", "block")
+CHECK_INTERVAL = 4096
+MHARTID = 0xf14
+
+def amo_min(old, value):
+    return old if (old ^ 0x80000000) < (value ^ 0x80000000) else value
+
+def amo_max(old, value):
+    return old if (old ^ 0x80000000) > (value ^ 0x80000000) else value
+
+AMO_OPS = {
+    0x00: lambda old, value: old + value,
+    0x01: lambda old, value: value,
+    0x04: lambda old, value: old ^ value,
+    0x08: lambda old, value: old | value,
+    0x0c: lambda old, value: old & value,
+    0x10: amo_min,
+    0x14: amo_max,
+    0x18: min,
+    0x1c: max,
+}
+
+class Halt(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+class RunResult:
+    def __init__(self, exit_reason, instructions, pc, registers, exit_code = None):
+        self.exit_reason = exit_reason
+        self.instructions = instructions
+        self.pc = pc
+        self.registers = registers
+        self.exit_code = exit_code
+
+    def to_dict(self):
+        return {
+            "exit_reason": self.exit_reason,
+            "instructions": self.instructions,
+            "pc": self.pc,
+            "registers": self.registers,
+            "exit_code": self.exit_code,
+        }
+
+    def __repr__(self):
+        return f"RunResult(exit_reason={self.exit_reason!r}, instructions={self.instructions}, pc={self.pc:#x})"
+
+class emulator(HartState):
+    __slots__ = ("memory", "abi", "engine", "headless", "on_ebreak", "decode_cache", "code_pages", "block_cache",
+                 "breakpoints", "symbols", "syscalls", "program_end", "exit_code", "history")
+
+    def __init__(self, memory = 4096, abi = False, engine = "interp", headless = False, hart_id = 0):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        # The address space is always a sparse 4 GiB; memory is kept for API compatibility.
+        super().__init__(hart_id)
+        self.memory = Memory()
         self.abi = abi
+        self.engine = engine
+        self.headless = headless
+        self.on_ebreak = None
+        self.decode_cache = {}
+        self.code_pages = set()
+        self.block_cache = {}
+        # Addresses a run stops in front of. Translated blocks end before each one, so the run loop
+        # checks once per block, and any engine runs on blocks while the set is non-empty.
+        self.breakpoints = set()
+        self.csr[MHARTID] = hart_id
+        # Symbols imported from an ELF .symtab, if the program had one.
+        self.symbols = None
+        # ECALLs go to syscalls.handle(); anything it doesn't handle stops the run. Set to None to always stop.
+        self.syscalls = Syscalls()
+        # First address past the loaded image; the guest heap (brk) starts on the page after it.
+        self.program_end = 0
+        self.exit_code = None
+        # Set by History; lets the debugger step backwards.
+        self.history = None
 
     def sign_extend(self, value, bits):
         sign_bit = 1 << (bits - 1)
         return (value & (sign_bit - 1)) - (value & sign_bit)
 
-    def load_program(self, path):
-        with open(path, "rb") as f:
-            program = f.read()
-            required_size = len(program) + 4096
-            if len(self.memory) < required_size:
-                print(f"Expandng memory from {len(self.memory)} to {required_size} bytes.")
-                self.memory = bytearray(required_size)
-            self.memory[0:len(program)] = program
+    def load_program(self, path, address = 0):
+        # ELF segments go to their own virtual addresses and the PC starts at e_entry; anything else is a flat image at address.
+        if is_elf(path):
+            image = load_elf(self.memory, path)
+            self.pc = image.entry
+            self.symbols = image.symbols
+            self.program_end = image.end
+        else:
+            self.program_end = address + self.memory.map_file(path, address)
+        self.flush_decode_cache()
+
+    def attach_device(self, address, device):
+        # Loads and stores in [address, address + device.size) go to the device; other pages are untouched.
+        self.memory.map_device(address, device.size, device)
+        self.flush_decode_cache()
+        return device
+
+    def add_breakpoint(self, address):
+        self.breakpoints.add(address)
+        self.block_cache.clear()
+
+    def remove_breakpoint(self, address):
+        self.breakpoints.discard(address)
+        self.block_cache.clear()
+
+    def flush_output(self):
+        if self.syscalls is not None:
+            self.syscalls.flush()
+        for device in self.memory.devices:
+            device.flush()
+
+    def snapshot(self):
+        syscalls = self.syscalls.snapshot() if self.syscalls is not None else None
+        return Snapshot(self.pack(), self.memory.snapshot(), self.exit_code, syscalls)
+
+    def restore(self, snap):
+        self.unpack(snap.state)
+        self.exit_code = snap.exit_code
+        # A logged Syscalls replays calls from its log instead, so its host-side state stays current.
+        if self.syscalls is not None and snap.syscalls is not None and self.syscalls.log is None:
+            self.syscalls.restore(snap.syscalls)
+        changed = self.memory.restore(snap.pages)
+        if not changed.isdisjoint(self.code_pages):
+            self.flush_decode_cache()
 
     def assemble(self, input_path):
         print(assemble(input_path))
 
-    def run(self):
-        while self.pc < len(self.memory):
-            instr = int.from_bytes(self.memory[self.pc:self.pc+4], byteorder='little')
-            if (instr == 0):
-                break
-            self.execute(instr)
-    
+    def fetch(self, pc):
+        instr = self.memory.load(pc, 4)
+        if (instr == 0):
+            return None
+        if instr & 0x3 != 0x3:
+            decoded = self.decode_compressed(instr & 0xffff)
+        else:
+            decoded = self.decode(instr)
+        self.decode_cache[pc] = decoded
+        self.code_pages.add(pc >> 12)
+        self.code_pages.add((pc + 3) >> 12)
+        return decoded
+
+    def predecode(self, address, length):
+        # Batch-decodes a code region up front instead of word by word on first execution.
+        count = 0
+        columns = decode_image(self.memory.read(address, length))
+        for pc, word, record in zip(range(address, address + length, 4), columns["word"].tolist(), records(columns)):
+            if word & 0x3 == 0x3:
+                opcode, rd, funct3, rs1, rs2, funct7, imm = record
+                self.decode_cache[pc] = (opcode, rd or SINK, funct3, rs1, rs2, funct7, imm, lookup(opcode, funct3, funct7, imm))
+                self.code_pages.add(pc >> 12)
+                self.code_pages.add((pc + 3) >> 12)
+                count += 1
+        return count
+
+    def run(self, max_instructions = None, timeout = None, profiler = None, tracer = None):
+        budget = max_instructions if max_instructions is not None else float("inf")
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        start = self.instret
+        if tracer is not None:
+            if profiler is not None:
+                raise ValueError("Tracing and profiling cannot be combined")
+            reason = self.run_traced(budget, deadline, tracer)
+        elif profiler is not None and profiler.interval:
+            reason = self.run_sampled(budget, deadline, profiler)
+        elif profiler is not None:
+            reason = self.run_profiled(budget, deadline, profiler)
+        elif self.engine == "dispatch":
+            reason = self.run_dispatch(budget, deadline)
+        elif self.engine == "block" or self.breakpoints:
+            reason = self.run_block(budget, deadline)
+        else:
+            reason = self.run_interp(budget, deadline)
+        self.flush_output()
+        return RunResult(reason, self.instret - start, self.pc, self.registers(), self.exit_code)
+
+    def run_interp(self, budget, deadline):
+        cache = self.decode_cache
+        limit = len(self.memory)
+        count = 0
+        try:
+            while count < budget:
+                stop = min(budget, count + CHECK_INTERVAL)
+                while count < stop:
+                    if self.pc >= limit:
+                        return "end_of_memory"
+                    decoded = cache.get(self.pc) or self.fetch(self.pc)
+                    if decoded is None:
+                        return "halt"
+                    self.execute_decoded(decoded)
+                    count += 1
+                if deadline is not None and time.monotonic() > deadline:
+                    return "timeout"
+            return "max_instructions"
+        except Halt as halt:
+            count += 1
+            return halt.reason
+        finally:
+            self.instret += count
+
+    def run_dispatch(self, budget, deadline):
+        cache = self.decode_cache
+        pc = self.pc
+        limit = len(self.memory)
+        count = 0
+        try:
+            while count < budget:
+                stop = min(budget, count + CHECK_INTERVAL)
+                while count < stop:
+                    if pc >= limit:
+                        return "end_of_memory"
+                    decoded = cache.get(pc) or self.fetch(pc)
+                    if decoded is None:
+                        return "halt"
+                    opcode, rd, funct3, rs1, rs2, funct7, imm, handler = decoded
+                    pc = handler(self, pc, rd, rs1, rs2, imm)
+                    count += 1
+                if deadline is not None and time.monotonic() > deadline:
+                    return "timeout"
+            return "max_instructions"
+        except Halt as halt:
+            count += 1
+            pc = self.pc
+            return halt.reason
+        finally:
+            self.pc = pc
+            self.instret += count
+
+    def run_block(self, budget, deadline):
+        blocks = self.block_cache
+        cache = self.decode_cache
+        breakpoints = self.breakpoints
+        limit = len(self.memory)
+        count = 0
+        try:
+            while count < budget:
+                stop = min(budget, count + CHECK_INTERVAL)
+                while count < stop:
+                    pc = self.pc
+                    # Never at the instruction a run starts on, so resuming from a breakpoint needs no step-over.
+                    if pc in breakpoints and count:
+                        return "breakpoint"
+                    if pc >= limit:
+                        return "end_of_memory"
+                    entry = blocks.get(pc)
+                    if entry is None:
+                        entry = translate(self, pc)
+                        if entry is not None:
+                            blocks[pc] = entry
+                    # A block that would overrun the budget is single-stepped instead.
+                    if entry is not None and count + entry[1] <= budget:
+                        count += entry[0](self)
+                        continue
+                    decoded = cache.get(pc) or self.fetch(pc)
+                    if decoded is None:
+                        return "halt"
+                    opcode, rd, funct3, rs1, rs2, funct7, imm, handler = decoded
+                    self.pc = handler(self, pc, rd, rs1, rs2, imm)
+                    count += 1
+                if deadline is not None and time.monotonic() > deadline:
+                    return "timeout"
+            return "max_instructions"
+        except Halt as halt:
+            count += 1
+            return halt.reason
+        finally:
+            self.instret += count
+
+    def run_profiled(self, budget, deadline, profiler):
+        # Profiling needs per-instruction visibility, so it always steps through the dispatch handlers.
+        cache = self.decode_cache
+        pc = self.pc
+        limit = len(self.memory)
+        pc_counts = profiler.pc_counts
+        frame_counts = profiler.frame_counts
+        taken = profiler.taken
+        not_taken = profiler.not_taken
+        frame = profiler.enter(pc)
+        count = 0
+        try:
+            while count < budget:
+                stop = min(budget, count + CHECK_INTERVAL)
+                while count < stop:
+                    if pc >= limit:
+                        return "end_of_memory"
+                    decoded = cache.get(pc) or self.fetch(pc)
+                    if decoded is None:
+                        return "halt"
+                    opcode, rd, funct3, rs1, rs2, funct7, imm, handler = decoded
+                    pc_counts[pc] += 1
+                    frame_counts[frame] += 1
+                    next_pc = handler(self, pc, rd, rs1, rs2, imm)
+                    kind = opcode & 0x7f
+                    if kind == 0x63:
+                        if next_pc == pc + (2 if opcode & 0x80 else 4):
+                            not_taken[pc] += 1
+                        else:
+                            taken[pc] += 1
+                    elif kind == 0x6f or kind == 0x67:
+                        frame = profiler.on_jump(kind, rd, rs1, next_pc)
+                    pc = next_pc
+                    count += 1
+                if deadline is not None and time.monotonic() > deadline:
+                    return "timeout"
+            return "max_instructions"
+        except Halt as halt:
+            count += 1
+            pc = self.pc
+            return halt.reason
+        finally:
+            self.pc = pc
+            self.instret += count
+            profiler.collect(self)
+
+    def run_sampled(self, budget, deadline, profiler):
+        # Sampling runs translated blocks like the block engine; the only per-block costs are the due
+        # check and, for blocks that end in jal/jalr, keeping the call stack current.
+        blocks = self.block_cache
+        cache = self.decode_cache
+        limit = len(self.memory)
+        interval = profiler.interval
+        sample = profiler.sample
+        track = profiler.track
+        profiler.enter(self.pc)
+        start = self.instret
+        # Relative to count: the number of instructions after which the next sample is due.
+        due = max(profiler.due - start, 0)
+        count = 0
+        try:
+            while count < budget:
+                stop = min(budget, count + CHECK_INTERVAL)
+                while count < stop:
+                    pc = self.pc
+                    if count >= due:
+                        sample(pc)
+                        due += interval
+                    if pc >= limit:
+                        return "end_of_memory"
+                    entry = blocks.get(pc)
+                    if entry is None:
+                        entry = translate(self, pc)
+                        if entry is not None:
+                            blocks[pc] = entry
+                    if entry is not None and count + entry[1] <= budget:
+                        retired = entry[0](self)
+                        count += retired
+                        # A block cut short (self-modifying store, SC) never reached its closing jump.
+                        if entry[2] is not None and retired == entry[1]:
+                            kind, rd, rs1 = entry[2]
+                            track(kind, rd, rs1, self.pc)
+                        continue
+                    decoded = cache.get(pc) or self.fetch(pc)
+                    if decoded is None:
+                        return "halt"
+                    opcode, rd, funct3, rs1, rs2, funct7, imm, handler = decoded
+                    self.pc = handler(self, pc, rd, rs1, rs2, imm)
+                    count += 1
+                    kind = opcode & 0x7f
+                    if kind == 0x6f or kind == 0x67:
+                        track(kind, rd, rs1, self.pc)
+                if deadline is not None and time.monotonic() > deadline:
+                    return "timeout"
+            return "max_instructions"
+        except Halt as halt:
+            count += 1
+            return halt.reason
+        finally:
+            self.instret += count
+            profiler.due = start + due
+            profiler.collect(self)
+
+    def run_traced(self, budget, deadline, tracer):
+        # Like profiling, tracing steps every instruction through its dispatch handler so its effects can be recorded.
+        cache = self.decode_cache
+        rg = self.rg
+        pc = self.pc
+        limit = len(self.memory)
+        record = tracer.record
+        changed = tracer.changed
+        load = self.memory.load
+        tracer.start(self)
+        count = 0
+        try:
+            while count < budget:
+                stop = min(budget, count + CHECK_INTERVAL)
+                while count < stop:
+                    if pc >= limit:
+                        return "end_of_memory"
+                    decoded = cache.get(pc) or self.fetch(pc)
+                    if decoded is None:
+                        return "halt"
+                    opcode, rd, funct3, rs1, rs2, funct7, imm, handler = decoded
+                    address = rg[rs1] + imm
+                    word = load(pc, 2 if opcode & 0x80 else 4) if changed(pc, decoded) else None
+                    next_pc = handler(self, pc, rd, rs1, rs2, imm)
+                    record(self, pc, decoded, address, word)
+                    pc = next_pc
+                    count += 1
+                if deadline is not None and time.monotonic() > deadline:
+                    return "timeout"
+            return "max_instructions"
+        except Halt as halt:
+            # The halting instruction retired too, so it goes in the trace.
+            record(self, pc, decoded, address, word)
+            count += 1
+            pc = self.pc
+            return halt.reason
+        finally:
+            self.pc = pc
+            self.instret += count
+
+    def ecall(self, pc):
+        self.pc = pc + 4
+        if self.syscalls is not None:
+            if self.syscalls.handle(self):
+                if self.exit_code is not None:
+                    raise Halt("exit")
+                return self.pc
+        self.flush_output()
+        if not self.headless:
+            print("ECALL, ending execution")
+        raise Halt("ecall")
+
+    def ebreak(self, pc):
+        self.pc = pc + 4
+        if self.on_ebreak is not None:
+            if self.on_ebreak(self):
+                raise Halt("ebreak")
+        elif self.headless:
+            raise Halt("ebreak")
+        else:
+            self.flush_output()
+            print("EBREAK")
+            debugger(self)
+        return self.pc
+
+    def access_csr(self, funct3, rd, rs1, imm):
+        number = imm & 0xfff
+        source = rs1 if funct3 & 0x4 else self.rg[rs1]
+        old = self.csr.get(number, 0)
+        kind = funct3 & 0x3
+        if kind == 0x1:
+            new = source
+        elif kind == 0x2:
+            new = old | source
+        else:
+            new = old & ~source
+        # CSRs 0xc00-0xfff are read-only; csrrs/csrrc with x0 (or uimm 0) never write.
+        if (kind == 0x1 or rs1) and number >> 10 != 0x3:
+            self.csr[number] = new & 0xffffffff
+        self.rg[rd] = old
+
+    def atomic(self, funct5, rd, rs1, rs2):
+        address = self.rg[rs1]
+        written = False
+        if funct5 == 0x02:
+            value = self.memory.load(address, 4)
+            self.reservation = (address, value)
+        elif funct5 == 0x03:
+            reservation = self.reservation
+            self.reservation = None
+            written = reservation is not None and reservation[0] == address and self.memory.compare_and_store(address, reservation[1], self.rg[rs2])
+            value = 0 if written else 1
+        else:
+            value = self.memory.atomic_update(address, AMO_OPS[funct5], self.rg[rs2])
+            written = True
+        self.rg[rd] = value
+        return written and self.invalidate(address, 4)
+
     def debug(self):
         debugger(self)
 
-    def execute(self, instr):
-        old_pc = self.pc
+    def flush_decode_cache(self):
+        self.decode_cache.clear()
+        self.code_pages.clear()
+        self.block_cache.clear()
+
+    def invalidate(self, address, size):
+        # Any cached instruction overlapping [address, address + size) is stale.
+        if (address >> 12) not in self.code_pages and ((address + size - 1) >> 12) not in self.code_pages:
+            return False
+        hit = False
+        for pc in range(address - 3, address + size):
+            if self.decode_cache.pop(pc, None) is not None:
+                hit = True
+        if hit:
+            self.block_cache.clear()
+        return hit
+
+    def decode(self, instr):
         opcode = instr & 0x7f
+        rd = (instr >> 7) & 0x1f
+        funct3 = (instr >> 12) & 0x7
+        rs1 = (instr >> 15) & 0x1f
+        rs2 = (instr >> 20) & 0x1f
+        funct7 = (instr >> 25) & 0x7f
+
+        if opcode in (0x13, 0x03, 0x67, 0x73):
+            imm = self.sign_extend((instr >> 20) & 0xfff, 12)
+        elif opcode == 0x23:
+            imm = self.sign_extend((funct7 << 5) | rd, 12)
+        elif opcode == 0x63:
+            imm = ((instr >> 8) & 0xf) << 1
+            imm |= ((instr >> 25) & 0x3f) << 5
+            imm |= ((instr >> 7) & 0x1) << 11
+            imm |= ((instr >> 31) & 0x1) << 12
+            imm = self.sign_extend(imm, 13)
+        elif opcode == 0x6f:
+            imm = ((instr >> 21) & 0x3ff) << 1
+            imm |= ((instr >> 20) & 0x1) << 11
+            imm |= ((instr >> 12) & 0xff) << 12
+            imm |= ((instr >> 31) & 0x1) << 20
+            imm = self.sign_extend(imm, 21)
+        elif opcode in (0x37, 0x17):
+            imm = (instr >> 12) & 0xfffff
+        else:
+            imm = 0
+        return (opcode, rd or SINK, funct3, rs1, rs2, funct7, imm, lookup(opcode, funct3, funct7, imm))
+
+    def decode_compressed(self, half):
+        # Expanded once here: the record runs as its 32-bit form at pc - 2, with PC-relative
+        # offsets widened by 2, so fall-through and link addresses come out as pc + 2.
+        opcode, rd, funct3, rs1, rs2, funct7, imm, handler = self.decode(expand(half))
+        if opcode == 0x63 or opcode == 0x6f:
+            imm += 2
+        return (opcode | 0x80, rd, funct3, rs1, rs2, funct7, imm, compressed(handler))
+
+    def execute(self, instr):
+        self.execute_decoded(self.decode_compressed(instr & 0xffff) if instr & 0x3 != 0x3 else self.decode(instr))
+
+    def execute_decoded(self, decoded):
+        opcode, rd, funct3, rs1, rs2, funct7, imm, _ = decoded
+        pc = self.pc
+        if opcode & 0x80:
+            opcode &= 0x7f
+            pc -= 2
+        next_pc = pc + 4
 
         if opcode == 0x33:
-            rd = (instr >> 7) & 0x1f
-            funct3 = (instr >> 12) & 0x7
-            rs1 = (instr >> 15) & 0x1f
-            rs2 = (instr >> 20) & 0x1f
-            funct7 = (instr >> 25) & 0x7f
-            if funct3 == 0x0:
+            if funct7 == 0x01:
+                self.rg[rd] = MULDIV[funct3](self.rg[rs1], self.rg[rs2])
+            elif funct3 == 0x0:
                 if funct7 == 0x00:
                     self.rg[rd] = (self.rg[rs1] + self.rg[rs2]) & 0xffffffff
                 elif funct7 == 0x20:
@@ -67,24 +576,19 @@ class emulator:
                     else:
                         self.rg[rd] = val >> (self.rg[rs2] & 0x1f)
             elif funct3 == 0x2:
-                self.rg[rd] = 1 if self.sign_extend(self.rg[rs1], 32) < self.sign_extend(self.rg[rs2], 32) else 0
+                self.rg[rd] = 1 if (self.rg[rs1] ^ 0x80000000) < (self.rg[rs2] ^ 0x80000000) else 0
             elif funct3 == 0x3:
-                self.rg[rd] = 1 if (self.rg[rs1] & 0xffffffff) < (self.rg[rs2] & 0xffffffff) else 0
+                self.rg[rd] = 1 if self.rg[rs1] < self.rg[rs2] else 0
 
         elif opcode == 0x13:
-            rd = (instr >> 7) & 0x1f
-            funct3 = (instr >> 12) & 0x7
-            rs1 = (instr >> 15) & 0x1f
-            imm = (instr >> 20) & 0xfff
-            imm = self.sign_extend(imm, 12)
             if funct3 == 0x0:
                 self.rg[rd] = (self.rg[rs1] + imm) & 0xffffffff
             elif funct3 == 0x4:
-                self.rg[rd] = (self.rg[rs1] ^ imm)
+                self.rg[rd] = (self.rg[rs1] ^ imm) & 0xffffffff
             elif funct3 == 0x6:
-                self.rg[rd] = (self.rg[rs1] | imm)
+                self.rg[rd] = (self.rg[rs1] | imm) & 0xffffffff
             elif funct3 == 0x7:
-                self.rg[rd] = self.rg[rs1] & imm
+                self.rg[rd] = self.rg[rs1] & imm & 0xffffffff
             elif funct3 == 0x1:
                 self.rg[rd] = (self.rg[rs1] << (imm & 0x1f)) & 0xffffffff
             elif funct3 == 0x5:
@@ -97,108 +601,78 @@ class emulator:
                     else:
                         self.rg[rd] = val >> (imm & 0x1f)
             elif funct3 == 0x2:
-                self.rg[rd] = 1 if self.sign_extend(self.rg[rs1], 32) < imm else 0
+                self.rg[rd] = 1 if (self.rg[rs1] ^ 0x80000000) - 0x80000000 < imm else 0
             elif funct3 == 0x3:
-                self.rg[rd] = 1 if (self.rg[rs1] & 0xffffffff) < (imm & 0xffffffff) else 0
+                self.rg[rd] = 1 if self.rg[rs1] < (imm & 0xffffffff) else 0
 
         elif opcode == 0x3:
-            rd = (instr >> 7) & 0x1f
-            funct3 = (instr >> 12) & 0x7
-            rs1 = (instr >> 15) & 0x1f
-            imm = (instr >> 20) & 0xfff
-            imm = self.sign_extend(imm, 12)
-            address = self.rg[rs1] + imm
+            address = (self.rg[rs1] + imm) & 0xffffffff
             if funct3 == 0x0:
-                self.rg[rd] = self.sign_extend(self.memory[address], 8)
+                self.rg[rd] = ((self.memory.load(address, 1) ^ 0x80) - 0x80) & 0xffffffff
             elif funct3 == 0x1:
-                val = int.from_bytes(self.memory[address:address + 2], "little")
-                self.rg[rd] = self.sign_extend(val, 16)
+                self.rg[rd] = ((self.memory.load(address, 2) ^ 0x8000) - 0x8000) & 0xffffffff
             elif funct3 == 0x2:
-                val = int.from_bytes(self.memory[address:address + 4], "little")
-                self.rg[rd] = self.sign_extend(val, 32)
+                self.rg[rd] = self.memory.load(address, 4)
             elif funct3 == 0x4:
-                self.rg[rd] = self.memory[address] & 0xff
+                self.rg[rd] = self.memory.load(address, 1)
             elif funct3 == 0x5:
-                val = int.from_bytes(self.memory[address:address + 2], "little")
-                self.rg[rd] = val & 0xffff
+                self.rg[rd] = self.memory.load(address, 2)
 
         elif opcode == 0x23:
-            imm_bot = (instr >> 7) & 0x1f
-            funct3 = (instr >> 12) & 0x7
-            rs1 = (instr >> 15) & 0x1f
-            rs2 = (instr >> 20) & 0x1f
-            imm_top = (instr >> 25) & 0x7f
-            imm = (imm_top << 5) | imm_bot
-            imm = self.sign_extend(imm, 12)
-            address = self.rg[rs1] + imm
+            address = (self.rg[rs1] + imm) & 0xffffffff
             if funct3 == 0x0:
-                self.memory[address] = self.rg[rs2] & 0xff
+                self.memory.store(address, 1, self.rg[rs2])
             elif funct3 == 0x1:
-                self.memory[address:address + 2] = int.to_bytes(self.rg[rs2] & 0xffff, 2, "little")
+                self.memory.store(address, 2, self.rg[rs2])
             elif funct3 == 0x2:
-                self.memory[address:address + 4] = int.to_bytes(self.rg[rs2] & 0xffffffff, 4, "little")
+                self.memory.store(address, 4, self.rg[rs2])
+            self.invalidate(address, 1 << funct3)
 
         elif opcode == 0x63:
-            funct3 = (instr >> 12) & 0x7
-            rs1 = (instr >> 15) & 0x1f
-            rs2 = (instr >> 20) & 0x1f
-            imm = ((instr >> 8) & 0xf) << 1
-            imm |= ((instr >> 25) & 0x3f) << 5
-            imm |= ((instr >> 7) & 0x1) << 11
-            imm |= ((instr >> 31) & 0x1) << 12
-            imm = self.sign_extend(imm, 13)
             if funct3 == 0x0:
-                self.pc = self.pc + imm if self.rg[rs1] == self.rg[rs2] else self.pc
+                if self.rg[rs1] == self.rg[rs2]:
+                    next_pc = pc + imm
             elif funct3 == 0x1:
-                self.pc = self.pc + imm if self.rg[rs1] != self.rg[rs2] else self.pc
+                if self.rg[rs1] != self.rg[rs2]:
+                    next_pc = pc + imm
             elif funct3 == 0x4:
-                self.pc = self.pc + imm if self.sign_extend(self.rg[rs1], 32) < self.sign_extend(self.rg[rs2], 32) else self.pc
+                if (self.rg[rs1] ^ 0x80000000) < (self.rg[rs2] ^ 0x80000000):
+                    next_pc = pc + imm
             elif funct3 == 0x5:
-                self.pc = self.pc + imm if self.sign_extend(self.rg[rs1], 32) >= self.sign_extend(self.rg[rs2], 32) else self.pc
+                if (self.rg[rs1] ^ 0x80000000) >= (self.rg[rs2] ^ 0x80000000):
+                    next_pc = pc + imm
             elif funct3 == 0x6:
-                self.pc = self.pc + imm if self.rg[rs1] & 0xffffffff < self.rg[rs2] & 0xffffffff else self.pc
+                if self.rg[rs1] < self.rg[rs2]:
+                    next_pc = pc + imm
             elif funct3 == 0x7:
-                self.pc = self.pc + imm if self.rg[rs1] & 0xffffffff >= self.rg[rs2] & 0xffffffff else self.pc
+                if self.rg[rs1] >= self.rg[rs2]:
+                    next_pc = pc + imm
 
         elif opcode == 0x6f:
-            rd = (instr >> 7) & 0x1f
-            imm = ((instr >> 21) & 0x3ff) << 1
-            imm |= ((instr >> 20) & 0x1) << 11
-            imm |= ((instr >> 12) & 0xff) << 12
-            imm |= ((instr >> 31) & 0x1) << 20
-            imm = self.sign_extend(imm, 21)
-            self.rg[rd] = self.pc + 4
-            self.pc += imm
+            self.rg[rd] = next_pc
+            next_pc = pc + imm
 
         elif opcode == 0x67:
-            rd = (instr >> 7) & 0x1f
-            funct3 = (instr >> 12) & 0x7
-            rs1 = (instr >> 15) & 0x1f
-            imm = (instr >> 20) & 0xfff
-            imm = self.sign_extend(imm, 12)
             if funct3 == 0x0:
-                self.rg[rd] = self.pc + 4
-                self.pc = (self.rg[rs1] + imm) & 0xfffffffe
+                target = (self.rg[rs1] + imm) & 0xfffffffe
+                self.rg[rd] = next_pc
+                next_pc = target
 
         elif opcode == 0x37:
-            rd = (instr >> 7) & 0x1f
-            imm = (instr >> 12) & 0xfffff
-            self.rg[rd] = imm << 12
+            self.rg[rd] = (imm << 12) & 0xffffffff
 
         elif opcode == 0x17:
-            rd = (instr >> 7) & 0x1f
-            imm = (instr >> 12) & 0xfffff
-            self.rg[rd] = self.pc + (imm << 12)
+            self.rg[rd] = (pc + (imm << 12)) & 0xffffffff
+
+        elif opcode == 0x2f:
+            if funct3 == 0x2:
+                self.atomic(funct7 >> 2, rd, rs1, rs2)
 
         elif opcode == 0x73:
-            imm = (instr >> 20) & 0xfff
-            if imm == 0x0:
-                print("ECALL, ending execution")
-                self.pc = len(self.memory)
+            if funct3:
+                self.access_csr(funct3, rd, rs1, imm)
+            elif imm == 0x0:
+                next_pc = self.ecall(pc)
             elif imm == 0x1:
-                print("EBREAK")
-                self.pc += 4
-                debugger(self)
-        if self.pc == old_pc:
-            self.pc += 4
-        self.rg[0] = 0
\ No newline at end of file
+                next_pc = self.ebreak(pc)
+        self.pc = next_pc
\ No newline at end of file
@@ -0,0 +1,242 @@
+import asyncio, struct, sys
+from riscv_emulator.debugger import split_address
+from riscv_emulator.state import REGISTER_COUNT
+
+# Seconds a continue runs between looks at the socket for a ^C.
+POLL_INTERVAL = 0.05
+PACKET_SIZE = 0x4000
+REGISTERS = struct.Struct(f"<{REGISTER_COUNT + 1}I")
+PC_REGISTER = REGISTER_COUNT
+SIGINT = 2
+SIGTRAP = 5
+# Runs that end the program; anything else leaves it stopped and inspectable.
+EXIT_REASONS = ("exit", "ecall", "halt", "end_of_memory")
+
+ABI_NAMES = ("zero", "ra", "sp", "gp", "tp", "t0", "t1", "t2", "fp", "s1", "a0", "a1", "a2", "a3", "a4", "a5",
+             "a6", "a7", "s2", "s3", "s4", "s5", "s6", "s7", "s8", "s9", "s10", "s11", "t3", "t4", "t5", "t6")
+TARGET_XML = ('<?xml version="1.0"?><!DOCTYPE target SYSTEM "gdb-target.dtd"><target version="1.0">'
+              '<architecture>riscv:rv32</architecture><feature name="org.gnu.gdb.riscv.cpu">'
+              + "".join(f'<reg name="{name}" bitsize="32" regnum="{i}" type="{"data_ptr" if name in ("sp", "fp") else "int"}"/>'
+                        for i, name in enumerate(ABI_NAMES))
+              + f'<reg name="pc" bitsize="32" regnum="{PC_REGISTER}" type="code_ptr"/></feature></target>').encode()
+
+def checksum(data):
+    return sum(data) & 0xff
+
+def decode(body):
+    # Undoes binary escapes (} then the byte ^ 0x20) and run-length encoding (x* then n + 29 more x's).
+    if b"}" not in body and b"*" not in body:
+        return body
+    out = bytearray()
+    index = 0
+    while index < len(body):
+        byte = body[index]
+        if byte == 0x7d and index + 1 < len(body):
+            out.append(body[index + 1] ^ 0x20)
+            index += 2
+        elif byte == 0x2a and out and index + 1 < len(body):
+            out += out[-1:] * (body[index + 1] - 29)
+            index += 2
+        else:
+            out.append(byte)
+            index += 1
+    return bytes(out)
+
+class GdbStub:
+    # GDB remote serial protocol for one client. Breakpoints go into emu.breakpoints, so a continue runs
+    # translated blocks at full speed and only checks for them between blocks.
+    def __init__(self, emu):
+        self.emu = emu
+        self.ack = True
+        self.interrupted = False
+        self.packets = asyncio.Queue()
+        # How the session ended: "detach" lets the program run on, "kill" and "closed" stop it.
+        self.outcome = "closed"
+
+    async def read_packets(self, reader, writer):
+        buffer = bytearray()
+        while True:
+            data = await reader.read(PACKET_SIZE)
+            if not data:
+                await self.packets.put(None)
+                return
+            buffer += data
+            while buffer:
+                if buffer[0] == 0x03:
+                    self.interrupted = True
+                    del buffer[0]
+                    continue
+                if buffer[0] != ord("$"):
+                    # Acks, and any noise between packets.
+                    del buffer[0]
+                    continue
+                end = buffer.find(b"#")
+                if end < 0 or len(buffer) < end + 3:
+                    break
+                body = bytes(buffer[1:end])
+                valid = buffer[end + 1:end + 3] == b"%02x" % checksum(body)
+                del buffer[:end + 3]
+                if self.ack:
+                    writer.write(b"+" if valid else b"-")
+                if valid:
+                    await self.packets.put(decode(body).decode("latin-1"))
+
+    async def session(self, reader, writer):
+        emu = self.emu
+        on_ebreak = emu.on_ebreak
+        emu.on_ebreak = lambda emu: True
+        reading = asyncio.create_task(self.read_packets(reader, writer))
+        try:
+            while True:
+                packet = await self.packets.get()
+                if packet is None:
+                    return
+                reply = await self.handle(packet)
+                data = reply.encode("latin-1")
+                writer.write(b"$%s#%02x" % (data, checksum(data)))
+                await writer.drain()
+                if self.outcome != "closed":
+                    return
+        finally:
+            reading.cancel()
+            emu.on_ebreak = on_ebreak
+            writer.close()
+
+    async def handle(self, packet):
+        kind, body = packet[:1], packet[1:]
+        try:
+            if kind == "?":
+                return f"S{SIGTRAP:02x}"
+            if kind == "g":
+                return REGISTERS.pack(*self.emu.registers(), self.emu.pc).hex()
+            if kind == "G":
+                values = REGISTERS.unpack(bytes.fromhex(body))
+                self.emu.set_registers(values[:PC_REGISTER])
+                self.emu.pc = values[PC_REGISTER]
+                return "OK"
+            if kind == "p":
+                return self.read_register(int(body, 16))
+            if kind == "P":
+                number, value = body.split("=")
+                return self.write_register(int(number, 16), struct.unpack("<I", bytes.fromhex(value))[0])
+            if kind == "m":
+                address, length = (int(field, 16) for field in body.split(","))
+                return self.emu.memory.read(address, min(length, PACKET_SIZE // 2)).hex()
+            if kind == "M":
+                location, data = body.split(":")
+                address, length = (int(field, 16) for field in location.split(","))
+                data = bytes.fromhex(data)[:length]
+                self.emu.memory.write(address, data)
+                self.emu.invalidate(address, len(data))
+                return "OK"
+            if kind in ("Z", "z"):
+                breakpoint_type, address, _ = body.split(",")
+                if breakpoint_type not in ("0", "1"):
+                    return ""
+                if kind == "Z":
+                    self.emu.add_breakpoint(int(address, 16))
+                else:
+                    self.emu.remove_breakpoint(int(address, 16))
+                return "OK"
+            if kind in ("c", "s"):
+                if body:
+                    self.emu.pc = int(body, 16)
+                return await self.resume(kind == "s")
+            if kind == "H":
+                return "OK"
+            if kind == "D":
+                self.outcome = "detach"
+                return "OK"
+            if kind == "k":
+                self.outcome = "kill"
+                return "OK"
+            if kind == "q" or kind == "Q":
+                return self.query(packet)
+        except (ValueError, struct.error):
+            return "E01"
+        return ""
+
+    def query(self, packet):
+        if packet.startswith("qSupported"):
+            return f"PacketSize={PACKET_SIZE:x};QStartNoAckMode+;qXfer:features:read+"
+        if packet == "QStartNoAckMode":
+            self.ack = False
+            return "OK"
+        if packet.startswith("qXfer:features:read:target.xml:"):
+            offset, length = (int(field, 16) for field in packet.rsplit(":", 1)[1].split(","))
+            chunk = TARGET_XML[offset:offset + length]
+            return ("l" if offset + length >= len(TARGET_XML) else "m") + chunk.decode()
+        if packet == "qAttached":
+            return "1"
+        if packet == "qfThreadInfo":
+            return "m1"
+        if packet == "qsThreadInfo":
+            return "l"
+        if packet == "qC":
+            return "QC1"
+        return ""
+
+    def read_register(self, number):
+        if number < PC_REGISTER:
+            return struct.pack("<I", self.emu.rg[number]).hex()
+        if number == PC_REGISTER:
+            return struct.pack("<I", self.emu.pc).hex()
+        return "E01"
+
+    def write_register(self, number, value):
+        if number == PC_REGISTER:
+            self.emu.pc = value
+        elif 0 < number < PC_REGISTER:
+            self.emu.rg[number] = value
+        elif number != 0:
+            return "E01"
+        return "OK"
+
+    async def resume(self, step):
+        emu = self.emu
+        self.interrupted = False
+        if step:
+            result = emu.run(1)
+        else:
+            while True:
+                result = emu.run(None, POLL_INTERVAL)
+                if result.exit_reason != "timeout":
+                    break
+                # A slice can end right on a breakpoint; the next run would start past it.
+                if emu.pc in emu.breakpoints:
+                    return f"S{SIGTRAP:02x}"
+                await asyncio.sleep(0)
+                if self.interrupted:
+                    return f"S{SIGINT:02x}"
+        if result.exit_reason in EXIT_REASONS:
+            emu.flush_output()
+            return f"W{(emu.exit_code or 0) & 0xff:02x}"
+        return f"S{SIGTRAP:02x}"
+
+async def listen(emu, host, port):
+    stub = GdbStub(emu)
+    connected = asyncio.Event()
+    finished = asyncio.Event()
+
+    async def client(reader, writer):
+        if connected.is_set():
+            writer.close()
+            return
+        connected.set()
+        try:
+            await stub.session(reader, writer)
+        finally:
+            finished.set()
+
+    server = await asyncio.start_server(client, host, port)
+    async with server:
+        print(f"Waiting for GDB on {host}:{port}", file=sys.stderr)
+        await finished.wait()
+    return stub.outcome
+
+def serve_gdb(emu, source):
+    # Serves one GDB client on [host]:port and returns how it left: "detach", "kill" or "closed".
+    address = split_address(source)
+    if address is None:
+        raise ValueError(f"Expected [host]:port, got {source!r}")
+    return asyncio.run(listen(emu, *address))
@@ -0,0 +1,103 @@
+import multiprocessing, queue, time
+from multiprocessing import shared_memory
+from riscv_emulator.emulator import emulator, RunResult
+from riscv_emulator.memory import Memory, LockedMemory, PAGE_MASK, PAGE_SHIFT
+from riscv_emulator.elf import is_elf, load_elf
+from riscv_emulator.state import HartState
+
+QUANTUM = 1000
+SHARED_SIZE = 1 << 20
+MAX_SHARED_SIZE = 1 << 28
+
+def create_harts(count, engine="interp", headless=False):
+    # Harts share one memory and one set of decode/block caches, so a store by any hart invalidates code for all.
+    harts = [emulator(engine=engine, headless=headless, hart_id=0)]
+    first = harts[0]
+    for hart_id in range(1, count):
+        hart = emulator(engine=engine, headless=headless, hart_id=hart_id)
+        hart.memory = first.memory
+        hart.decode_cache = first.decode_cache
+        hart.code_pages = first.code_pages
+        hart.block_cache = first.block_cache
+        hart.breakpoints = first.breakpoints
+        hart.syscalls = first.syscalls
+        harts.append(hart)
+    return harts
+
+def run_harts(harts, max_instructions=None, timeout=None, quantum=QUANTUM):
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    executed = [0] * len(harts)
+    results = [None] * len(harts)
+    live = list(range(len(harts)))
+    while live:
+        for index in list(live):
+            hart = harts[index]
+            budget = quantum if max_instructions is None else min(quantum, max_instructions - executed[index])
+            result = hart.run(budget)
+            executed[index] += result.instructions
+            if result.exit_reason != "max_instructions" or executed[index] == max_instructions:
+                results[index] = RunResult(result.exit_reason, executed[index], hart.pc, hart.registers(), result.exit_code)
+                live.remove(index)
+        if live and deadline is not None and time.monotonic() > deadline:
+            for index in live:
+                results[index] = RunResult("timeout", executed[index], harts[index].pc, harts[index].registers())
+            break
+    return results
+
+def run_hart_process(block, base, size, lock, hart_id, entry, end, engine, max_instructions, timeout, results):
+    try:
+        memory = LockedMemory(lock)
+        memory.attach(block.buf[:size], base)
+        hart = emulator(engine=engine, headless=True, hart_id=hart_id)
+        hart.memory = memory
+        hart.pc = entry
+        hart.program_end = end
+        result = hart.run(max_instructions, timeout)
+        results.put((hart_id, result.exit_reason, result.instructions, hart.pack(), result.exit_code))
+    except Exception as e:
+        results.put((hart_id, f"error: {type(e).__name__}: {e}", 0, HartState(hart_id).pack(), None))
+
+def run_harts_parallel(path, count, engine="interp", max_instructions=None, timeout=None, size=SHARED_SIZE):
+    # One OS process per hart over multiprocessing.shared_memory. The shared block starts at the
+    # lowest loaded page and covers the whole image and at least size bytes, so every segment
+    # (and the heap and stack above it) is shared. Decode caches are per process, so code
+    # modified by one hart is not seen by harts that already executed it.
+    image = Memory()
+    if is_elf(path):
+        loaded = load_elf(image, path)
+        entry, end = loaded.entry, loaded.end
+        base = min((segment.address for segment in loaded.segments), default=0) & ~PAGE_MASK
+    else:
+        entry, base = 0, 0
+        end = image.map_file(path)
+    size = (min(max(size, end - base), (1 << 32) - base) + PAGE_MASK) & ~PAGE_MASK
+    if size > MAX_SHARED_SIZE:
+        raise ValueError(f"Image spans {end - base:#x} bytes from {base:#x}; at most {MAX_SHARED_SIZE:#x} can be shared between processes")
+    block = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        first = base >> PAGE_SHIFT
+        for number, page in image.pages.items():
+            if first <= number < first + (size >> PAGE_SHIFT):
+                block.buf[(number - first) << PAGE_SHIFT:(number - first + 1) << PAGE_SHIFT] = page
+        context = multiprocessing.get_context()
+        lock = context.RLock()
+        results = context.Queue()
+        processes = [context.Process(target=run_hart_process, args=(block, base, size, lock, hart_id, entry, end, engine, max_instructions, timeout, results))
+                     for hart_id in range(count)]
+        for process in processes:
+            process.start()
+        collected = {}
+        while len(collected) < count:
+            try:
+                hart_id, reason, instructions, packed, exit_code = results.get(timeout=0.1)
+                state = HartState(hart_id).unpack(packed)
+                collected[hart_id] = RunResult(reason, instructions, state.pc, state.registers(), exit_code)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    break
+        for process in processes:
+            process.join()
+    finally:
+        block.close()
+        block.unlink()
+    return [collected.get(hart_id, RunResult("error: hart process died", 0, 0, [0] * 32)) for hart_id in range(count)]
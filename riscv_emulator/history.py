@@ -0,0 +1,133 @@
+import time
+from collections import deque
+from riscv_emulator.emulator import RunResult
+from riscv_emulator.memory import PAGE_SIZE
+
+CHECKPOINT_INTERVAL = 100_000
+MEMORY_BUDGET = 256 << 20
+
+class Checkpoint:
+    def __init__(self, snapshot, reservation, syscalls, cost):
+        self.snapshot = snapshot
+        self.reservation = reservation
+        self.syscalls = syscalls
+        # Bytes of pages this checkpoint keeps alive that the one before it doesn't share.
+        self.cost = cost
+
+    @property
+    def instret(self):
+        return self.snapshot.instret
+
+def private_bytes(pages, previous):
+    # Only bytearray pages are copies the checkpoint pins; mapped-file and shared pages cost nothing.
+    return sum(PAGE_SIZE for number, page in pages.items() if isinstance(page, bytearray) and previous.get(number) is not page)
+
+class History:
+    # Time travel for one hart: a checkpoint every interval instructions (copy-on-write snapshots, so
+    # only pages written since the last one are new) and deterministic re-execution from the nearest
+    # checkpoint to reach any earlier instruction count. Oldest checkpoints go first once the pages
+    # they pin exceed budget bytes.
+    def __init__(self, emu, interval=CHECKPOINT_INTERVAL, budget=MEMORY_BUDGET):
+        if interval <= 0:
+            raise ValueError("Checkpoint interval must be positive")
+        self.emu = emu
+        self.interval = interval
+        self.budget = budget
+        self.checkpoints = deque()
+        self.bytes = 0
+        # Instruction counts where a run stopped at an EBREAK; rcont goes back to the latest earlier one.
+        self.stops = []
+        if emu.syscalls is not None and emu.syscalls.log is None:
+            emu.syscalls.log = []
+        emu.history = self
+
+    def checkpoint(self):
+        emu = self.emu
+        if self.checkpoints and self.checkpoints[-1].instret >= emu.instret:
+            # Re-executing known history: the checkpoints ahead are still valid.
+            return
+        snapshot = emu.snapshot()
+        previous = self.checkpoints[-1].snapshot.pages if self.checkpoints else {}
+        cost = private_bytes(snapshot.pages, previous)
+        position = emu.syscalls.position if emu.syscalls is not None else 0
+        self.checkpoints.append(Checkpoint(snapshot, emu.reservation, position, cost))
+        self.bytes += cost
+        evicted = False
+        while self.bytes > self.budget and len(self.checkpoints) > 1:
+            self.bytes -= self.checkpoints.popleft().cost
+            oldest = self.checkpoints[0]
+            full = private_bytes(oldest.snapshot.pages, {})
+            self.bytes += full - oldest.cost
+            oldest.cost = full
+            evicted = True
+        if evicted:
+            # Nothing can seek before the oldest checkpoint, so syscall results and stops from before it go too.
+            oldest = self.checkpoints[0]
+            if emu.syscalls is not None:
+                emu.syscalls.forget(oldest.syscalls)
+            self.stops = [stop for stop in self.stops if stop >= oldest.instret]
+
+    def run(self, max_instructions=None, timeout=None):
+        # Runs forward in interval-sized slices; stops at EBREAK instead of entering the debugger.
+        emu = self.emu
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        start = emu.instret
+        end = start + max_instructions if max_instructions is not None else None
+        on_ebreak = emu.on_ebreak
+        emu.on_ebreak = lambda emu: True
+        try:
+            if not self.checkpoints:
+                self.checkpoint()
+            while True:
+                boundary = (emu.instret // self.interval + 1) * self.interval
+                budget = boundary - emu.instret if end is None else min(boundary, end) - emu.instret
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                result = emu.run(budget, remaining)
+                if emu.instret == boundary:
+                    self.checkpoint()
+                if result.exit_reason != "max_instructions" or emu.instret == end:
+                    break
+        finally:
+            emu.on_ebreak = on_ebreak
+        if result.exit_reason == "ebreak" and emu.instret not in self.stops:
+            self.stops.append(emu.instret)
+            self.stops.sort()
+        return RunResult(result.exit_reason, emu.instret - start, emu.pc, emu.registers(), emu.exit_code)
+
+    def step(self, count=1):
+        return self.run(count)
+
+    def seek(self, target):
+        # Restores the nearest checkpoint at or before target and re-executes up to it. Returns the
+        # instruction count actually reached, which is the oldest checkpoint if target is older.
+        emu = self.emu
+        if not self.checkpoints:
+            return emu.instret
+        target = max(target, self.checkpoints[0].instret)
+        checkpoint = self.checkpoints[0]
+        for candidate in reversed(self.checkpoints):
+            if candidate.instret <= target:
+                checkpoint = candidate
+                break
+        emu.restore(checkpoint.snapshot)
+        emu.reservation = checkpoint.reservation
+        if emu.syscalls is not None:
+            emu.syscalls.position = checkpoint.syscalls
+        on_ebreak = emu.on_ebreak
+        emu.on_ebreak = lambda emu: True
+        try:
+            while emu.instret < target:
+                result = emu.run(target - emu.instret)
+                if result.exit_reason not in ("max_instructions", "ebreak"):
+                    break
+        finally:
+            emu.on_ebreak = on_ebreak
+        return emu.instret
+
+    def step_back(self, count=1):
+        return self.seek(self.emu.instret - count)
+
+    def continue_back(self):
+        # Back to the previous EBREAK stop, or to the start of the retained history.
+        earlier = [stop for stop in self.stops if stop < self.emu.instret]
+        return self.seek(earlier[-1] if earlier else 0)
@@ -1,7 +1,110 @@
-import argparse
+import argparse, json, os, sys
 from riscv_emulator.assembler import assemble
-from riscv_emulator.emulator import emulator
-from riscv_emulator.disassembler import disassemble
+from riscv_emulator.emulator import emulator, ENGINES, RunResult
+from riscv_emulator.disassembler import disassemble, disassemble_file, format_listing
+from riscv_emulator.bench import bench, workloads
+from riscv_emulator.batch import collect_programs, run_batch
+from riscv_emulator.harts import create_harts, run_harts, run_harts_parallel
+from riscv_emulator.profiler import Profiler, SamplingProfiler
+from riscv_emulator.symbols import load_symbols, SymbolTable
+from riscv_emulator.syscalls import Syscalls
+from riscv_emulator.devices import standard_devices
+from riscv_emulator.trace import Tracer, read_trace, format_trace
+from riscv_emulator.history import History, CHECKPOINT_INTERVAL, MEMORY_BUDGET
+from riscv_emulator.debugger import serve_debug
+from riscv_emulator.gdbstub import serve_gdb
+
+def add_limit_arguments(parser):
+    parser.add_argument("--max-instructions", type=int, help="Stop after this many instructions")
+    parser.add_argument("--timeout", type=float, help="Stop after this many seconds of wall-clock time")
+    parser.add_argument("--headless", action="store_true", help="Never prompt: EBREAK stops the run and the result is printed as JSON")
+    parser.add_argument("--profile", action="store_true", help="Count executions per PC, mnemonic and symbol and print a hot-spot report")
+    parser.add_argument("--sample", type=int, metavar="N", help="Profile by sampling the PC and call stack every N instructions instead of counting each one")
+    parser.add_argument("--symbols", help="Symbol file for the profile (default: the ELF symbol table or the .sym next to the program)")
+    parser.add_argument("--folded", help="Also write folded call stacks for flamegraph tools to this file")
+    parser.add_argument("--sandbox", help="Directory the guest may open files in via openat (default: none)")
+    parser.add_argument("--trace", help="Record every instruction (pc, encoding, register and memory writes) to this file")
+    parser.add_argument("--trace-uncompressed", action="store_true", help="Write the trace without zlib compression")
+    parser.add_argument("--checkpoint-interval", type=int, default=CHECKPOINT_INTERVAL, help="Instructions between reverse-debugging checkpoints in interactive runs (0 disables rstep/rcont)")
+    parser.add_argument("--history-budget", type=int, default=MEMORY_BUDGET >> 20, help="MiB of memory checkpoints may pin before the oldest are evicted")
+    parser.add_argument("--debug-json", metavar="SOURCE", help="Drive the debugger with JSON-lines requests from a file, - (stdin) or [host]:port instead of running")
+    parser.add_argument("--gdb", metavar="[HOST]:PORT", help="Wait for a GDB remote connection (target remote :PORT) and run under its control")
+    parser.add_argument("--devices", action="store_true", help="Attach a UART at 0x10000000 and a CLINT timer at 0x2000000 (QEMU virt layout)")
+
+def make_profiler(args, program, emu):
+    if not args.profile and not args.sample:
+        return None
+    if not args.symbols and emu.symbols is not None:
+        symbols = emu.symbols
+    else:
+        sym_file = args.symbols or os.path.splitext(program)[0] + ".sym"
+        symbols = load_symbols(sym_file) if os.path.exists(sym_file) else SymbolTable()
+    return SamplingProfiler(symbols, args.sample) if args.sample else Profiler(symbols)
+
+def make_tracer(args):
+    if not args.trace:
+        return None
+    return Tracer(args.trace, compress=not args.trace_uncompressed)
+
+def run_program(args, emu, profiler):
+    if args.debug_json:
+        # The program starts paused; the client runs it with step/cont. Responses go to stdout or the socket.
+        emu.headless = True
+        if args.checkpoint_interval > 0:
+            History(emu, args.checkpoint_interval, args.history_budget << 20)
+        serve_debug(emu, args.debug_json)
+        emu.flush_output()
+        return RunResult("detached", emu.instret, emu.pc, emu.registers(), emu.exit_code)
+    if args.gdb:
+        emu.headless = True
+        outcome = serve_gdb(emu, args.gdb)
+        if outcome == "detach":
+            # Detaching drops the breakpoints and lets the program run to the end.
+            emu.breakpoints.clear()
+            emu.block_cache.clear()
+            return emu.run(args.max_instructions, args.timeout)
+        emu.flush_output()
+        return RunResult(outcome, emu.instret, emu.pc, emu.registers(), emu.exit_code)
+    tracer = make_tracer(args)
+    if not args.headless and profiler is None and tracer is None and args.checkpoint_interval > 0:
+        # Interactive runs go through History so the debugger can step backwards; EBREAK stops the
+        # run and the debugger is entered here, with the instruction count exact.
+        history = History(emu, args.checkpoint_interval, args.history_budget << 20)
+        result = history.run(args.max_instructions, args.timeout)
+        while result.exit_reason == "ebreak":
+            print("EBREAK")
+            emu.debug()
+            result = history.run(args.max_instructions, args.timeout)
+        return result
+    try:
+        return emu.run(args.max_instructions, args.timeout, profiler, tracer)
+    finally:
+        if tracer is not None:
+            tracer.close()
+
+def check_hart_arguments(parser, args):
+    # run_harts has no debugger, profiler, tracer or history, and worker processes get neither a sandbox nor devices.
+    unsupported = [("--gdb", args.gdb), ("--debug-json", args.debug_json), ("--profile", args.profile),
+                   ("--sample", args.sample), ("--trace", args.trace),
+                   ("--checkpoint-interval", args.checkpoint_interval != CHECKPOINT_INTERVAL),
+                   ("--history-budget", args.history_budget != MEMORY_BUDGET >> 20)]
+    if args.processes:
+        unsupported += [("--sandbox", args.sandbox), ("--devices", args.devices)]
+    for option, value in unsupported:
+        if value:
+            parser.error(f"{option} is not supported with {'--processes' if args.processes else '--harts'}")
+
+def attach_devices(args, emu):
+    if args.devices:
+        for address, device in standard_devices():
+            emu.attach_device(address, device)
+
+def report_profile(args, profiler):
+    if profiler is None:
+        return
+    print(profiler.report())
+    if args.folded:
+        profiler.write_folded(args.folded)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -12,36 +115,122 @@ def main():
 
     assemble_parser = subparsers.add_parser("assemble", help="Assemble a .s file into a binary")
     assemble_parser.add_argument("input", help="Input assembly file (.s)")
+    assemble_parser.add_argument("--no-cache", action="store_true", help="Always reassemble, ignoring cached output")
+    assemble_parser.add_argument("--compress", action="store_true", help="Emit RV32C 16-bit encodings wherever they fit")
 
     run_parser = subparsers.add_parser("run", help="Run a binary file in the emulator")
-    run_parser.add_argument("binary", help="Binary file to run")
+    run_parser.add_argument("binary", help="Binary file to run (flat image or RV32 ELF)")
+    run_parser.add_argument("--engine", choices=ENGINES, default="interp", help="Execution engine")
+    run_parser.add_argument("--harts", type=int, default=1, help="Number of harts sharing memory, scheduled round-robin")
+    run_parser.add_argument("--processes", action="store_true", help="Run each hart in its own process over shared memory (implies --headless)")
+    add_limit_arguments(run_parser)
 
     full_parser = subparsers.add_parser("full", help="Assemble and run a file in one step")
     full_parser.add_argument("input", help="Input assembly file (.s)")
+    full_parser.add_argument("--engine", choices=ENGINES, default="interp", help="Execution engine")
+    full_parser.add_argument("--compress", action="store_true", help="Emit RV32C 16-bit encodings wherever they fit")
+    add_limit_arguments(full_parser)
 
     dis_parser = subparsers.add_parser("disassemble", help="Disassemble a binary file")
-    dis_parser.add_argument("hexcode", help="Hexcode to disassemble")
+    dis_parser.add_argument("hexcode", help="Hexcode to disassemble, or a binary or ELF file to list")
+    dis_parser.add_argument("--address", type=lambda value: int(value, 0), default=0, help="Load address of the binary")
+    dis_parser.add_argument("--symbols", help="Symbol file for labels (default: <binary>.sym)")
+
+    trace_parser = subparsers.add_parser("trace", help="Print a recorded trace as text")
+    trace_parser.add_argument("trace", help="Trace file written by --trace")
+    trace_parser.add_argument("--limit", type=int, help="Stop after this many instructions")
+
+    bench_parser = subparsers.add_parser("bench", help="Measure emulator throughput on the built-in workloads")
+    bench_parser.add_argument("--engine", action="append", choices=ENGINES, help="Engine to benchmark (repeatable, default: all)")
+    bench_parser.add_argument("--workload", action="append", choices=workloads(), help="Workload to run (repeatable, default: all)")
+    bench_parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    bench_parser.add_argument("--baseline", help="JSON results from an earlier run to compare against")
+
+    batch_parser = subparsers.add_parser("batch", help="Run many binaries in parallel and stream JSON-lines results")
+    batch_parser.add_argument("target", help="Directory of .bin files or a glob pattern")
+    batch_parser.add_argument("--workers", type=int, help="Worker processes (default: number of CPUs)")
+    batch_parser.add_argument("--engine", choices=ENGINES, default="interp", help="Execution engine")
+    batch_parser.add_argument("--max-instructions", type=int, help="Stop each program after this many instructions")
+    batch_parser.add_argument("--timeout", type=float, help="Stop each program after this many seconds")
 
     args = parser.parse_args()
 
     if args.command == "assemble":
-        assemble(args.input)
+        assemble(args.input, use_cache=not args.no_cache, compress=args.compress)
+
+    elif args.command == "run" and (args.harts > 1 or args.processes):
+        check_hart_arguments(parser, args)
+        if args.processes:
+            results = run_harts_parallel(args.binary, args.harts, args.engine, args.max_instructions, args.timeout)
+        else:
+            harts = create_harts(args.harts, args.engine, args.headless)
+            harts[0].syscalls = Syscalls(args.sandbox)
+            attach_devices(args, harts[0])
+            harts[0].load_program(args.binary)
+            for hart in harts[1:]:
+                hart.pc = harts[0].pc
+                hart.program_end = harts[0].program_end
+                hart.syscalls = harts[0].syscalls
+            results = run_harts(harts, args.max_instructions, args.timeout)
+        if args.headless or args.processes:
+            for hart_id, result in enumerate(results):
+                print(json.dumps(dict(hart=hart_id, **result.to_dict())))
 
     elif args.command == "run":
-        emu = emulator()
+        emu = emulator(engine=args.engine, headless=args.headless)
+        emu.syscalls = Syscalls(args.sandbox)
+        attach_devices(args, emu)
         emu.load_program(args.binary)
-        emu.run()
+        profiler = make_profiler(args, args.binary, emu)
+        result = run_program(args, emu, profiler)
+        if args.headless:
+            print(json.dumps(result.to_dict()))
+        report_profile(args, profiler)
+        if result.exit_code:
+            sys.exit(result.exit_code & 0xff)
 
     elif args.command == "full":
-        assemble(args.input)
-        emu = emulator()
+        assemble(args.input, compress=args.compress)
+        emu = emulator(engine=args.engine, headless=args.headless)
+        emu.syscalls = Syscalls(args.sandbox)
+        attach_devices(args, emu)
         bin_file = args.input.rsplit(".", 1)[0] + ".bin"
         emu.load_program(bin_file)
-        emu.run()
-        emu.debug()
+        profiler = make_profiler(args, args.input, emu)
+        result = run_program(args, emu, profiler)
+        if args.headless:
+            print(json.dumps(result.to_dict()))
+        report_profile(args, profiler)
+        if not args.headless and not args.debug_json and not args.gdb:
+            emu.debug()
 
     elif args.command == "disassemble":
-        print(disassemble(args.hexcode))
+        if os.path.isfile(args.hexcode):
+            symbols = load_symbols(args.symbols) if args.symbols else None
+            try:
+                for line in format_listing(disassemble_file(args.hexcode, args.address, symbols)):
+                    print(line)
+                sys.stdout.flush()
+            except BrokenPipeError:
+                # The reader (e.g. head) went away; point stdout at devnull so the exit-time flush doesn't fail too.
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                sys.exit(0)
+        else:
+            print(disassemble(args.hexcode))
+
+    elif args.command == "trace":
+        for index, line in enumerate(format_trace(read_trace(args.trace))):
+            if args.limit is not None and index >= args.limit:
+                break
+            print(line)
+
+    elif args.command == "batch":
+        programs = collect_programs(args.target)
+        for record in run_batch(programs, args.workers, args.engine, args.max_instructions, args.timeout):
+            print(json.dumps(record), flush=True)
+
+    elif args.command == "bench":
+        print(bench(args.workload, args.engine or ENGINES, args.json, args.baseline))
 
 if __name__ == "__main__":
     main()
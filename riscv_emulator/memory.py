@@ -0,0 +1,291 @@
+import mmap, os, struct
+
+PAGE_SHIFT = 12
+PAGE_SIZE = 1 << PAGE_SHIFT
+PAGE_MASK = PAGE_SIZE - 1
+PAGE_COUNT = 1 << (32 - PAGE_SHIFT)
+ADDRESS_SPACE = 1 << 32
+ZERO_PAGE = bytes(PAGE_SIZE)
+# Indexed by access size. unpack_from/pack_into work on the page in place: no slice, no bytes object.
+UNPACK = (None, None, struct.Struct("<H").unpack_from, None, struct.Struct("<I").unpack_from)
+PACK = (None, None, struct.Struct("<H").pack_into, None, struct.Struct("<I").pack_into)
+
+class DevicePage:
+    # Stands in for a page's bytes: load() and store() slice it like RAM and the slices become
+    # device reads and writes, so the RAM path needs no MMIO check at all.
+    def __init__(self, address):
+        self.address = address
+        self.ranges = []
+
+    def __len__(self):
+        return PAGE_SIZE
+
+    def find(self, offset):
+        for start, end, device, base in self.ranges:
+            if start <= offset < end:
+                return device, self.address + offset - base
+        return None, 0
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, min(key.stop, PAGE_SIZE)
+        size = stop - start
+        device, offset = self.find(start)
+        if device is not None and size in (1, 2, 4, 8):
+            return device.read(offset, size).to_bytes(size, "little")
+        out = bytearray(size)
+        for index in range(size):
+            device, offset = self.find(start + index)
+            if device is not None:
+                out[index] = device.read(offset, 1) & 0xff
+        return bytes(out)
+
+    def __setitem__(self, key, data):
+        if isinstance(key, int):
+            self[key:key + 1] = bytes((data,))
+            return
+        start = key.start or 0
+        size = len(data)
+        device, offset = self.find(start)
+        if device is not None and size in (1, 2, 4, 8):
+            device.write(offset, size, int.from_bytes(data, "little"))
+            return
+        for index, value in enumerate(bytes(data)):
+            device, offset = self.find(start + index)
+            if device is not None:
+                device.write(offset, 1, value)
+
+class Memory:
+    def __init__(self):
+        # Every readable page, including read-only views into mapped files.
+        self.pages = {}
+        # Pages this memory owns and may write in place; always a subset of pages.
+        self.writable = {}
+        self.mappings = []
+        # Pages as of the latest snapshot; lets restore() revert only what was written since.
+        self.base = None
+        # Pages backed by an external buffer (e.g. shared memory) or a device; always written in place.
+        self.shared = {}
+        self.device_pages = {}
+        self.devices = []
+
+    def __len__(self):
+        return ADDRESS_SPACE
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start = key.start or 0
+            return self.read(start, max(0, key.stop - start))
+        return self.load(key, 1)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            self.write(key.start or 0, value)
+        else:
+            self.store(key, 1, value)
+
+    def page(self, number):
+        return self.pages.get(number & (PAGE_COUNT - 1), ZERO_PAGE)
+
+    def writable_page(self, number):
+        number &= PAGE_COUNT - 1
+        page = self.writable.get(number)
+        if page is None:
+            page = bytearray(self.pages.get(number, ZERO_PAGE))
+            self.pages[number] = page
+            self.writable[number] = page
+        return page
+
+    def read(self, address, length):
+        out = bytearray()
+        while length > 0:
+            offset = address & PAGE_MASK
+            chunk = min(length, PAGE_SIZE - offset)
+            out += self.page(address >> PAGE_SHIFT)[offset:offset + chunk]
+            address += chunk
+            length -= chunk
+        return bytes(out)
+
+    def write(self, address, data):
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view):
+            offset = address & PAGE_MASK
+            chunk = min(len(view) - pos, PAGE_SIZE - offset)
+            self.writable_page(address >> PAGE_SHIFT)[offset:offset + chunk] = view[pos:pos + chunk]
+            address += chunk
+            pos += chunk
+
+    def views(self, address, length):
+        # Read-only slices of the pages covering [address, address + length), without copying.
+        while length > 0:
+            offset = address & PAGE_MASK
+            chunk = min(length, PAGE_SIZE - offset)
+            page = self.page(address >> PAGE_SHIFT)
+            if isinstance(page, DevicePage):
+                yield memoryview(page[offset:offset + chunk])
+            else:
+                yield memoryview(page)[offset:offset + chunk]
+            address += chunk
+            length -= chunk
+
+    def writable_views(self, address, length):
+        while length > 0:
+            offset = address & PAGE_MASK
+            chunk = min(length, PAGE_SIZE - offset)
+            yield memoryview(self.writable_page(address >> PAGE_SHIFT))[offset:offset + chunk]
+            address += chunk
+            length -= chunk
+
+    def load(self, address, size):
+        offset = address & PAGE_MASK
+        if offset + size <= PAGE_SIZE:
+            page = self.pages.get((address >> PAGE_SHIFT) & (PAGE_COUNT - 1))
+            if page is None:
+                return 0
+            if size == 1:
+                return page[offset]
+            try:
+                return UNPACK[size](page, offset)[0]
+            except TypeError:
+                # Device pages expose no buffer; they take the slicing path.
+                return int.from_bytes(page[offset:offset + size], "little")
+        return int.from_bytes(self.read(address, size), "little")
+
+    def store(self, address, size, value):
+        value &= (1 << (size << 3)) - 1
+        offset = address & PAGE_MASK
+        if offset + size <= PAGE_SIZE:
+            page = self.writable.get((address >> PAGE_SHIFT) & (PAGE_COUNT - 1)) or self.writable_page(address >> PAGE_SHIFT)
+            if size == 1:
+                page[offset] = value
+                return
+            try:
+                PACK[size](page, offset, value)
+            except TypeError:
+                page[offset:offset + size] = value.to_bytes(size, "little")
+        else:
+            self.write(address, value.to_bytes(size, "little"))
+
+    def atomic_update(self, address, op, value):
+        old = self.load(address, 4)
+        self.store(address, 4, op(old, value))
+        return old
+
+    def compare_and_store(self, address, expected, value):
+        if self.load(address, 4) != expected:
+            return False
+        self.store(address, 4, value)
+        return True
+
+    def attach(self, buffer, address=0):
+        view = memoryview(buffer)
+        for offset in range(0, len(view) & ~PAGE_MASK, PAGE_SIZE):
+            number = ((address + offset) >> PAGE_SHIFT) & (PAGE_COUNT - 1)
+            page = view[offset:offset + PAGE_SIZE]
+            self.pages[number] = self.writable[number] = self.shared[number] = page
+        self.base = None
+
+    def open_file(self, path):
+        # A read-only view of the whole file, mapped when possible; kept alive as long as the memory.
+        with open(path, "rb") as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return memoryview(f.read())
+        self.mappings.append(mapped)
+        return memoryview(mapped)
+
+    def map_device(self, address, size, device):
+        # Device ranges share pages with nothing but other devices; RAM in those pages is dropped.
+        for number in range(address >> PAGE_SHIFT, (address + size + PAGE_MASK) >> PAGE_SHIFT):
+            number &= PAGE_COUNT - 1
+            page = self.device_pages.get(number)
+            if page is None:
+                page = self.device_pages[number] = DevicePage(number << PAGE_SHIFT)
+                self.pages[number] = self.writable[number] = self.shared[number] = page
+            start = max(address, number << PAGE_SHIFT) - (number << PAGE_SHIFT)
+            end = min(address + size, (number + 1) << PAGE_SHIFT) - (number << PAGE_SHIFT)
+            page.ranges.append((start, end, device, address))
+        self.devices.append(device)
+        self.base = None
+
+    def map_file(self, path, address=0):
+        view = self.open_file(path)
+        self.map_view(view, address)
+        return len(view)
+
+    def map_view(self, view, address):
+        # Whole pages are served straight from the view until something writes to them; partial ones are copied.
+        head = min(len(view), -address & PAGE_MASK)
+        if head:
+            self.write(address, view[:head])
+        full = head + ((len(view) - head) & ~PAGE_MASK)
+        for offset in range(head, full, PAGE_SIZE):
+            number = ((address + offset) >> PAGE_SHIFT) & (PAGE_COUNT - 1)
+            self.pages[number] = view[offset:offset + PAGE_SIZE]
+            self.writable.pop(number, None)
+        if full < len(view):
+            self.write(address + full, view[full:])
+        self.base = None
+
+    def zero_fill(self, address, length):
+        # Whole pages are dropped so they read as ZERO_PAGE; only the partial pages at either end are written.
+        end = address + length
+        head = min(end, (address + PAGE_MASK) & ~PAGE_MASK)
+        if head > address:
+            self.write(address, bytes(head - address))
+        tail = max(head, end & ~PAGE_MASK)
+        for number in range(head >> PAGE_SHIFT, tail >> PAGE_SHIFT):
+            number &= PAGE_COUNT - 1
+            self.pages.pop(number, None)
+            self.writable.pop(number, None)
+        if end > tail:
+            self.write(tail, bytes(end - tail))
+        self.base = None
+
+    def snapshot(self):
+        # Nothing is copied: pages become shared and the next write to each one copies it first.
+        self.writable = dict(self.shared)
+        self.base = dict(self.pages)
+        return self.base
+
+    def restore(self, pages):
+        if pages is self.base:
+            changed = set(self.writable)
+            for number in changed:
+                if number in pages:
+                    self.pages[number] = pages[number]
+                else:
+                    del self.pages[number]
+        else:
+            changed = set(self.pages) | set(pages)
+            self.pages = dict(pages)
+            self.pages.update(self.device_pages)
+            self.base = pages
+        self.writable = dict(self.shared)
+        return changed
+
+class LockedMemory(Memory):
+    # For memory shared between processes: stores and atomics are serialized so an AMO's
+    # read-modify-write can never interleave with another hart's plain store.
+    def __init__(self, lock):
+        super().__init__()
+        self.lock = lock
+
+    def store(self, address, size, value):
+        with self.lock:
+            Memory.store(self, address, size, value)
+
+    def write(self, address, data):
+        with self.lock:
+            Memory.write(self, address, data)
+
+    def atomic_update(self, address, op, value):
+        with self.lock:
+            return Memory.atomic_update(self, address, op, value)
+
+    def compare_and_store(self, address, expected, value):
+        with self.lock:
+            return Memory.compare_and_store(self, address, expected, value)
@@ -0,0 +1,118 @@
+from collections import defaultdict
+from riscv_emulator.disassembler import disassemble_word
+from riscv_emulator.symbols import SymbolTable
+from riscv_emulator.state import SINK
+
+LINK_REGISTERS = (1, 5)
+SAMPLE_INTERVAL = 10_000
+
+class Profiler:
+    # Sampling profilers set interval; counts are then samples, not instructions.
+    interval = None
+    unit = "instructions"
+
+    def __init__(self, symbols=None):
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.pc_counts = defaultdict(int)
+        self.taken = defaultdict(int)
+        self.not_taken = defaultdict(int)
+        self.frame_counts = defaultdict(int)
+        self.frames = {}
+        self.stacks = []
+        self.stack = []
+        self.instructions = {}
+
+    def frame_id(self):
+        key = tuple(self.stack)
+        frame = self.frames.get(key)
+        if frame is None:
+            frame = self.frames[key] = len(self.stacks)
+            self.stacks.append(key)
+        return frame
+
+    def enter(self, pc):
+        if not self.stack:
+            self.stack.append(pc)
+        return self.frame_id()
+
+    def track(self, opcode, rd, rs1, target):
+        # Calls link through ra/t0; `jalr x0, 0(ra)` is the matching return.
+        if rd in LINK_REGISTERS:
+            self.stack.append(target)
+        elif opcode == 0x67 and rd == SINK and rs1 in LINK_REGISTERS and len(self.stack) > 1:
+            self.stack.pop()
+
+    def on_jump(self, opcode, rd, rs1, target):
+        self.track(opcode, rd, rs1, target)
+        return self.frame_id()
+
+    def collect(self, emu):
+        for pc in self.pc_counts:
+            if pc not in self.instructions:
+                self.instructions[pc] = disassemble_word(emu.memory.load(pc, 4))
+
+    def total(self):
+        return sum(self.pc_counts.values())
+
+    def mnemonic_counts(self):
+        counts = defaultdict(int)
+        for pc, count in self.pc_counts.items():
+            counts[self.instructions.get(pc, "unknown").split()[0]] += count
+        return sorted(counts.items(), key=lambda item: -item[1])
+
+    def symbol_counts(self):
+        counts = defaultdict(int)
+        for pc, count in self.pc_counts.items():
+            found = self.symbols.lookup(pc)
+            counts[found[0] if found else "?"] += count
+        return sorted(counts.items(), key=lambda item: -item[1])
+
+    def folded(self):
+        lines = []
+        for frame, count in self.frame_counts.items():
+            names = ";".join(self.symbols.format(pc) for pc in self.stacks[frame])
+            lines.append(f"{names} {count}")
+        return sorted(lines)
+
+    def write_folded(self, path):
+        with open(path, "w") as f:
+            f.write("\n".join(self.folded()) + "\n")
+
+    def report(self, top=20):
+        total = self.total() or 1
+        lines = [f"Profile: {self.total()} {self.unit}", "",
+                 f"{'count':>10} {'%':>6}  {'pc':<10} {'symbol':<20} instruction"]
+        for pc, count in sorted(self.pc_counts.items(), key=lambda item: -item[1])[:top]:
+            lines.append(f"{count:>10} {100 * count / total:>5.1f}%  {pc:#010x} {self.symbols.format(pc):<20} {self.instructions.get(pc, '')}")
+
+        lines += ["", f"{'mnemonic':<10} {'count':>10} {'%':>6}"]
+        for mnemonic, count in self.mnemonic_counts():
+            lines.append(f"{mnemonic:<10} {count:>10} {100 * count / total:>5.1f}%")
+
+        lines += ["", f"{'symbol':<20} {'count':>10} {'%':>6}"]
+        for name, count in self.symbol_counts():
+            lines.append(f"{name:<20} {count:>10} {100 * count / total:>5.1f}%")
+
+        branches = set(self.taken) | set(self.not_taken)
+        if branches:
+            lines += ["", f"{'branch':<10} {'symbol':<20} {'taken':>10} {'not taken':>10}"]
+            for pc in sorted(branches, key=lambda pc: -(self.taken[pc] + self.not_taken[pc])):
+                lines.append(f"{pc:#010x} {self.symbols.format(pc):<20} {self.taken[pc]:>10} {self.not_taken[pc]:>10}")
+        return "\n".join(lines)
+
+class SamplingProfiler(Profiler):
+    # Records the PC and the call stack every interval instructions instead of counting each one. The
+    # run loop checks between translated blocks, so a sample lands at most one block past its due point.
+    unit = "samples"
+
+    def __init__(self, symbols=None, interval=SAMPLE_INTERVAL):
+        if interval <= 0:
+            raise ValueError("Sample interval must be positive")
+        super().__init__(symbols)
+        self.interval = interval
+        # Instruction count (emu.instret) at which the next sample is due.
+        self.due = interval
+
+    def sample(self, pc):
+        self.pc_counts[pc] += 1
+        self.frame_counts[self.frame_id()] += 1
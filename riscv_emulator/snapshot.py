@@ -0,0 +1,42 @@
+import mmap, struct
+from riscv_emulator.memory import PAGE_SIZE, DevicePage
+from riscv_emulator.state import STATE
+
+MAGIC = b"RVSNAP02"
+HEADER = struct.Struct("<8sII")
+
+class Snapshot:
+    # state is HartState.pack(): pc, instret, the registers and the CSRs. syscalls is Syscalls.snapshot(),
+    # or None to leave the syscall layer as it is on restore.
+    def __init__(self, state, pages, exit_code=None, syscalls=None):
+        self.state = state
+        self.pages = pages
+        self.exit_code = exit_code
+        self.syscalls = syscalls
+        self.pc, self.instret = STATE.unpack_from(state)[:2]
+
+    def save(self, path):
+        # Device pages are live state of the devices, not memory contents, and host files are not saved either.
+        numbers = sorted(number for number, page in self.pages.items() if not isinstance(page, DevicePage))
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(self.state), len(numbers)))
+            f.write(self.state)
+            f.write(struct.pack(f"<{len(numbers)}I", *numbers))
+            # Page data starts on a page boundary so load_snapshot() can map it in place.
+            f.write(bytes(-f.tell() % PAGE_SIZE))
+            for number in numbers:
+                f.write(self.pages[number])
+
+def load_snapshot(path):
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, size, count = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"Not a snapshot file: {path}")
+    state = bytes(view[HEADER.size:HEADER.size + size])
+    numbers = struct.unpack_from(f"<{count}I", view, HEADER.size + size)
+    data = HEADER.size + size + 4 * count
+    data += -data % PAGE_SIZE
+    pages = {number: view[data + i * PAGE_SIZE:data + (i + 1) * PAGE_SIZE] for i, number in enumerate(numbers)}
+    return Snapshot(state, pages)
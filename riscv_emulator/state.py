@@ -0,0 +1,45 @@
+import struct
+
+REGISTER_COUNT = 32
+# Decoding sends writes to x0 here instead, so rg[0] stays zero without being reset after every instruction.
+SINK = 32
+STATE = struct.Struct("<IQI32I")
+CSR = struct.Struct("<II")
+
+class HartState:
+    # The architectural state of one hart. Every value in rg is already wrapped to 32 bits: handlers mask
+    # what they store, so nothing reading a register has to.
+    __slots__ = ("rg", "pc", "instret", "hart_id", "csr", "reservation")
+
+    def __init__(self, hart_id=0):
+        # A list rather than array('I'): CPython specializes list subscripts but not array ones, and an
+        # array register file benchmarked 1.2-1.8x slower. pack() gives the compact form.
+        self.rg = [0] * (REGISTER_COUNT + 1)
+        self.pc = 0
+        self.instret = 0
+        self.hart_id = hart_id
+        self.csr = {}
+        # (address, value) seen by the last LR.W; SC.W succeeds only if memory still holds that value.
+        self.reservation = None
+
+    def registers(self):
+        return self.rg[:REGISTER_COUNT]
+
+    def set_registers(self, values):
+        self.rg[:REGISTER_COUNT] = [value & 0xffffffff for value in values]
+        self.rg[0] = 0
+
+    def pack(self):
+        # pc, instret, the registers and the CSRs in one bytes object, for snapshots and passing between processes.
+        data = STATE.pack(self.pc & 0xffffffff, self.instret, len(self.csr), *self.registers())
+        return data + b"".join(CSR.pack(number, value) for number, value in sorted(self.csr.items()))
+
+    def unpack(self, data):
+        fields = STATE.unpack_from(data)
+        if len(data) != STATE.size + fields[2] * CSR.size:
+            raise ValueError("Truncated hart state")
+        self.pc, self.instret = fields[0], fields[1]
+        self.set_registers(fields[3:])
+        self.csr = dict(CSR.iter_unpack(memoryview(data)[STATE.size:]))
+        self.reservation = None
+        return self
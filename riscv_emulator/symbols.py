@@ -0,0 +1,46 @@
+import bisect
+
+class SymbolTable:
+    def __init__(self):
+        self.addresses = []
+        self.names = []
+        self.by_name = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, address):
+        if name in self.by_name:
+            return
+        self.by_name[name] = address
+        index = bisect.bisect_right(self.addresses, address)
+        if index and self.addresses[index - 1] == address:
+            return
+        self.addresses.insert(index, address)
+        self.names.insert(index, name)
+
+    def address_of(self, name):
+        return self.by_name.get(name)
+
+    def lookup(self, address):
+        index = bisect.bisect_right(self.addresses, address) - 1
+        if index < 0:
+            return None
+        return self.names[index], address - self.addresses[index]
+
+    def format(self, address):
+        found = self.lookup(address)
+        if found is None:
+            return f"{address:#x}"
+        name, offset = found
+        return f"{name}+{offset:#x}" if offset else name
+
+def load_symbols(path):
+    table = SymbolTable()
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 3 or parts[0].startswith('#') or parts[2] == "constant":
+                continue
+            table.add(parts[0], int(parts[1], 16))
+    return table
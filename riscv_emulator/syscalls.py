@@ -0,0 +1,250 @@
+import errno, os, sys
+
+SYS_OPENAT = 56
+SYS_CLOSE = 57
+SYS_READ = 63
+SYS_WRITE = 64
+SYS_EXIT = 93
+SYS_EXIT_GROUP = 94
+SYS_BRK = 214
+EXITS = (SYS_EXIT, SYS_EXIT_GROUP)
+
+# Guest open flags are the Linux asm-generic values; they are translated so the host's own values never leak in.
+OPEN_FLAGS = {
+    0o100: os.O_CREAT,
+    0o200: os.O_EXCL,
+    0o1000: os.O_TRUNC,
+    0o2000: os.O_APPEND,
+}
+ACCESS_MODES = (os.O_RDONLY, os.O_WRONLY, os.O_RDWR)
+FLUSH_THRESHOLD = 1 << 16
+MAX_PATH = 4096
+MAX_FDS = 256
+
+class Syscalls:
+    # Linux/newlib-style ECALLs: number in a7, arguments in a0-a5, result (or -errno) in a0.
+    def __init__(self, root=None, stdout=None, stderr=None, stdin=None):
+        # openat() only sees files under root; without one it always fails with EACCES.
+        self.root = os.path.realpath(root) if root is not None else None
+        self.streams = {1: stdout, 2: stderr}
+        self.buffers = {1: bytearray(), 2: bytearray()}
+        self.stdin = stdin
+        self.files = {}
+        # Host path and open flags per guest fd, so a restored snapshot can reopen its files.
+        self.paths = {}
+        self.brk = None
+        # With a log, every call's result and its effect on guest memory is kept in order. Calls before
+        # position are served from it (after a rewind), so the host never sees the same call twice.
+        # log[0] is call number log_start; forget() drops the ones no rewind can reach any more.
+        self.log = None
+        self.log_start = 0
+        self.position = 0
+        self.handlers = {
+            SYS_OPENAT: self.openat,
+            SYS_CLOSE: self.close,
+            SYS_READ: self.read,
+            SYS_WRITE: self.write,
+            SYS_EXIT: self.exit,
+            SYS_EXIT_GROUP: self.exit,
+            SYS_BRK: self.set_brk,
+        }
+
+    def handle(self, emu):
+        # False leaves the ECALL to the emulator's default (stop the run).
+        number = emu.rg[17]
+        handler = self.handlers.get(number)
+        if handler is None:
+            return False
+        logged = self.log is not None and number not in EXITS
+        if logged and self.position < self.log_start + len(self.log):
+            emu.rg[10], effect = self.log[self.position - self.log_start]
+            self.position += 1
+            if effect is not None:
+                address, data = effect
+                if isinstance(data, int):
+                    emu.memory.zero_fill(address, data)
+                else:
+                    emu.memory.write(address, data)
+                    emu.invalidate(address, len(data))
+            return True
+        args = emu.rg[10:16]
+        brk = self.brk
+        result = emu.rg[10] = handler(emu, *args) & 0xffffffff
+        if logged:
+            effect = None
+            if number == SYS_READ and 0 < result < 0x80000000:
+                effect = (args[1], emu.memory.read(args[1], result))
+            elif number == SYS_BRK and brk is not None and self.brk < brk:
+                effect = (self.brk, brk - self.brk)
+            self.log.append((result, effect))
+            self.position += 1
+        return True
+
+    def snapshot(self):
+        # brk and the open files with their offsets; file contents are the host's and are not copied.
+        files = {}
+        for fd, host_fd in self.files.items():
+            try:
+                offset = os.lseek(host_fd, 0, os.SEEK_CUR)
+            except OSError:
+                offset = None
+            files[fd] = self.paths[fd] + (offset,)
+        return self.brk, files
+
+    def restore(self, state):
+        self.brk, files = state
+        self.flush()
+        for host_fd in self.files.values():
+            os.close(host_fd)
+        self.files.clear()
+        self.paths.clear()
+        for fd, (path, flags, offset) in files.items():
+            try:
+                host_fd = os.open(path, flags & ~(os.O_CREAT | os.O_EXCL | os.O_TRUNC))
+                if offset is not None:
+                    os.lseek(host_fd, offset, os.SEEK_SET)
+            except OSError:
+                # Gone since the snapshot: the guest sees EBADF on it.
+                continue
+            self.files[fd] = host_fd
+            self.paths[fd] = (path, flags)
+
+    def forget(self, position):
+        # Drops logged calls before position.
+        if self.log is not None and position > self.log_start:
+            del self.log[:position - self.log_start]
+            self.log_start = position
+
+    def flush(self):
+        for fd, buffer in self.buffers.items():
+            if not buffer:
+                continue
+            write_output(self.streams[fd] or (sys.stdout if fd == 1 else sys.stderr), buffer)
+            buffer.clear()
+
+    def close_all(self):
+        self.flush()
+        for host_fd in self.files.values():
+            os.close(host_fd)
+        self.files.clear()
+        self.paths.clear()
+
+    def host_fd(self, fd):
+        if fd == 0:
+            return self.stdin if self.stdin is not None else sys.stdin.fileno()
+        return self.files.get(fd)
+
+    def write(self, emu, fd, address, length, *_):
+        buffer = self.buffers.get(fd)
+        views = list(emu.memory.views(address, length))
+        if buffer is not None:
+            for view in views:
+                buffer += view
+            if len(buffer) >= FLUSH_THRESHOLD:
+                self.flush()
+            return length
+        host_fd = self.host_fd(fd)
+        if host_fd is None:
+            return -errno.EBADF
+        try:
+            return os.writev(host_fd, views) if views else 0
+        except OSError as e:
+            return -e.errno
+
+    def read(self, emu, fd, address, length, *_):
+        host_fd = self.host_fd(fd)
+        if host_fd is None:
+            return -errno.EBADF
+        if fd == 0:
+            # Prompts written so far must be visible before the guest blocks on input.
+            self.flush()
+        try:
+            views = list(emu.memory.writable_views(address, length))
+        except TypeError:
+            # Part of the buffer is a device page, which has no buffer to read into.
+            views = None
+        try:
+            if views is None:
+                data = os.read(host_fd, length)
+                emu.memory.write(address, data)
+                count = len(data)
+            else:
+                count = os.readv(host_fd, views) if length else 0
+        except OSError as e:
+            return -e.errno
+        if count:
+            emu.invalidate(address, count)
+        return count
+
+    def openat(self, emu, dirfd, address, flags, mode, *_):
+        if self.root is None:
+            return -errno.EACCES
+        path = read_string(emu.memory, address)
+        if path is None:
+            return -errno.ENAMETOOLONG
+        # Absolute and dirfd-relative paths alike resolve inside the sandbox, and symlinks may not escape it.
+        full = os.path.realpath(os.path.join(self.root, path.lstrip("/")))
+        if full != self.root and not full.startswith(self.root + os.sep):
+            return -errno.EACCES
+        if flags & 0x3 == 0x3:
+            return -errno.EINVAL
+        host_flags = ACCESS_MODES[flags & 0x3]
+        for guest, host in OPEN_FLAGS.items():
+            if flags & guest:
+                host_flags |= host
+        fd = next((fd for fd in range(3, MAX_FDS) if fd not in self.files), None)
+        if fd is None:
+            return -errno.EMFILE
+        try:
+            self.files[fd] = os.open(full, host_flags, mode & 0o777)
+        except OSError as e:
+            return -e.errno
+        self.paths[fd] = (full, host_flags)
+        return fd
+
+    def close(self, emu, fd, *_):
+        if fd in self.files:
+            os.close(self.files.pop(fd))
+            del self.paths[fd]
+            return 0
+        if fd in self.buffers:
+            self.flush()
+            return 0
+        return 0 if fd == 0 else -errno.EBADF
+
+    def set_brk(self, emu, address, *_):
+        # The heap starts on the page after the loaded image; memory is sparse, so growing costs nothing.
+        if self.brk is None:
+            self.brk = (emu.program_end + 0xfff) & ~0xfff
+        if address >= (emu.program_end + 0xfff) & ~0xfff:
+            if address < self.brk:
+                emu.memory.zero_fill(address, self.brk - address)
+            self.brk = address
+        return self.brk
+
+    def exit(self, emu, code, *_):
+        # The emulator stops the run once exit_code is set.
+        self.close_all()
+        emu.exit_code = (code ^ 0x80000000) - 0x80000000
+        return code
+
+def write_output(stream, data):
+    # Bytes go to the binary buffer behind a text stream when there is one, after anything already printed to it.
+    target = getattr(stream, "buffer", None)
+    if target is None:
+        stream.write(data.decode(errors="replace"))
+    else:
+        stream.flush()
+        target.write(data)
+    stream.flush()
+
+def read_string(memory, address):
+    data = bytearray()
+    while len(data) < MAX_PATH:
+        for view in memory.views(address + len(data), 256):
+            end = bytes(view).find(b"\0")
+            if end >= 0:
+                data += view[:end]
+                return data.decode(errors="replace")
+            data += view
+    return None
@@ -0,0 +1,201 @@
+import queue, struct, threading, zlib
+from riscv_emulator.disassembler import disassemble_word
+from riscv_emulator.state import SINK
+
+MAGIC = b"RVTRACE1"
+HEADER = struct.Struct("<8sII32I")
+FRAME = struct.Struct("<I")
+CHUNK_SIZE = 1 << 16
+COMPRESSED = 0x1
+
+# Each record is a flags byte followed by only the fields it needs:
+#   JUMP  zigzag varint: pc minus the fall-through pc of the previous record
+#   WORD  the instruction (2 or 4 bytes), sent the first time a pc runs and again whenever its code changes
+#   REG   rd, then a zigzag varint: new value minus rd's previous value
+#   MEM   zigzag varint: address minus the previous access's address, then a varint of the value loaded
+#         (loads, LR, AMOs) or stored (stores, SC)
+JUMP = 0x01
+WORD = 0x02
+REG = 0x04
+MEM = 0x08
+
+LOAD, STORE, ATOMIC, SYSTEM, BRANCH = 0x03, 0x23, 0x2f, 0x73, 0x63
+
+def put_varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def get_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def zigzag(delta):
+    delta = ((delta & 0xffffffff) ^ 0x80000000) - 0x80000000
+    return delta << 1 if delta >= 0 else (~delta << 1) | 1
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else ~(value >> 1)
+
+class Tracer:
+    # Records are packed into chunks on the emulator thread; a background thread compresses and writes them.
+    def __init__(self, path, compress=True, chunk_size=CHUNK_SIZE):
+        self.file = open(path, "wb")
+        self.compress = compress
+        self.chunk_size = chunk_size
+        self.chunk = bytearray()
+        self.frames = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self.write_frames, daemon=True)
+        self.started = False
+        self.registers = [0] * 32
+        self.expected = 0
+        self.address = 0
+        self.decoded = {}
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self, emu):
+        if self.started:
+            return
+        self.started = True
+        self.registers = emu.registers()
+        self.expected = emu.pc
+        self.file.write(HEADER.pack(MAGIC, COMPRESSED if self.compress else 0, emu.pc & 0xffffffff, *self.registers))
+        self.writer.start()
+
+    def changed(self, pc, decoded):
+        # A new decode-cache entry means the code at pc was (re)decoded, possibly after being rewritten.
+        return self.decoded.get(pc) is not decoded
+
+    def record(self, emu, pc, decoded, address, word):
+        # address is rs1 + imm and word the instruction as they were before it ran; word is None when
+        # decoded is already the record this pc last ran (see changed()). Memory is never read here: a
+        # second read of a device register would have side effects.
+        opcode, rd, funct3, rs1, rs2, funct7, _, _ = decoded
+        kind = opcode & 0x7f
+        out = self.chunk
+        flags_at = len(out)
+        out.append(0)
+        flags = 0
+        if pc != self.expected:
+            flags |= JUMP
+            put_varint(out, zigzag(pc - self.expected))
+        if word is not None:
+            self.decoded[pc] = decoded
+            flags |= WORD
+            out += word.to_bytes(2 if opcode & 0x80 else 4, "little")
+        if kind == SYSTEM and not funct3:
+            # A syscall's result lands in a0.
+            rd = 10
+        if rd != SINK and kind not in (STORE, BRANCH):
+            value = emu.rg[rd]
+            flags |= REG
+            out.append(rd)
+            put_varint(out, zigzag(value - self.registers[rd]))
+            self.registers[rd] = value
+        if kind in (LOAD, STORE, ATOMIC):
+            address &= 0xffffffff
+            if kind == STORE:
+                value = emu.rg[rs2] & ((1 << (8 << funct3)) - 1)
+            elif kind == ATOMIC and funct7 >> 2 == 0x03:
+                value = emu.rg[rs2]
+            else:
+                # Loads into x0 leave the value in the sink register too.
+                value = emu.rg[rd]
+            flags |= MEM
+            put_varint(out, zigzag(address - self.address))
+            put_varint(out, value)
+            self.address = address
+        out[flags_at] = flags
+        self.expected = pc + (2 if opcode & 0x80 else 4)
+        self.count += 1
+        if len(out) >= self.chunk_size:
+            self.frames.put(bytes(out))
+            out.clear()
+
+    def write_frames(self):
+        while True:
+            chunk = self.frames.get()
+            if chunk is None:
+                return
+            if self.compress:
+                chunk = zlib.compress(chunk)
+            self.file.write(FRAME.pack(len(chunk)))
+            self.file.write(chunk)
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.started:
+            if self.chunk:
+                self.frames.put(bytes(self.chunk))
+                self.chunk.clear()
+            self.frames.put(None)
+            self.writer.join()
+        self.file.close()
+
+def read_trace(path):
+    # Yields (pc, word, rd, value, address, memory_value); rd/value and address/memory_value are None when absent.
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or header[:8] != MAGIC:
+            raise ValueError(f"Not a trace file: {path}")
+        fields = HEADER.unpack(header)
+        compressed = fields[1] & COMPRESSED
+        expected = fields[2]
+        registers = list(fields[3:])
+        words = {}
+        last_address = 0
+        while True:
+            size = f.read(FRAME.size)
+            if len(size) < FRAME.size:
+                return
+            data = f.read(FRAME.unpack(size)[0])
+            if compressed:
+                data = zlib.decompress(data)
+            pos = 0
+            while pos < len(data):
+                flags = data[pos]
+                pos += 1
+                pc = expected
+                if flags & JUMP:
+                    delta, pos = get_varint(data, pos)
+                    pc = (expected + unzigzag(delta)) & 0xffffffff
+                if flags & WORD:
+                    length = 4 if data[pos] & 0x3 == 0x3 else 2
+                    words[pc] = int.from_bytes(data[pos:pos + length], "little")
+                    pos += length
+                word = words.get(pc, 0)
+                rd = value = address = memory_value = None
+                if flags & REG:
+                    rd = data[pos]
+                    delta, pos = get_varint(data, pos + 1)
+                    value = registers[rd] = (registers[rd] + unzigzag(delta)) & 0xffffffff
+                if flags & MEM:
+                    delta, pos = get_varint(data, pos)
+                    address = last_address = (last_address + unzigzag(delta)) & 0xffffffff
+                    memory_value, pos = get_varint(data, pos)
+                yield pc, word, rd, value, address, memory_value
+                expected = pc + (4 if word & 0x3 == 0x3 else 2)
+
+def format_trace(records):
+    for pc, word, rd, value, address, memory_value in records:
+        encoding = f"{word:08x}" if word & 0x3 == 0x3 else f"{word:04x}    "
+        line = f"{pc:08x}:  {encoding}  {disassemble_word(word):<28}"
+        if rd is not None:
+            line += f"  x{rd}={value:#010x}"
+        if address is not None:
+            line += f"  [{address:#010x}]={memory_value:#x}"
+        yield line.rstrip()
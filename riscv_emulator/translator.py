@@ -0,0 +1,160 @@
+from riscv_emulator.dispatch import divide, remainder
+from riscv_emulator.state import SINK
+
+MAX_BLOCK_LENGTH = 64
+
+ALU_R = {
+    (0x0, 0x00): "(rg[{rs1}] + rg[{rs2}]) & 0xffffffff",
+    (0x0, 0x20): "(rg[{rs1}] - rg[{rs2}]) & 0xffffffff",
+    (0x1, 0x00): "(rg[{rs1}] << (rg[{rs2}] & 0x1f)) & 0xffffffff",
+    (0x2, 0x00): "1 if (rg[{rs1}] ^ 0x80000000) < (rg[{rs2}] ^ 0x80000000) else 0",
+    (0x3, 0x00): "1 if rg[{rs1}] < rg[{rs2}] else 0",
+    (0x4, 0x00): "rg[{rs1}] ^ rg[{rs2}]",
+    (0x5, 0x00): "rg[{rs1}] >> (rg[{rs2}] & 0x1f)",
+    (0x5, 0x20): "(((rg[{rs1}] ^ 0x80000000) - 0x80000000) >> (rg[{rs2}] & 0x1f)) & 0xffffffff",
+    (0x6, 0x00): "rg[{rs1}] | rg[{rs2}]",
+    (0x7, 0x00): "rg[{rs1}] & rg[{rs2}]",
+    (0x0, 0x01): "(rg[{rs1}] * rg[{rs2}]) & 0xffffffff",
+    (0x1, 0x01): "((((rg[{rs1}] ^ 0x80000000) - 0x80000000) * ((rg[{rs2}] ^ 0x80000000) - 0x80000000)) >> 32) & 0xffffffff",
+    (0x2, 0x01): "((((rg[{rs1}] ^ 0x80000000) - 0x80000000) * rg[{rs2}]) >> 32) & 0xffffffff",
+    (0x3, 0x01): "(rg[{rs1}] * rg[{rs2}]) >> 32",
+    (0x4, 0x01): "divide(rg[{rs1}], rg[{rs2}])",
+    (0x5, 0x01): "rg[{rs1}] // rg[{rs2}] if rg[{rs2}] else 0xffffffff",
+    (0x6, 0x01): "remainder(rg[{rs1}], rg[{rs2}])",
+    (0x7, 0x01): "rg[{rs1}] % rg[{rs2}] if rg[{rs2}] else rg[{rs1}]",
+}
+
+ALU_I = {
+    (0x0, 0x00): "(rg[{rs1}] + {imm}) & 0xffffffff",
+    (0x1, 0x00): "(rg[{rs1}] << {shamt}) & 0xffffffff",
+    (0x2, 0x00): "1 if (rg[{rs1}] ^ 0x80000000) < {simm} else 0",
+    (0x3, 0x00): "1 if rg[{rs1}] < {uimm} else 0",
+    (0x4, 0x00): "rg[{rs1}] ^ {uimm}",
+    (0x5, 0x00): "rg[{rs1}] >> {shamt}",
+    (0x5, 0x20): "(((rg[{rs1}] ^ 0x80000000) - 0x80000000) >> {shamt}) & 0xffffffff",
+    (0x6, 0x00): "rg[{rs1}] | {uimm}",
+    (0x7, 0x00): "rg[{rs1}] & {uimm}",
+}
+
+LOADS = {
+    0x0: "((load(address, 1) ^ 0x80) - 0x80) & 0xffffffff",
+    0x1: "((load(address, 2) ^ 0x8000) - 0x8000) & 0xffffffff",
+    0x2: "load(address, 4)",
+    0x4: "load(address, 1)",
+    0x5: "load(address, 2)",
+}
+
+STORES = {
+    0x0: "store(address, 1, rg[{rs2}])",
+    0x1: "store(address, 2, rg[{rs2}])",
+    0x2: "store(address, 4, rg[{rs2}])",
+}
+
+BRANCHES = {
+    0x0: "rg[{rs1}] == rg[{rs2}]",
+    0x1: "rg[{rs1}] != rg[{rs2}]",
+    0x4: "(rg[{rs1}] ^ 0x80000000) < (rg[{rs2}] ^ 0x80000000)",
+    0x5: "(rg[{rs1}] ^ 0x80000000) >= (rg[{rs2}] ^ 0x80000000)",
+    0x6: "rg[{rs1}] < rg[{rs2}]",
+    0x7: "rg[{rs1}] >= rg[{rs2}]",
+}
+
+def emit(lines, decoded, pc, retired):
+    opcode, rd, funct3, rs1, rs2, funct7, imm, _ = decoded
+    fields = {"rs1": rs1, "rs2": rs2, "imm": imm, "uimm": imm & 0xffffffff,
+              "simm": (imm & 0xffffffff) ^ 0x80000000, "shamt": imm & 0x1f}
+
+    if opcode == 0x33:
+        expr = ALU_R.get((funct3, funct7))
+        if expr and rd != SINK:
+            lines.append(f"rg[{rd}] = " + expr.format(**fields))
+    elif opcode == 0x13:
+        expr = ALU_I.get((funct3, funct7 if funct3 in (0x1, 0x5) else 0x00))
+        if expr and rd != SINK:
+            lines.append(f"rg[{rd}] = " + expr.format(**fields))
+    elif opcode == 0x03:
+        expr = LOADS.get(funct3)
+        # Kept even into x0 (the sink): a load from a device page can have side effects.
+        if expr:
+            lines.append(f"address = (rg[{rs1}] + {imm}) & 0xffffffff")
+            lines.append(f"rg[{rd}] = " + expr)
+    elif opcode == 0x23:
+        stmt = STORES.get(funct3)
+        if stmt:
+            lines.append(f"address = (rg[{rs1}] + {imm}) & 0xffffffff")
+            lines.append(stmt.format(**fields))
+            pages = "(address >> 12) in code_pages"
+            if funct3:
+                pages = f"({pages} or ((address + {(1 << funct3) - 1}) >> 12) in code_pages)"
+            lines.append(f"if {pages} and emu.invalidate(address, {1 << funct3}):")
+            lines.append(f"    emu.pc = {pc + 4}")
+            lines.append(f"    return {retired}")
+    elif opcode == 0x37:
+        if rd != SINK:
+            lines.append(f"rg[{rd}] = {(imm << 12) & 0xffffffff}")
+    elif opcode == 0x17:
+        if rd != SINK:
+            lines.append(f"rg[{rd}] = {(pc + (imm << 12)) & 0xffffffff}")
+    elif opcode == 0x63:
+        cond = BRANCHES.get(funct3)
+        if cond:
+            lines.append("if " + cond.format(**fields) + ":")
+            lines.append(f"    emu.pc = {pc + imm}")
+            lines.append(f"    return {retired}")
+        lines.append(f"emu.pc = {pc + 4}")
+    elif opcode == 0x2f:
+        if funct3 == 0x2:
+            lines.append(f"if emu.atomic({funct7 >> 2}, {rd}, {rs1}, {rs2}):")
+            lines.append(f"    emu.pc = {pc + 4}")
+            lines.append(f"    return {retired}")
+    elif opcode == 0x73:
+        lines.append(f"emu.access_csr({funct3}, {rd}, {rs1}, {imm})")
+    elif opcode == 0x6f:
+        if rd != SINK:
+            lines.append(f"rg[{rd}] = {pc + 4}")
+        lines.append(f"emu.pc = {pc + imm}")
+    elif opcode == 0x67:
+        lines.append(f"emu.pc = (rg[{rs1}] + {imm}) & 0xfffffffe")
+        if rd != SINK:
+            lines.append(f"rg[{rd}] = {pc + 4}")
+
+def translate(emu, start):
+    lines = []
+    pc = start
+    count = 0
+    while count < MAX_BLOCK_LENGTH:
+        if count and pc in emu.breakpoints:
+            break
+        decoded = emu.decode_cache.get(pc) or emu.fetch(pc)
+        if decoded is None:
+            break
+        opcode = decoded[0] & 0x7f
+        if opcode == 0x73 and decoded[2] == 0x0:
+            break
+        count += 1
+        if decoded[0] & 0x80:
+            emit(lines, (opcode,) + decoded[1:], pc - 2, count)
+            pc += 2
+        else:
+            emit(lines, decoded, pc, count)
+            pc += 4
+        if opcode in (0x63, 0x6f, 0x67):
+            break
+    else:
+        decoded = None
+    if count == 0:
+        return None
+    if decoded is None or decoded[0] & 0x7f not in (0x63, 0x6f, 0x67):
+        lines.append(f"emu.pc = {pc}")
+    lines.append(f"return {count}")
+    # (opcode, rd, rs1) of a closing jal/jalr, for call-stack tracking.
+    jump = None
+    if decoded is not None and decoded[0] & 0x7f in (0x6f, 0x67):
+        jump = (decoded[0] & 0x7f, decoded[1], decoded[3])
+
+    source = "def block(emu):\n"
+    source += "    rg = emu.rg\n    load = emu.memory.load\n    store = emu.memory.store\n    code_pages = emu.code_pages\n"
+    source += "".join(f"    {line}\n" for line in lines)
+    namespace = {"divide": divide, "remainder": remainder}
+    exec(compile(source, f"<block {start:#x}>", "exec"), namespace)
+    return namespace["block"], count, jump
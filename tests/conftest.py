@@ -0,0 +1,32 @@
+import struct
+from riscv_emulator.elf import HEADER, PROGRAM_HEADER, SECTION_HEADER, SYMBOL, EM_RISCV, PT_LOAD, SHT_SYMTAB
+
+SHT_STRTAB = 3
+STB_GLOBAL = 1
+STT_FUNC = 2
+
+def build_elf(segments, entry, symbols=()):
+    # segments are (address, data, memory_size, flags); symbols are (name, value, is_global).
+    data = bytearray(HEADER.size + PROGRAM_HEADER.size * len(segments))
+    headers = []
+    for address, contents, memory_size, flags in segments:
+        headers.append(PROGRAM_HEADER.pack(PT_LOAD, len(data), address, address, len(contents), memory_size, flags, 4))
+        data += contents
+    data[HEADER.size:HEADER.size + PROGRAM_HEADER.size * len(segments)] = b"".join(headers)
+    strings = bytearray(b"\0")
+    table = bytearray(SYMBOL.size)
+    for name, value, is_global in symbols:
+        table += SYMBOL.pack(len(strings), value, 0, (STB_GLOBAL if is_global else 0) << 4 | STT_FUNC, 0, 1)
+        strings += name.encode() + b"\0"
+    symtab = len(data)
+    data += table
+    strtab = len(data)
+    data += strings
+    sections = len(data)
+    data += bytes(SECTION_HEADER.size)
+    data += SECTION_HEADER.pack(0, SHT_SYMTAB, 0, 0, symtab, len(table), 2, 1, 4, SYMBOL.size)
+    data += SECTION_HEADER.pack(0, SHT_STRTAB, 0, 0, strtab, len(strings), 0, 0, 1, 0)
+    ident = b"\x7fELF" + bytes([1, 1, 1]) + bytes(9)
+    data[:HEADER.size] = HEADER.pack(ident, 2, EM_RISCV, 1, entry, HEADER.size, sections, 0, HEADER.size,
+                                     PROGRAM_HEADER.size, len(segments), SECTION_HEADER.size, 3, 0)
+    return bytes(data)
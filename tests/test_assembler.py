@@ -0,0 +1,67 @@
+import pytest
+from riscv_emulator import assembler
+from riscv_emulator.assembler import assemble, assemble_source
+
+PROGRAM = """
+start: addi a0, x0, 1
+loop:  addi a0, a0, 1
+       bne a0, x0, loop
+"""
+
+@pytest.fixture
+def counted(tmp_path, monkeypatch):
+    # Points the cache at tmp_path and counts real assembler runs.
+    monkeypatch.setattr(assembler, "ASM_CACHE_DIR", str(tmp_path / "cache"))
+    runs = []
+    original = assembler.assemble_source
+
+    def counting(source, compress=False):
+        runs.append(source)
+        return original(source, compress)
+
+    monkeypatch.setattr(assembler, "assemble_source", counting)
+    return runs
+
+def test_label_on_the_same_line_as_an_instruction():
+    data, symbols = assemble_source(PROGRAM)
+    words = [int.from_bytes(data[i:i + 4], "little") for i in range(0, len(data), 4)]
+    assert words == [0x00100513, 0x00150513, 0xfe051ee3]
+    assert "start" in symbols and "loop" in symbols
+
+def test_cache_hit_miss_and_stale_source(tmp_path, counted):
+    source = tmp_path / "prog.s"
+    source.write_text(PROGRAM)
+    assemble(str(source))
+    first = (tmp_path / "prog.bin").read_bytes()
+    assert len(counted) == 1
+
+    (tmp_path / "prog.bin").unlink()
+    assemble(str(source))
+    assert len(counted) == 1
+    assert (tmp_path / "prog.bin").read_bytes() == first
+
+    source.write_text(PROGRAM.replace("x0, 1", "x0, 2"))
+    assemble(str(source))
+    assert len(counted) == 2
+    assert (tmp_path / "prog.bin").read_bytes() != first
+
+    assemble(str(source), use_cache=False)
+    assert len(counted) == 3
+
+def test_compressed_output_is_cached_separately(tmp_path, counted):
+    source = tmp_path / "prog.s"
+    source.write_text(PROGRAM)
+    assemble(str(source))
+    assemble(str(source), compress=True)
+    assert len(counted) == 2
+    assert len((tmp_path / "prog.bin").read_bytes()) < 12
+
+def test_truncated_cache_entry_is_a_miss(tmp_path, counted):
+    source = tmp_path / "prog.s"
+    source.write_text(PROGRAM)
+    assemble(str(source))
+    for entry in (tmp_path / "cache").glob("*.bin"):
+        entry.write_bytes(entry.read_bytes()[:4])
+    assemble(str(source))
+    assert len(counted) == 2
+    assert len((tmp_path / "prog.bin").read_bytes()) == 12
@@ -0,0 +1,43 @@
+import pytest
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.emulator import emulator
+
+# The loop branches back to the previous halfword, and the call returns into it.
+LOOP = """
+    addi s1, x0, 5
+loop:
+    addi s1, s1, -1
+    bne s1, x0, loop
+    addi a0, x0, 3
+    jal ra, double
+    add a1, a0, a0
+    ecall
+double:
+    add a0, a0, a0
+    jalr x0, ra, 0
+"""
+
+def run(source, engine):
+    data, _ = assemble_source(source, compress=True)
+    emu = emulator(engine=engine, headless=True)
+    emu.syscalls = None
+    emu.memory.write(0, data)
+    emu.flush_decode_cache()
+    result = emu.run(1000)
+    return result.exit_reason, result.instructions, emu.pc, emu.registers()
+
+def test_program_is_compressed():
+    data, _ = assemble_source(LOOP, compress=True)
+    assert len(data) < 4 * 9
+
+@pytest.mark.parametrize("engine", ["dispatch", "block"])
+def test_engines_agree(engine):
+    assert run(LOOP, engine) == run(LOOP, "interp")
+
+def test_interp_loop():
+    reason, instructions, _, registers = run(LOOP, "interp")
+    assert reason == "ecall"
+    assert instructions == 17
+    assert registers[9] == 0
+    assert registers[10] == 6
+    assert registers[11] == 12
@@ -0,0 +1,69 @@
+import io, json
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.debugger import DebugSession, serve_debug
+from riscv_emulator.emulator import emulator
+from riscv_emulator.history import History
+
+PROGRAM = """
+    addi a0, x0, 5
+    addi a1, x0, 7
+    ebreak
+    add a2, a0, a1
+    ebreak
+"""
+
+def make(history=False):
+    data, _ = assemble_source(PROGRAM)
+    emu = emulator(headless=True)
+    emu.syscalls = None
+    emu.memory.write(0, data)
+    if history:
+        History(emu, 2)
+    return emu
+
+def session(emu, *requests):
+    out = io.StringIO()
+    lines = [request if isinstance(request, str) else json.dumps(request) for request in requests]
+    DebugSession(emu).serve(io.StringIO("\n".join(lines) + "\n"), out)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+def test_step_reports_only_changed_registers():
+    step, cont, regs = session(make(), {"id": 1, "cmd": "step"}, {"id": 2, "cmd": "cont"}, {"cmd": "regs"})
+    assert step == {"id": 1, "ok": True, "reason": "max_instructions", "exit_code": None,
+                    "pc": 4, "symbol": None, "instret": 1, "changed": {"x10": 5}}
+    assert cont["reason"] == "ebreak" and cont["changed"] == {"x11": 7} and cont["pc"] == 12
+    assert regs["registers"]["x10"] == 5 and len(regs["registers"]) == 32 and "id" not in regs
+
+def test_abi_names_memory_and_disassembly():
+    emu = make()
+    emu.memory.write(0x2000, b"\x01\x02\xff")
+    _, step, mem, dsm = session(emu, {"cmd": "abi"}, {"cmd": "step", "count": 2},
+                                {"cmd": "mem", "address": "0x2000", "length": 3}, {"cmd": "dsm", "address": 0, "count": 2})
+    assert step["changed"] == {"a0": 5, "a1": 7}
+    assert mem == {"ok": True, "address": 0x2000, "data": "0102ff"}
+    assert [entry["address"] for entry in dsm["instructions"]] == [0, 4]
+    assert dsm["instructions"][0]["word"] == 0x00500513
+
+def test_reverse_step_and_continue():
+    emu = make(history=True)
+    responses = session(emu, {"cmd": "cont"}, {"cmd": "cont"}, {"cmd": "rstep"}, {"cmd": "rcont"})
+    assert [response["instret"] for response in responses] == [3, 5, 4, 3]
+    assert responses[1]["changed"] == {"x12": 12}
+    assert responses[2]["changed"] == {}
+    assert responses[3]["changed"] == {"x12": 0}
+
+def test_error_shapes():
+    responses = session(make(), "not json", "[1]", {"id": "a", "cmd": "nope"}, {"id": 4, "cmd": "mem"},
+                        {"cmd": "mem", "address": 0, "length": -1}, {"cmd": "rstep"}, {"cmd": "exit"}, {"cmd": "regs"})
+    assert [response["ok"] for response in responses] == [False, False, False, False, False, False, True]
+    assert responses[0]["error"].startswith("bad request")
+    assert responses[2] == {"ok": False, "error": "unknown command: 'nope'", "id": "a"}
+    assert responses[3]["id"] == 4 and responses[3]["error"].startswith("KeyError")
+    assert "checkpoints" in responses[5]["error"]
+
+def test_serve_from_a_file(tmp_path, capsys):
+    path = tmp_path / "requests.jsonl"
+    path.write_text(json.dumps({"cmd": "step", "count": 2}) + "\n" + json.dumps({"cmd": "pc"}) + "\n")
+    serve_debug(make(), str(path))
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["pc"] for line in lines] == [8, 8]
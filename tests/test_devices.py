@@ -0,0 +1,64 @@
+import os
+import pytest
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.devices import UART_BASE, Uart
+from riscv_emulator.emulator import emulator
+
+# The first read into x0 still pops a byte off the receive buffer.
+DISCARD = f"""
+    lui t0, {UART_BASE >> 12}
+    lbu x0, 0(t0)
+    lbu a0, 0(t0)
+    ecall
+"""
+
+@pytest.mark.parametrize("engine", ["interp", "dispatch", "block"])
+def test_load_into_x0_reads_device(engine):
+    data, _ = assemble_source(DISCARD)
+    emu = emulator(engine=engine, headless=True)
+    emu.syscalls = None
+    emu.memory.write(0, data)
+    uart = emu.attach_device(UART_BASE, Uart())
+    uart.feed(b"xy")
+    assert emu.run(100).exit_reason == "ecall"
+    assert emu.rg[10] == ord("y")
+    assert emu.registers()[0] == 0
+
+class Recorder:
+    size = 0x100
+
+    def __init__(self):
+        self.writes = []
+
+    def read(self, offset, size):
+        return 0
+
+    def write(self, offset, size, value):
+        self.writes.append((offset, size, value))
+
+    def flush(self):
+        pass
+
+# read(0, DEVICE_BASE - 2, 4): the buffer straddles the end of RAM and the start of a device page.
+READ_INTO_DEVICE = """
+    addi a0, x0, 0
+    lui a1, 0x10001
+    addi a1, a1, -2
+    addi a2, x0, 4
+    addi a7, x0, 63
+    ecall
+    ebreak
+"""
+
+def test_read_syscall_into_device_page(tmp_path):
+    source = tmp_path / "input"
+    source.write_bytes(b"wxyz")
+    data, _ = assemble_source(READ_INTO_DEVICE)
+    emu = emulator(headless=True)
+    emu.syscalls.stdin = os.open(source, os.O_RDONLY)
+    emu.memory.write(0, data)
+    device = emu.attach_device(0x10001000, Recorder())
+    assert emu.run(100).exit_reason == "ebreak"
+    assert emu.rg[10] == 4
+    assert emu.memory.read(0x10000ffe, 2) == b"wx"
+    assert device.writes == [(0, 2, int.from_bytes(b"yz", "little"))]
@@ -0,0 +1,49 @@
+import pytest
+from conftest import build_elf
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.emulator import emulator
+
+CODE = """
+    lui s0, 0x11
+    lw a0, 0(s0)
+    lw a1, 8(s0)
+    lw a2, 2040(s0)
+    lui s1, 0x12
+    lw a3, 2044(s1)
+    ebreak
+"""
+
+def write(tmp_path, symbols=(), data=b"\x78\x56\x34\x12\xff\xff\xff\xff"):
+    code, _ = assemble_source(CODE)
+    path = tmp_path / "prog.elf"
+    # .data holds 8 bytes of a 0x2000-byte segment; the rest is .bss across two pages.
+    path.write_bytes(build_elf([(0x10000, code, len(code), 5), (0x11000, data, 0x2000, 6)], 0x10000, symbols))
+    return str(path)
+
+def test_segments_bss_and_entry(tmp_path):
+    emu = emulator(headless=True)
+    emu.load_program(write(tmp_path))
+    assert emu.pc == 0x10000
+    assert emu.program_end == 0x13000
+    assert emu.run(10).exit_reason == "ebreak"
+    assert emu.registers()[10:14] == [0x12345678, 0, 0, 0]
+    assert emu.memory.read(0x11004, 4) == b"\xff" * 4
+
+def test_symbols(tmp_path):
+    symbols = [("helper", 0x10010, False), ("main", 0x10000, False), ("_start", 0x10000, True),
+               ("$x", 0x10000, False), (".L0", 0x10004, False)]
+    emu = emulator(headless=True)
+    emu.load_program(write(tmp_path, symbols))
+    assert emu.symbols.lookup(0x10000) == ("_start", 0)
+    assert emu.symbols.lookup(0x10014) == ("helper", 4)
+    assert emu.symbols.address_of("main") == 0x10000
+    assert emu.symbols.address_of("$x") is None
+    assert emu.symbols.address_of(".L0") is None
+
+def test_rejects_other_architectures(tmp_path):
+    path = tmp_path / "x86.elf"
+    image = bytearray(build_elf([], 0))
+    image[18] = 62
+    path.write_bytes(image)
+    with pytest.raises(ValueError):
+        emulator().load_program(str(path))
@@ -0,0 +1,55 @@
+import os
+import pytest
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.bench import WORKLOAD_DIR, workloads
+from riscv_emulator.emulator import emulator
+
+BUDGET = 30_000
+
+def run(source, engine, budget=BUDGET):
+    data, _ = assemble_source(source)
+    emu = emulator(engine=engine, headless=True)
+    emu.syscalls = None
+    emu.memory.write(0, data)
+    result = emu.run(budget)
+    return result.exit_reason, emu.instret, emu.pc, emu.registers(), emu.memory.read(0, 0x20000)
+
+@pytest.mark.parametrize("name", workloads())
+def test_dispatch_matches_interp(name):
+    with open(os.path.join(WORKLOAD_DIR, f"{name}.s")) as f:
+        source = f.read()
+    assert run(source, "dispatch") == run(source, "interp")
+
+# Each store rewrites code that has already been decoded (and, for block, translated): first an
+# instruction in a loop that has run once, then the very next instruction in the same block.
+SELF_MODIFYING = """
+    lui t1, 0x06450
+    addi t1, t1, 0x513
+    addi t2, x0, 20
+    addi s3, x0, 2
+    addi s1, x0, 0
+target:
+    addi a0, a0, 1
+    addi s1, s1, 1
+    sw t1, 0(t2)
+    bne s1, s3, target
+    lui t1, 0x06458
+    addi t1, t1, 0x593
+    addi t2, x0, 52
+    sw t1, 0(t2)
+    addi a1, a1, 1
+    ebreak
+"""
+
+@pytest.mark.parametrize("name", workloads())
+def test_block_matches_interp(name):
+    with open(os.path.join(WORKLOAD_DIR, f"{name}.s")) as f:
+        source = f.read()
+    assert run(source, "block") == run(source, "interp")
+
+@pytest.mark.parametrize("engine", ["interp", "dispatch", "block"])
+def test_stores_invalidate_decoded_code(engine):
+    reason, _, _, registers, _ = run(SELF_MODIFYING, engine, 100)
+    assert reason == "ebreak"
+    assert registers[10] == 101
+    assert registers[11] == 100
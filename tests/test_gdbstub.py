@@ -0,0 +1,127 @@
+import socket, threading, time
+import pytest
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.emulator import emulator
+from riscv_emulator.gdbstub import checksum, decode, serve_gdb
+
+PROGRAM = """
+    addi a0, x0, 1
+    addi a0, a0, 2
+    addi a0, a0, 3
+    ecall
+"""
+
+def frame(body):
+    return b"$%s#%02x" % (body, checksum(body))
+
+class Client:
+    def __init__(self, port):
+        for _ in range(100):
+            try:
+                self.socket = socket.create_connection(("127.0.0.1", port))
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.02)
+        self.buffer = b""
+
+    def receive(self, count):
+        while len(self.buffer) < count:
+            self.buffer += self.socket.recv(4096)
+        data, self.buffer = self.buffer[:count], self.buffer[count:]
+        return data
+
+    def reply(self):
+        while b"#" not in self.buffer or len(self.buffer) < self.buffer.index(b"#") + 3:
+            self.buffer += self.socket.recv(4096)
+        end = self.buffer.index(b"#")
+        body, self.buffer = self.buffer[1:end], self.buffer[end + 3:]
+        return body.decode()
+
+    def send(self, raw):
+        self.socket.sendall(raw)
+        assert self.receive(1) == b"+"
+        return self.reply()
+
+    def command(self, body):
+        return self.send(frame(body.encode()))
+
+@pytest.fixture
+def session():
+    data, _ = assemble_source(PROGRAM)
+    emu = emulator(headless=True)
+    emu.syscalls = None
+    emu.memory.write(0, data)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    outcome = []
+    server = threading.Thread(target=lambda: outcome.append(serve_gdb(emu, f"127.0.0.1:{port}")), daemon=True)
+    server.start()
+    client = Client(port)
+    yield emu, client, outcome
+    client.socket.close()
+    server.join(5)
+
+def test_decode_escapes_and_run_lengths():
+    assert decode(b"}]x}\x03") == b"}x#"
+    assert decode(b"0* ") == b"0000"
+    assert decode(b"m10,4") == b"m10,4"
+
+def test_breakpoint_step_and_detach(session):
+    emu, client, outcome = session
+    assert "PacketSize" in client.command("qSupported:swbreak+")
+    assert client.command("Z0,8,4") == "OK"
+    assert client.command("c") == "S05"
+    assert client.command("p20") == "08000000"
+    assert client.command("pa") == "03000000"
+    assert client.command("s") == "S05"
+    assert client.command("p20") == "0c000000"
+    assert client.command("D") == "OK"
+    client.socket.close()
+    time.sleep(0.1)
+    assert outcome == ["detach"]
+    assert emu.breakpoints == {8}
+
+def test_escaped_and_run_length_packets(session):
+    emu, client, _ = session
+    # "}m" is an escaped "M"; "4* " expands to "4444".
+    assert client.send(frame(b"}m2000,2:4* ")) == "OK"
+    assert emu.memory.read(0x2000, 2) == b"DD"
+    assert client.command("m2000,2") == "4444"
+
+def test_bad_checksum_is_nacked(session):
+    _, client, _ = session
+    client.socket.sendall(b"$g#00")
+    assert client.receive(1) == b"-"
+    assert client.command("k") == "OK"
+
+def test_continue_to_exit(session):
+    _, client, outcome = session
+    assert client.command("c") == "W00"
+    assert client.command("p0a") == "06000000"
+    assert client.command("k") == "OK"
+
+def test_framing_split_batched_and_no_ack(session):
+    _, client, _ = session
+    packet = frame(b"m0,4")
+    client.socket.sendall(b"+" + packet[:3])
+    time.sleep(0.05)
+    client.socket.sendall(packet[3:])
+    assert client.receive(1) == b"+"
+    assert client.reply() == "13051000"
+    client.socket.sendall(frame(b"m4,4") + frame(b"m0,4"))
+    # Both packets are acked as they are read, so the acks may come ahead of the first reply.
+    replies, acks = [], 0
+    while len(replies) < 2:
+        if client.receive(1) == b"+":
+            acks += 1
+        else:
+            client.buffer = b"$" + client.buffer
+            replies.append(client.reply())
+    assert acks == 2
+    assert replies == ["13052500", "13051000"]
+    assert client.command("QStartNoAckMode") == "OK"
+    client.socket.sendall(frame(b"?"))
+    assert client.reply() == "S05"
+    client.socket.sendall(frame(b"k"))
+    assert client.reply() == "OK"
@@ -0,0 +1,113 @@
+import pytest
+from conftest import build_elf
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.harts import create_harts, run_harts, run_harts_parallel
+
+# Each hart adds 1 to a counter in .bss 100 times, then waits until both harts are done.
+COUNT = """
+    lui s0, 0x80001
+    addi t0, x0, 1
+    addi s1, x0, 100
+loop:
+    amoadd.w x0, t0, (s0)
+    addi s1, s1, -1
+    bne s1, x0, loop
+    addi t1, x0, 200
+wait:
+    lw a0, 0(s0)
+    bne a0, t1, wait
+    ecall
+"""
+
+def test_processes_share_high_elf_segments(tmp_path):
+    code, _ = assemble_source(COUNT)
+    path = tmp_path / "count.elf"
+    path.write_bytes(build_elf([(0x80000000, code, len(code), 5), (0x80001000, b"", 0x1000, 6)], 0x80000000))
+    results = run_harts_parallel(str(path), 2, max_instructions=200_000, timeout=30)
+    assert [result.exit_reason for result in results] == ["ecall", "ecall"]
+    assert [result.registers[10] for result in results] == [200, 200]
+
+def test_processes_reject_images_too_sparse_to_share(tmp_path):
+    code, _ = assemble_source(COUNT)
+    path = tmp_path / "sparse.elf"
+    path.write_bytes(build_elf([(0x0, code, len(code), 5), (0x80000000, code, len(code), 5)], 0))
+    with pytest.raises(ValueError):
+        run_harts_parallel(str(path), 2)
+
+ENGINES = ["interp", "dispatch", "block"]
+
+def load(source, engine, count=1):
+    code, _ = assemble_source(source)
+    harts = create_harts(count, engine, headless=True)
+    harts[0].memory.write(0, code)
+    for hart in harts:
+        hart.syscalls = None
+    return harts
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("op, expected", [
+    ("amoadd.w", 0x00000010), ("amoswap.w", 0x00000020), ("amoxor.w", 0xffffffd0),
+    ("amoand.w", 0x00000020), ("amoor.w", 0xfffffff0), ("amomin.w", 0xfffffff0),
+    ("amomax.w", 0x00000020), ("amominu.w", 0x00000020), ("amomaxu.w", 0xfffffff0),
+])
+def test_amo_semantics(engine, op, expected):
+    hart, = load(f"""
+    lui s0, 2
+    addi a1, x0, 0x20
+    {op} a0, a1, (s0)
+    ebreak
+""", engine)
+    hart.memory.store(0x2000, 4, 0xfffffff0)
+    assert hart.run(10).exit_reason == "ebreak"
+    assert hart.rg[10] == 0xfffffff0
+    assert hart.memory.load(0x2000, 4) == expected
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_lr_sc(engine):
+    hart, = load("""
+    lui s0, 2
+    addi a1, x0, 7
+    addi a4, x0, 9
+    lr.w a0, (s0)
+    sc.w a2, a1, (s0)
+    sc.w a3, a1, (s0)
+    lr.w a0, (s0)
+    sw a4, 0(s0)
+    sc.w a5, a1, (s0)
+    ebreak
+""", engine)
+    hart.memory.store(0x2000, 4, 3)
+    assert hart.run(20).exit_reason == "ebreak"
+    assert (hart.rg[12], hart.rg[13], hart.rg[15]) == (0, 1, 1)
+    assert hart.memory.load(0x2000, 4) == 9
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_sc_fails_after_another_hart_writes(engine):
+    first, second = load("""
+    lui s0, 2
+    addi a1, x0, 1
+    lr.w a0, (s0)
+    sc.w a2, a1, (s0)
+    ebreak
+""", engine, 2)
+    code, _ = assemble_source("""
+    lui s0, 2
+    addi a1, x0, 4
+    amoadd.w x0, a1, (s0)
+    ebreak
+""")
+    second.memory.write(0x100, code)
+    second.pc = 0x100
+    first.run(3)
+    second.run(3)
+    first.run(1)
+    assert first.rg[12] == 1
+    assert first.memory.load(0x2000, 4) == 4
+
+def test_harts_read_their_own_mhartid():
+    harts = load("""
+    csrr a0, mhartid
+    ebreak
+""", "interp", 3)
+    results = run_harts(harts, 10)
+    assert [result.registers[10] for result in results] == [0, 1, 2]
@@ -0,0 +1,48 @@
+import os
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.emulator import emulator
+from riscv_emulator.history import History
+from riscv_emulator.syscalls import Syscalls
+
+# Reads stdin a byte at a time into one page, summing into s2, with an EBREAK stop per byte.
+PROGRAM = """
+    addi s0, x0, 40
+    lui s1, 2
+loop:
+    addi a0, x0, 0
+    addi a1, s1, 0
+    addi a2, x0, 1
+    addi a7, x0, 63
+    ecall
+    lbu t0, 0(s1)
+    add s2, s2, t0
+    addi s0, s0, -1
+    ebreak
+    bne s0, x0, loop
+    addi a0, x0, 0
+    addi a7, x0, 93
+    ecall
+"""
+
+def test_eviction_trims_syscall_log_and_stops(tmp_path):
+    source = tmp_path / "input"
+    source.write_bytes(bytes(range(1, 41)))
+    data, _ = assemble_source(PROGRAM)
+    emu = emulator(headless=True)
+    emu.syscalls = Syscalls(stdin=os.open(source, os.O_RDONLY))
+    emu.memory.write(0, data)
+    history = History(emu, interval=10, budget=2 * 4096)
+    while history.run(1000).exit_reason == "ebreak":
+        pass
+    assert emu.exit_code == 0
+    total = emu.instret
+    oldest = history.checkpoints[0].instret
+    assert oldest > 0
+    assert len(emu.syscalls.log) <= len(history.checkpoints) + 1
+    assert all(stop >= oldest for stop in history.stops)
+
+    assert history.seek(oldest) == oldest
+    while history.run(1000).exit_reason == "ebreak":
+        pass
+    assert emu.instret == total
+    assert emu.rg[18] == sum(range(1, 41))
@@ -0,0 +1,36 @@
+from riscv_emulator.memory import Memory, PAGE_SIZE
+
+def test_untouched_memory_reads_zero_without_allocating():
+    memory = Memory()
+    assert memory.load(0xfffffffc, 4) == 0
+    assert memory.read(0x7ffff000, 16) == bytes(16)
+    assert memory.pages == {}
+
+def test_loads_and_stores_cross_pages():
+    memory = Memory()
+    memory.store(PAGE_SIZE - 2, 4, 0x11223344)
+    assert memory.load(PAGE_SIZE - 2, 4) == 0x11223344
+    assert memory.read(PAGE_SIZE - 2, 4) == bytes.fromhex("44332211")
+    memory.write(0x80000ffe, b"abcd")
+    assert memory.read(0x80000ffe, 4) == b"abcd"
+    assert len(memory.pages) == 4
+
+def test_mapped_file_is_copy_on_write(tmp_path):
+    path = tmp_path / "image.bin"
+    data = bytes(range(256)) * (3 * PAGE_SIZE // 256)
+    path.write_bytes(data)
+    memory = Memory()
+    assert memory.map_file(str(path), 0x10000) == len(data)
+    assert memory.read(0x10000, len(data)) == data
+    memory.store(0x11000, 4, 0xdeadbeef)
+    assert memory.load(0x11000, 4) == 0xdeadbeef
+    assert memory.read(0x12000, PAGE_SIZE) == data[2 * PAGE_SIZE:]
+    assert path.read_bytes() == data
+
+def test_zero_fill_clears_a_range():
+    memory = Memory()
+    memory.write(0x1000, b"\xff" * (3 * PAGE_SIZE))
+    memory.zero_fill(0x1800, 2 * PAGE_SIZE)
+    assert memory.read(0x1000, 0x800) == b"\xff" * 0x800
+    assert memory.read(0x1800, 2 * PAGE_SIZE) == bytes(2 * PAGE_SIZE)
+    assert memory.read(0x3800, 0x800) == b"\xff" * 0x800
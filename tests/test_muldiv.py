@@ -0,0 +1,27 @@
+import pytest
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.emulator import emulator
+
+MIN = 0x80000000
+NEG = lambda value: value & 0xffffffff
+
+CASES = [
+    ("div", 7, 0, 0xffffffff), ("divu", 7, 0, 0xffffffff), ("rem", 7, 0, 7), ("remu", 7, 0, 7),
+    ("div", MIN, NEG(-1), MIN), ("rem", MIN, NEG(-1), 0),
+    ("div", NEG(-7), 2, NEG(-3)), ("rem", NEG(-7), 2, NEG(-1)), ("divu", NEG(-7), 2, 0x7ffffffc), ("remu", NEG(-7), 2, 1),
+    ("mul", 0x12345678, 0x9abcdef0, 0x242d2080), ("mulh", NEG(-1), NEG(-1), 0), ("mulh", MIN, MIN, 0x40000000),
+    ("mulhsu", NEG(-1), 0xffffffff, 0xffffffff), ("mulhu", 0xffffffff, 0xffffffff, 0xfffffffe),
+]
+
+@pytest.mark.parametrize("engine", ["interp", "dispatch", "block"])
+@pytest.mark.parametrize("op, a, b, expected", CASES)
+def test_muldiv(engine, op, a, b, expected):
+    data, _ = assemble_source(f"""
+    {op} a2, a0, a1
+    ebreak
+""")
+    emu = emulator(engine=engine, headless=True)
+    emu.memory.write(0, data)
+    emu.rg[10], emu.rg[11] = a, b
+    assert emu.run(10).exit_reason == "ebreak"
+    assert emu.rg[12] == expected
@@ -0,0 +1,69 @@
+from riscv_emulator.emulator import emulator
+from riscv_emulator.snapshot import load_snapshot
+
+def make():
+    emu = emulator(headless=True)
+    emu.memory.write(0x1000, b"before")
+    emu.memory.write(0x5000, b"other")
+    emu.rg[5] = 1
+    emu.pc = 0x40
+    return emu
+
+def test_snapshot_pages_are_isolated_from_later_writes():
+    emu = make()
+    snap = emu.snapshot()
+    emu.memory.write(0x1000, b"after!")
+    emu.memory.write(0x9000, b"new")
+    assert bytes(snap.pages[1][:6]) == b"before"
+    assert 9 not in snap.pages
+    assert emu.memory.read(0x1000, 6) == b"after!"
+
+def test_restore_reverts_registers_and_memory():
+    emu = make()
+    snap = emu.snapshot()
+    emu.memory.write(0x1000, b"after!")
+    emu.memory.write(0x9000, b"new")
+    emu.rg[5] = 2
+    emu.pc = 0x80
+    emu.instret = 10
+    emu.restore(snap)
+    assert (emu.rg[5], emu.pc, emu.instret) == (1, 0x40, 0)
+    assert emu.memory.read(0x1000, 6) == b"before"
+    assert emu.memory.read(0x9000, 3) == bytes(3)
+    assert emu.memory.read(0x5000, 5) == b"other"
+
+def test_restore_an_older_snapshot():
+    emu = make()
+    first = emu.snapshot()
+    emu.memory.write(0x1000, b"second")
+    second = emu.snapshot()
+    emu.memory.write(0x1000, b"third!")
+    emu.restore(first)
+    assert emu.memory.read(0x1000, 6) == b"before"
+    emu.restore(second)
+    assert emu.memory.read(0x1000, 6) == b"second"
+    emu.restore(second)
+    assert emu.memory.read(0x1000, 6) == b"second"
+
+def test_saved_snapshot_restores_into_a_fresh_emulator(tmp_path):
+    emu = make()
+    path = str(tmp_path / "warm.snap")
+    emu.snapshot().save(path)
+    emu.memory.write(0x1000, b"after!")
+    other = emulator(headless=True)
+    other.restore(load_snapshot(path))
+    assert other.memory.read(0x1000, 6) == b"before"
+    other.memory.write(0x1000, b"write!")
+    assert load_snapshot(path).pages[1][:6] == b"before"
+
+def test_restore_drops_code_decoded_since(tmp_path):
+    emu = emulator(engine="block", headless=True)
+    emu.memory.write(0, (0x00150513).to_bytes(4, "little") + (0x00100073).to_bytes(4, "little"))
+    snap = emu.snapshot()
+    emu.run(10)
+    assert emu.rg[10] == 1
+    emu.memory.write(0, (0x00550513).to_bytes(4, "little"))
+    emu.invalidate(0, 4)
+    emu.restore(snap)
+    emu.run(10)
+    assert emu.rg[10] == 1
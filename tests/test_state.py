@@ -0,0 +1,37 @@
+import pytest
+from riscv_emulator.emulator import emulator
+from riscv_emulator.snapshot import load_snapshot
+from riscv_emulator.state import HartState
+
+def test_emulator_has_no_instance_dict():
+    emu = emulator()
+    assert not hasattr(emu, "__dict__")
+    with pytest.raises(AttributeError):
+        emu.unknown = 1
+
+def test_pack_round_trip():
+    hart = HartState(3)
+    hart.set_registers(range(32))
+    hart.pc = 0x80000000
+    hart.instret = 1 << 40
+    hart.csr = {0x340: 7, 0x305: 0x100}
+    copy = HartState().unpack(hart.pack())
+    assert copy.registers() == [0] + list(range(1, 32))
+    assert (copy.pc, copy.instret, copy.csr) == (0x80000000, 1 << 40, hart.csr)
+
+def test_unpack_rejects_truncated_state():
+    with pytest.raises(ValueError):
+        HartState().unpack(HartState().pack() + b"\0")
+
+def test_snapshot_file_keeps_csrs(tmp_path):
+    emu = emulator(headless=True)
+    emu.rg[5] = 42
+    emu.pc = 0x100
+    emu.csr[0x340] = 9
+    emu.memory.write(0x2000, b"data")
+    path = str(tmp_path / "state.snap")
+    emu.snapshot().save(path)
+    other = emulator(headless=True)
+    other.restore(load_snapshot(path))
+    assert (other.rg[5], other.pc, other.csr[0x340]) == (42, 0x100, 9)
+    assert other.memory.read(0x2000, 4) == b"data"
@@ -0,0 +1,144 @@
+import errno, io, os
+import pytest
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.emulator import emulator
+from riscv_emulator.syscalls import Syscalls, SYS_BRK, SYS_CLOSE, SYS_EXIT, SYS_OPENAT, SYS_READ, SYS_WRITE
+
+AT_FDCWD = -100
+O_WRONLY, O_CREAT, O_TRUNC = 0o1, 0o100, 0o1000
+
+def load(source, root=None):
+    data, _ = assemble_source(source)
+    emu = emulator(headless=True)
+    emu.syscalls = Syscalls(root)
+    emu.memory.write(0, data)
+    return emu
+
+# Opens data.txt, reads two bytes, stops at EBREAK, then reads two more and exits with the last byte.
+READ_TWICE = """
+    lui s1, 2
+    addi a0, x0, -100
+    addi a1, s1, 0
+    addi a2, x0, 0
+    addi a7, x0, 56
+    ecall
+    addi s0, a0, 0
+    addi a0, s0, 0
+    addi a1, s1, 64
+    addi a2, x0, 2
+    addi a7, x0, 63
+    ecall
+    ebreak
+    addi a0, s0, 0
+    addi a1, s1, 64
+    addi a2, x0, 2
+    addi a7, x0, 63
+    ecall
+    lbu a0, 65(s1)
+    addi a7, x0, 93
+    ecall
+"""
+
+def test_restore_rewinds_exit_code_and_files(tmp_path):
+    (tmp_path / "data.txt").write_bytes(b"abcdef")
+    emu = load(READ_TWICE, tmp_path)
+    emu.memory.write(0x2000, b"data.txt\0")
+    assert emu.run(100).exit_reason == "ebreak"
+    snap = emu.snapshot()
+    first = emu.run(100)
+    assert (first.exit_reason, emu.exit_code) == ("exit", ord("d"))
+    assert emu.syscalls.files == {}
+    emu.restore(snap)
+    assert emu.exit_code is None
+    second = emu.run(100)
+    assert (second.exit_reason, second.instructions, emu.exit_code) == ("exit", first.instructions, ord("d"))
+
+def call(emu, number, *args):
+    emu.rg[17] = number
+    emu.rg[10:10 + len(args)] = [arg & 0xffffffff for arg in args]
+    assert emu.syscalls.handle(emu)
+    return (emu.rg[10] ^ 0x80000000) - 0x80000000
+
+def string(emu, address, text):
+    emu.memory.write(address, text.encode() + b"\0")
+    return address
+
+def test_write_buffers_stdout_and_stderr():
+    out, err = io.StringIO(), io.StringIO()
+    emu = emulator(headless=True)
+    emu.syscalls = Syscalls(stdout=out, stderr=err)
+    emu.memory.write(0x2000, b"hello")
+    assert call(emu, SYS_WRITE, 1, 0x2000, 5) == 5
+    assert call(emu, SYS_WRITE, 2, 0x2000, 4) == 4
+    assert out.getvalue() == ""
+    emu.syscalls.flush()
+    assert (out.getvalue(), err.getvalue()) == ("hello", "hell")
+    assert call(emu, SYS_WRITE, 7, 0x2000, 5) == -errno.EBADF
+
+def test_read_stdin(tmp_path):
+    (tmp_path / "in").write_bytes(b"input")
+    emu = emulator(headless=True)
+    emu.syscalls = Syscalls(stdin=os.open(tmp_path / "in", os.O_RDONLY))
+    assert call(emu, SYS_READ, 0, 0x2000, 16) == 5
+    assert emu.memory.read(0x2000, 5) == b"input"
+    assert call(emu, SYS_READ, 0, 0x2000, 16) == 0
+    assert call(emu, SYS_READ, 9, 0x2000, 16) == -errno.EBADF
+
+def test_open_read_write_close_in_sandbox(tmp_path):
+    (tmp_path / "data.txt").write_bytes(b"contents")
+    emu = emulator(headless=True)
+    emu.syscalls = Syscalls(tmp_path)
+    fd = call(emu, SYS_OPENAT, AT_FDCWD, string(emu, 0x1000, "/data.txt"), 0, 0)
+    assert fd >= 3
+    assert call(emu, SYS_READ, fd, 0x2000, 64) == 8
+    assert emu.memory.read(0x2000, 8) == b"contents"
+    assert call(emu, SYS_CLOSE, fd) == 0
+    assert call(emu, SYS_CLOSE, fd) == -errno.EBADF
+
+    out = call(emu, SYS_OPENAT, AT_FDCWD, string(emu, 0x1000, "new.txt"), O_WRONLY | O_CREAT | O_TRUNC, 0o644)
+    assert call(emu, SYS_WRITE, out, 0x2000, 4) == 4
+    assert call(emu, SYS_CLOSE, out) == 0
+    assert (tmp_path / "new.txt").read_bytes() == b"cont"
+    assert call(emu, SYS_OPENAT, AT_FDCWD, string(emu, 0x1000, "data.txt"), 3, 0) == -errno.EINVAL
+    assert call(emu, SYS_OPENAT, AT_FDCWD, string(emu, 0x1000, "missing"), 0, 0) == -errno.ENOENT
+
+@pytest.mark.parametrize("path", ["../outside.txt", "/../outside.txt", "sub/../../outside.txt", "link"])
+def test_sandbox_escapes_are_rejected(tmp_path, path):
+    root = tmp_path / "root"
+    root.mkdir()
+    (tmp_path / "outside.txt").write_bytes(b"secret")
+    (root / "link").symlink_to(tmp_path / "outside.txt")
+    emu = emulator(headless=True)
+    emu.syscalls = Syscalls(root)
+    assert call(emu, SYS_OPENAT, AT_FDCWD, string(emu, 0x1000, path), 0, 0) == -errno.EACCES
+
+def test_open_without_sandbox_fails():
+    emu = emulator(headless=True)
+    assert call(emu, SYS_OPENAT, AT_FDCWD, string(emu, 0x1000, "/etc/hostname"), 0, 0) == -errno.EACCES
+
+def test_brk_grows_and_shrinking_clears():
+    emu = emulator(headless=True)
+    emu.program_end = 0x1234
+    start = call(emu, SYS_BRK, 0)
+    assert start == 0x2000
+    assert call(emu, SYS_BRK, 0x6000) == 0x6000
+    emu.memory.write(0x3000, b"heap")
+    assert call(emu, SYS_BRK, 0x2800) == 0x2800
+    assert call(emu, SYS_BRK, 0x6000) == 0x6000
+    assert emu.memory.read(0x3000, 4) == bytes(4)
+    assert call(emu, SYS_BRK, 0x1000) == 0x6000
+
+def test_exit_sets_exit_code_and_flushes():
+    out = io.StringIO()
+    emu = emulator(headless=True)
+    emu.syscalls = Syscalls(stdout=out)
+    emu.memory.write(0x2000, b"bye")
+    call(emu, SYS_WRITE, 1, 0x2000, 3)
+    call(emu, SYS_EXIT, -2)
+    assert emu.exit_code == -2
+    assert out.getvalue() == "bye"
+
+def test_unknown_syscalls_are_left_to_the_emulator():
+    emu = emulator(headless=True)
+    emu.rg[17] = 1234
+    assert not emu.syscalls.handle(emu)
@@ -0,0 +1,60 @@
+from riscv_emulator.assembler import assemble_source
+from riscv_emulator.devices import UART_BASE, Uart
+from riscv_emulator.emulator import emulator
+from riscv_emulator.trace import Tracer, read_trace
+
+PROGRAM = """
+    addi a0, x0, 7
+    addi a7, x0, 93
+    ecall
+"""
+
+def test_trace_includes_halting_instruction(tmp_path):
+    data, _ = assemble_source(PROGRAM)
+    emu = emulator(engine="dispatch", headless=True)
+    emu.memory.write(0, data)
+    path = str(tmp_path / "exit.trace")
+    with Tracer(path) as tracer:
+        result = emu.run(100, tracer=tracer)
+    records = list(read_trace(path))
+    assert result.exit_reason == "exit"
+    assert len(records) == emu.instret == 3
+    assert [record[0] for record in records] == [0, 4, 8]
+
+def run_traced(tmp_path, emu, budget=100):
+    path = str(tmp_path / "run.trace")
+    with Tracer(path) as tracer:
+        emu.run(budget, tracer=tracer)
+    return list(read_trace(path))
+
+def test_trace_reads_devices_once(tmp_path):
+    data, _ = assemble_source(f"""
+    lui t0, {UART_BASE >> 12}
+    lbu x0, 0(t0)
+    lbu a0, 0(t0)
+    ebreak
+""")
+    emu = emulator(engine="dispatch", headless=True)
+    emu.memory.write(0, data)
+    uart = emu.attach_device(UART_BASE, Uart())
+    uart.feed(b"xyz")
+    records = run_traced(tmp_path, emu)
+    assert [record[5] for record in records[1:3]] == [ord("x"), ord("y")]
+    assert emu.rg[10] == ord("y")
+    assert list(uart.input) == [ord("z")]
+
+def test_trace_records_word_that_ran(tmp_path):
+    # The store overwrites itself with a nop; the trace keeps the store's own encoding.
+    data, _ = assemble_source("""
+    addi t1, x0, 0x13
+    addi x0, x0, 0
+    sw x0, 8(x0)
+    ebreak
+""")
+    data = data[:8] + (0x00602423).to_bytes(4, "little") + data[12:]
+    emu = emulator(engine="dispatch", headless=True)
+    emu.memory.write(0, data)
+    records = run_traced(tmp_path, emu)
+    assert records[2][0] == 8
+    assert records[2][1] == 0x00602423
+    assert emu.memory.load(8, 4) == 0x13